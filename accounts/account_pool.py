@@ -0,0 +1,111 @@
+# في accounts/account_pool.py
+"""
+مخزون حسابات مؤقتة مُجهزة مسبقاً (User + Customer + Wallet غير نشطة).
+
+temporary-create يحجز حساباً من المخزون بـ UPDATE واحد
+(WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED)) بدلاً من 4 عمليات كتابة،
+ويعيد تعبئة المخزون أمر replenish_account_pool في الخلفية حتى ACCOUNT_POOL_WATERMARK.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Customer, Wallet, generate_serial
+
+CLAIMED_KEY = 'account_pool:claimed'
+MISSES_KEY = 'account_pool:misses'
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def pool_depth():
+    """عدد الحسابات الجاهزة في المخزون (يستخدم الفهرس الجزئي)."""
+    return Customer.objects.filter(is_pooled=True).count()
+
+
+def pool_stats():
+    return {
+        'depth': pool_depth(),
+        'watermark': settings.ACCOUNT_POOL_WATERMARK,
+        'claimed': cache.get(CLAIMED_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def provision(count):
+    """إنشاء count حساب في المخزون بثلاث عمليات bulk_create. يُرجع عدد الحسابات المُنشأة."""
+    if count <= 0:
+        return 0
+
+    serials = {generate_serial() for _ in range(count)}
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=f"temp_{serial}", password=make_password(None), is_active=False)
+            for serial in serials
+        ])
+        customers = Customer.objects.bulk_create([
+            Customer(serial=serial, user=user, is_pooled=True)
+            for serial, user in zip(serials, users)
+        ])
+        Wallet.objects.bulk_create([Wallet(customer=customer) for customer in customers])
+    return len(customers)
+
+
+def replenish(watermark=None, batch_size=100):
+    """تعبئة المخزون حتى الحد المطلوب. يُرجع عدد الحسابات المضافة."""
+    watermark = settings.ACCOUNT_POOL_WATERMARK if watermark is None else watermark
+    added = 0
+    missing = watermark - pool_depth()
+    while missing > 0:
+        try:
+            created = provision(min(batch_size, missing))
+        except IntegrityError:
+            # تعارض نادر في السيريال: نعيد المحاولة بدفعة جديدة
+            continue
+        added += created
+        missing -= created
+    return added
+
+
+def claim():
+    """
+    حجز حساب من المخزون ذرياً. يُرجع كائن Customer أو None إذا كان المخزون فارغاً.
+    مهلة الـ 48 ساعة تبدأ من لحظة الحجز (created_at).
+    """
+    qn = connection.ops.quote_name
+    table = qn(Customer._meta.db_table)
+    columns = [field.column for field in Customer._meta.concrete_fields]
+    lock = " FOR UPDATE SKIP LOCKED" if connection.features.has_select_for_update_skip_locked else ""
+    sql = (
+        f"UPDATE {table} SET is_pooled = %s, created_at = %s "
+        f"WHERE id = (SELECT id FROM {table} WHERE is_pooled = %s ORDER BY id LIMIT 1{lock}) "
+        f"RETURNING {', '.join(qn(column) for column in columns)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [False, timezone.now(), True])
+        row = cursor.fetchone()
+
+    if row is None:
+        _incr(MISSES_KEY)
+        return None
+    _incr(CLAIMED_KEY)
+    return Customer.from_db(connection.alias, [f.attname for f in Customer._meta.concrete_fields], row)
+
+
+def create_account():
+    """المسار الاحتياطي عند نفاد المخزون: إنشاء الحساب مباشرة في transaction واحد."""
+    serial = generate_serial()
+    with transaction.atomic():
+        user = User.objects.create_user(username=f"temp_{serial}", is_active=False)
+        customer = Customer.objects.create(serial=serial, user=user)
+        Wallet.objects.create(customer=customer)
+    return customer
@@ -1,6 +1,6 @@
 # في accounts/admin.py
 from django.contrib import admin
-from .models import Customer, Wallet, Transaction
+from .models import Customer, Wallet, Transaction, WalletSnapshot
 from django.db import IntegrityError
 
 # دمج المحفظة (Wallet) مع العميل (Customer) في لوحة الإدارة (Inline)
@@ -17,7 +17,7 @@ class WalletInline(admin.StackedInline):
 class CustomerAdmin(admin.ModelAdmin):
     list_display = ('name', 'serial', 'phone', 'is_active', 'created_at')
     search_fields = ('name', 'serial', 'phone')
-    list_filter = ('is_active',)
+    list_filter = ('is_active', 'is_pooled')
     
     # منع التعديل اليدوي على السيريال والبين ووقت الإنشاء
     readonly_fields = ('serial', 'pin', 'created_at') 
@@ -29,8 +29,16 @@ class CustomerAdmin(admin.ModelAdmin):
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('customer', 'transaction_type', 'amount', 'timestamp')
-    list_filter = ('transaction_type',)
+    list_filter = ('transaction_type', 'period')
     search_fields = ('customer__serial', 'customer__name', 'description')
     
     # المعاملة هي سجل تاريخي، يجب منع تعديلها بعد إنشائها
-    readonly_fields = ('customer', 'amount', 'transaction_type', 'description', 'timestamp')
\ No newline at end of file
+    readonly_fields = ('customer', 'amount', 'transaction_type', 'description', 'timestamp')
+
+# تسجيل لقطات الأرصدة الشهرية (للقراءة فقط)
+@admin.register(WalletSnapshot)
+class WalletSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('customer', 'period', 'balance', 'total_deposited', 'total_spent')
+    list_filter = ('period',)
+    search_fields = ('customer__serial',)
+    readonly_fields = ('customer', 'period', 'balance', 'total_deposited', 'total_spent', 'created_at')
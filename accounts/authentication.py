@@ -0,0 +1,166 @@
+# في accounts/authentication.py
+"""
+مصادقة JWT مع هوية (Principal) مُخزنة مؤقتاً.
+
+بدلاً من SELECT على auth_user في كل طلب ثم request.user.customer ثم .wallet،
+تُحمَّل هوية مختصرة (user id, customer id, serial, is_active, wallet id) باستعلام واحد
+وتُخزن على مستويين: LRU داخل العملية (مهلة قصيرة) ثم CACHES['default'] (Redis).
+تُلغى عند حفظ Customer/User (accounts/signals.py).
+إذا تعذر الوصول إلى الكاش تُحمَّل الهوية من قاعدة البيانات كما في JWTAuthentication الأصلية.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Customer
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_VERSION = 1
+
+
+class Principal:
+    """بديل خفيف لكائن User في request.user لطلبات الـ API."""
+
+    is_authenticated = True
+    is_anonymous = False
+    is_staff = False
+    is_superuser = False
+
+    def __init__(self, user_id, is_active, customer_id, serial, customer_is_active, wallet_id):
+        self.id = self.pk = user_id
+        self.is_active = is_active
+        self.customer_id = customer_id
+        self.serial = serial
+        self.customer_is_active = customer_is_active
+        self.wallet_id = wallet_id
+
+    def __str__(self):
+        return f"Principal {self.pk} ({self.serial or '-'})"
+
+    def as_tuple(self):
+        return (self.pk, self.is_active, self.customer_id, self.serial,
+                self.customer_is_active, self.wallet_id)
+
+    @cached_property
+    def customer(self):
+        """
+        كائن Customer بدون استعلام: الحقول المعروفة محملة والباقي مؤجل (deferred)
+        ويُحمَّل تلقائياً عند الوصول إليه فقط.
+        """
+        if self.customer_id is None:
+            raise Customer.DoesNotExist("لا يوجد عميل مرتبط بهذا المستخدم.")
+        return Customer.from_db(
+            DEFAULT_DB_ALIAS,
+            ['id', 'serial', 'is_active', 'user_id'],
+            [self.customer_id, self.serial, self.customer_is_active, self.pk]
+        )
+
+
+# ============ التخزين على مستويين ============
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def principal_key(user_id):
+    return f"principal:v{PRINCIPAL_VERSION}:{user_id}"
+
+
+def _local_get(user_id):
+    with _local_lock:
+        entry = _local.get(user_id)
+        if entry is None:
+            return None
+        values, expires_at = entry
+        if expires_at < time.monotonic():
+            del _local[user_id]
+            return None
+        _local.move_to_end(user_id)
+        return values
+
+
+def _local_set(user_id, values):
+    with _local_lock:
+        _local[user_id] = (values, time.monotonic() + settings.PRINCIPAL_LOCAL_CACHE_TTL)
+        _local.move_to_end(user_id)
+        while len(_local) > settings.PRINCIPAL_LOCAL_CACHE_SIZE:
+            _local.popitem(last=False)
+
+
+def load_principal(user_id):
+    """تحميل الهوية باستعلام واحد (LEFT JOIN على العميل والمحفظة). يُرجع None إذا لم يوجد المستخدم."""
+    row = User.objects.filter(pk=user_id).values_list(
+        'is_active', 'customer__id', 'customer__serial', 'customer__is_active', 'customer__wallet__id'
+    ).first()
+    if row is None:
+        return None
+    return Principal(user_id, *row)
+
+
+def get_principal(user_id):
+    values = _local_get(user_id)
+    if values is None:
+        values = _shared_get(user_id)
+        if values is None:
+            principal = load_principal(user_id)
+            if principal is None:
+                return None
+            values = principal.as_tuple()
+            _shared_set(user_id, values)
+        _local_set(user_id, values)
+    return Principal(*values)
+
+
+def _shared_get(user_id):
+    try:
+        return cache.get(principal_key(user_id))
+    except Exception:
+        logger.warning("principal cache unavailable, loading from database", exc_info=True)
+        return None
+
+
+def _shared_set(user_id, values):
+    try:
+        cache.set(principal_key(user_id), values, settings.PRINCIPAL_CACHE_TTL)
+    except Exception:
+        logger.warning("failed to cache principal for user %s", user_id, exc_info=True)
+
+
+def invalidate_principal(user_id):
+    """حذف الهوية من المستويين (العمليات الأخرى تنتهي نسختها المحلية خلال PRINCIPAL_LOCAL_CACHE_TTL)."""
+    if user_id is None:
+        return
+    with _local_lock:
+        _local.pop(user_id, None)
+    cache.delete(principal_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """نفس تحقق JWTAuthentication لكن request.user هو Principal من الكاش."""
+
+    def get_user(self, validated_token):
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            # مقارنة hash كلمة المرور تتطلب كائن User كاملاً
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        principal = get_principal(user_id)
+        if principal is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not principal.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return principal
@@ -0,0 +1,72 @@
+# في accounts/last_login.py
+"""
+تأجيل تحديث last_login وتجميعه.
+
+بدلاً من UPDATE متزامن على auth_user مع كل دخول، تُسجَّل الأوقات في ذاكرة العملية
+وتُكتب دفعة واحدة (UPDATE واحد بـ CASE) كل LAST_LOGIN_FLUSH_INTERVAL ثانية
+من خيط خلفي، وعند إغلاق العملية.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_pending = {}
+_lock = threading.Lock()
+_timer = None
+
+
+def record(user_id, when=None):
+    """تسجيل وقت دخول المستخدم ليُكتب مع الدفعة القادمة."""
+    global _timer
+    with _lock:
+        _pending[user_id] = when or timezone.now()
+        if _timer is None:
+            _timer = threading.Timer(settings.LAST_LOGIN_FLUSH_INTERVAL, _flush_in_background)
+            _timer.daemon = True
+            _timer.start()
+
+
+def flush():
+    """كتابة كل الأوقات المعلقة في استعلام واحد. يُرجع عدد المستخدمين."""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return 0
+
+    try:
+        User.objects.filter(pk__in=pending).update(last_login=Case(
+            *[When(pk=user_id, then=Value(when)) for user_id, when in pending.items()],
+            output_field=DateTimeField()
+        ))
+    except Exception:
+        # إعادة الأوقات للدفعة القادمة بدون الكتابة فوق أوقات أحدث
+        with _lock:
+            for user_id, when in pending.items():
+                _pending.setdefault(user_id, when)
+        raise
+    return len(pending)
+
+
+def _flush_in_background():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush()
+    except Exception:
+        logger.exception("failed to flush buffered last_login updates")
+    finally:
+        # الخيط الخلفي يملك اتصالاً خاصاً به، نغلقه حتى لا يبقى مفتوحاً
+        connection.close()
+
+
+atexit.register(flush)
@@ -0,0 +1,169 @@
+# في accounts/ledger.py
+"""
+دفتر المعاملات (Transaction) المقسم شهرياً ولقطات الأرصدة.
+
+- في PostgreSQL الجدول مقسم تقسيماً تصريحياً (PARTITION BY RANGE (period)).
+- في SQLite يبقى جدولاً واحداً، ويعمل العمود period مع الفهرس (customer, period)
+  كمفتاح توجيه: كل الاستعلامات هنا تُقيَّد بمدى أشهر فتقرأ فقط الأقسام/المجالات المطلوبة.
+- الرصيد التاريخي = آخر لقطة (WalletSnapshot) قبل الشهر المطلوب + مجموع المعاملات بعدها.
+"""
+from django.db import connection, transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from .models import Transaction, WalletSnapshot, period_of
+
+
+def next_period(period):
+    year, month = divmod(period, 100)
+    return (year + 1) * 100 + 1 if month == 12 else period + 1
+
+
+def previous_period(period):
+    year, month = divmod(period, 100)
+    return (year - 1) * 100 + 12 if month == 1 else period - 1
+
+
+DEFAULT_PARTITION = 'accounts_transaction_default'
+
+
+def ensure_partitions(months_ahead=3, start_period=None):
+    """
+    إنشاء أقسام الأشهر القادمة مسبقاً (PostgreSQL فقط).
+    يُرجع قائمة الأقسام التي تم إنشاؤها.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+
+    period = start_period or period_of(timezone.now())
+    created = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [DEFAULT_PARTITION])
+        has_default = cursor.fetchone()[0] is not None
+        for _ in range(months_ahead + 1):
+            name = f"accounts_transaction_p{period}"
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                with transaction.atomic():
+                    _create_partition(cursor, name, period, has_default)
+                created.append(name)
+            period = next_period(period)
+    return created
+
+
+def _create_partition(cursor, name, period, has_default):
+    bounds = f"FOR VALUES FROM ({period}) TO ({next_period(period)})"
+    rows_in_default = False
+    if has_default:
+        cursor.execute(
+            f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE period >= %s AND period < %s LIMIT 1",
+            [period, next_period(period)],
+        )
+        rows_in_default = cursor.fetchone() is not None
+    if not rows_in_default:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF accounts_transaction {bounds}")
+        return
+
+    # القسم الافتراضي يحتوي صفوفاً لهذا الشهر: PostgreSQL يرفض إنشاء القسم مباشرة،
+    # فنفصل القسم الافتراضي وننقل صفوف الشهر إلى القسم الجديد ثم نعيد ربطه (في transaction واحد)
+    in_period = f"period >= {period} AND period < {next_period(period)}"
+    cursor.execute(f"ALTER TABLE accounts_transaction DETACH PARTITION {DEFAULT_PARTITION}")
+    cursor.execute(f"CREATE TABLE {name} PARTITION OF accounts_transaction {bounds}")
+    cursor.execute(f"INSERT INTO accounts_transaction SELECT * FROM {DEFAULT_PARTITION} WHERE {in_period}")
+    cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_period}")
+    cursor.execute(f"ALTER TABLE accounts_transaction ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+
+
+def ledger_state(customer_ids, upto_period, until=None):
+    """
+    حالة الدفتر لمجموعة عملاء حتى نهاية الشهر upto_period (أو حتى اللحظة until داخله).
+    يُرجع {customer_id: (balance, total_deposited, total_spent)}.
+    استعلامان فقط مهما كان عدد العملاء: آخر اللقطات + ذيل المعاملات بعدها.
+    """
+    customer_ids = list(customer_ids)
+    if not customer_ids:
+        return {}
+
+    latest = WalletSnapshot.objects.filter(
+        customer_id=OuterRef('customer_id'),
+        period__lt=upto_period
+    ).order_by('-period').values('period')[:1]
+    snapshots = WalletSnapshot.objects.filter(
+        customer_id__in=customer_ids,
+        period=Subquery(latest)
+    ).values_list('customer_id', 'period', 'balance', 'total_deposited', 'total_spent')
+
+    state = {cid: [0, 0, 0] for cid in customer_ids}
+    snapshot_periods = {}
+    for cid, period, balance, deposited, spent in snapshots:
+        state[cid] = [balance, deposited, spent]
+        snapshot_periods[cid] = period
+
+    # الذيل: المعاملات بعد أقدم لقطة في المجموعة فقط (تقليم الأقسام)
+    tail = Transaction.objects.filter(customer_id__in=customer_ids, period__lte=upto_period)
+    if len(snapshot_periods) == len(customer_ids):
+        tail = tail.filter(period__gt=min(snapshot_periods.values()))
+    if until is not None:
+        tail = tail.filter(timestamp__lte=until)
+    tail = tail.values('customer_id', 'period').annotate(
+        deposited=Sum('amount', filter=Q(amount__gt=0)),
+        spent=Sum('amount', filter=Q(amount__lt=0)),
+    )
+
+    for row in tail:
+        cid = row['customer_id']
+        if row['period'] <= snapshot_periods.get(cid, 0):
+            continue
+        deposited = row['deposited'] or 0
+        spent = -(row['spent'] or 0)
+        state[cid][0] += deposited - spent
+        state[cid][1] += deposited
+        state[cid][2] += spent
+
+    return {cid: tuple(values) for cid, values in state.items()}
+
+
+def balance_at(customer, when=None):
+    """رصيد العميل (balance, total_deposited, total_spent) في لحظة معينة."""
+    when = when or timezone.now()
+    return ledger_state([customer.pk], period_of(when), until=when)[customer.pk]
+
+
+def take_snapshots(period, chunk_size=2000):
+    """
+    أخذ لقطات نهاية الشهر period للعملاء الذين لديهم معاملات فيه.
+    العملية قابلة للتكرار: اللقطات الموجودة لا تُستبدل.
+    """
+    customers = Transaction.objects.filter(period=period).values_list(
+        'customer_id', flat=True
+    ).distinct().order_by('customer_id')
+
+    created = 0
+    chunk = []
+    for customer_id in customers.iterator(chunk_size=chunk_size):
+        chunk.append(customer_id)
+        if len(chunk) >= chunk_size:
+            created += _snapshot_chunk(chunk, period)
+            chunk = []
+    if chunk:
+        created += _snapshot_chunk(chunk, period)
+    return created
+
+
+def _snapshot_chunk(customer_ids, period):
+    existing = set(WalletSnapshot.objects.filter(
+        customer_id__in=customer_ids, period=period
+    ).values_list('customer_id', flat=True))
+    customer_ids = [cid for cid in customer_ids if cid not in existing]
+    state = ledger_state(customer_ids, period)
+    snapshots = [
+        WalletSnapshot(
+            customer_id=cid,
+            period=period,
+            balance=balance,
+            total_deposited=deposited,
+            total_spent=spent
+        )
+        for cid, (balance, deposited, spent) in state.items()
+    ]
+    return len(WalletSnapshot.objects.bulk_create(snapshots, ignore_conflicts=True))
@@ -0,0 +1,62 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User, update_last_login
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts import last_login
+from accounts.models import Customer, Wallet
+from accounts.serializers import CustomTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "قياس مسار الدخول بالسيريال: عدد الاستعلامات و p50/p99 لكل دخول، "
+        "مقارنة بالمسار القديم. البيانات المؤقتة تُلغى في النهاية (rollback)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench_login_user')
+            customer = Customer.objects.create(user=user, is_active=True, name='bench')
+            Wallet.objects.create(customer=customer)
+
+            self.report('legacy', iterations, lambda: self.legacy_login(customer.serial))
+            self.report('current', iterations, lambda: self.current_login(customer.serial))
+
+            transaction.set_rollback(True)
+        # الأوقات المسجلة تخص مستخدماً تم حذفه بالـ rollback
+        last_login._pending.clear()
+
+    def current_login(self, serial):
+        serializer = CustomTokenObtainPairSerializer(data={'serial': serial})
+        serializer.is_valid(raise_exception=True)
+
+    def legacy_login(self, serial):
+        # المسار السابق: العميل ثم المستخدم بشكل كسول ثم user.customer ثم UPDATE متزامن
+        customer = Customer.objects.get(serial=serial)
+        user = User.objects.get(pk=customer.user_id)
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
+        str(refresh), str(refresh.access_token)
+        update_last_login(None, user)
+
+    def report(self, label, iterations, login):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                login()
+                timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{label:<8} | استعلامات/دخول: {len(queries.captured_queries) / iterations:.1f} | "
+            f"p50: {statistics.median(timings):.2f}ms | p99: {p99:.2f}ms"
+        )
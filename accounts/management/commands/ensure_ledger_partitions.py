@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from accounts.ledger import ensure_partitions
+
+
+class Command(BaseCommand):
+    help = "إنشاء أقسام دفتر المعاملات الشهرية مسبقاً (PostgreSQL فقط). يُشغَّل دورياً عبر cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=3, help="عدد الأشهر القادمة المطلوب تجهيزها")
+
+    def handle(self, *args, **options):
+        created = ensure_partitions(months_ahead=options['months'])
+        for name in created:
+            self.stdout.write(f"✅ {name}")
+        self.stdout.write(self.style.SUCCESS(f"تم إنشاء {len(created)} قسم جديد"))
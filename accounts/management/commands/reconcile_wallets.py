@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.ledger import ledger_state
+from accounts.models import Wallet, period_of
+
+
+class Command(BaseCommand):
+    help = (
+        "مطابقة balance/total_deposited/total_spent لكل محفظة مع دفتر المعاملات "
+        "(لقطة + ذيل) على دفعات بذاكرة ثابتة، بـ transaction لكل دفعة."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--fix', action='store_true', help="تصحيح المحافظ المختلفة لتطابق الدفتر")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        period = period_of(timezone.now())
+        self.checked = 0
+        self.mismatched = 0
+        self.fixed = 0
+
+        wallets = Wallet.objects.order_by('customer_id').values_list(
+            'customer_id', 'balance', 'total_deposited', 'total_spent'
+        )
+        # ترقيم keyset على customer_id، و transaction قصير لكل دفعة بدلاً من واحد طويل للمسح كله
+        last_id = None
+        while True:
+            with transaction.atomic():
+                page = wallets if last_id is None else wallets.filter(customer_id__gt=last_id)
+                chunk = list(page[:chunk_size])
+                if not chunk:
+                    break
+                self.reconcile_chunk(chunk, period, options['fix'])
+            last_id = chunk[-1][0]
+
+        style = self.style.SUCCESS if not self.mismatched else self.style.WARNING
+        self.stdout.write(style(
+            f"تم فحص {self.checked} محفظة | غير مطابقة: {self.mismatched} | تم تصحيح: {self.fixed}"
+        ))
+
+    def reconcile_chunk(self, chunk, period, fix):
+        state = ledger_state([row[0] for row in chunk], period)
+        for customer_id, balance, deposited, spent in chunk:
+            self.checked += 1
+            expected = state[customer_id]
+            if (balance, deposited, spent) == expected:
+                continue
+
+            self.mismatched += 1
+            self.stdout.write(
+                f"⚠️  العميل {customer_id}: المحفظة {(balance, deposited, spent)} ≠ الدفتر {expected}"
+            )
+            if fix:
+                # تحديث مشروط بالقيم المقروءة حتى لا نلغي عملية متزامنة
+                self.fixed += Wallet.objects.filter(
+                    customer_id=customer_id,
+                    balance=balance,
+                    total_deposited=deposited,
+                    total_spent=spent
+                ).update(
+                    balance=expected[0],
+                    total_deposited=expected[1],
+                    total_spent=expected[2]
+                )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from accounts import account_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "تعبئة مخزون الحسابات المؤقتة الجاهزة حتى الحد المطلوب. "
+        "مع --loop يعمل كعامل خلفي يفحص المخزون كل --interval ثانية."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watermark', type=int, help="الحد المطلوب (الافتراضي: ACCOUNT_POOL_WATERMARK)")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument('--interval', type=int, default=30)
+
+    def handle(self, *args, **options):
+        while True:
+            added = account_pool.replenish(options['watermark'], options['batch_size'])
+            stats = account_pool.pool_stats()
+            self.stdout.write(
+                f"📦 المخزون: {stats['depth']}/{stats['watermark']} | أضيف: {added} | "
+                f"حُجز: {stats['claimed']} | نفاد: {stats['misses']}"
+            )
+            if not options['loop']:
+                break
+            connection.close()
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.ledger import previous_period, take_snapshots
+from accounts.models import period_of
+
+
+class Command(BaseCommand):
+    help = "أخذ لقطات أرصدة المحافظ لنهاية شهر مغلق (الافتراضي: الشهر السابق)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', type=int, help="الشهر بصيغة YYYYMM")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        current = period_of(timezone.now())
+        period = options['period'] or previous_period(current)
+        if period >= current:
+            raise CommandError("لا يمكن أخذ لقطة لشهر لم يُغلق بعد.")
+
+        created = take_snapshots(period, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ {created} لقطة للشهر {period}"))
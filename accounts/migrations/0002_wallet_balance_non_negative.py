@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="wallet",
+            constraint=models.CheckConstraint(
+                check=models.Q(("balance__gte", 0)), name="wallet_balance_non_negative"
+            ),
+        ),
+    ]
@@ -0,0 +1,193 @@
+# Generated by Django 4.2 on 2026-10-18 08:35
+
+import accounts.models
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def backfill_periods(apps, schema_editor):
+    # حساب شهر الدفتر (YYYYMM) للمعاملات الموجودة من timestamp
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute(
+            "UPDATE accounts_transaction SET period = "
+            "(EXTRACT(YEAR FROM timestamp AT TIME ZONE 'UTC') * 100"
+            " + EXTRACT(MONTH FROM timestamp AT TIME ZONE 'UTC'))::integer"
+        )
+    elif connection.vendor == "sqlite":
+        schema_editor.execute(
+            "UPDATE accounts_transaction SET period = "
+            "CAST(strftime('%Y%m', timestamp) AS INTEGER)"
+        )
+    else:
+        Transaction = apps.get_model("accounts", "Transaction")
+        for txn in Transaction.objects.only("timestamp").iterator():
+            Transaction.objects.filter(pk=txn.pk).update(
+                period=txn.timestamp.year * 100 + txn.timestamp.month
+            )
+
+
+def _next_period(period):
+    year, month = divmod(period, 100)
+    return (year + 1) * 100 + 1 if month == 12 else period + 1
+
+
+def partition_ledger(apps, schema_editor):
+    """
+    تحويل accounts_transaction إلى جدول مقسم شهرياً (RANGE على period) في PostgreSQL.
+    في SQLite يبقى الجدول كما هو ويعمل period + الفهرس (customer, period) كمفتاح توجيه.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    execute = schema_editor.execute
+    execute(
+        "ALTER TABLE accounts_transaction RENAME TO accounts_transaction_unpartitioned"
+    )
+    execute(
+        "CREATE TABLE accounts_transaction "
+        "(LIKE accounts_transaction_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (period)"
+    )
+
+    # أعمدة IDENTITY غير مدعومة على الجداول المقسمة في كل الإصدارات، نستخدم sequence عادية
+    execute(
+        "CREATE SEQUENCE accounts_transaction_ledger_id_seq OWNED BY accounts_transaction.id"
+    )
+    execute(
+        "SELECT setval('accounts_transaction_ledger_id_seq', "
+        "COALESCE((SELECT MAX(id) FROM accounts_transaction_unpartitioned), 0) + 1, false)"
+    )
+    execute(
+        "ALTER TABLE accounts_transaction ALTER COLUMN id "
+        "SET DEFAULT nextval('accounts_transaction_ledger_id_seq')"
+    )
+
+    # أقسام للأشهر الموجودة + الشهر الحالي والأشهر الثلاثة القادمة + قسم افتراضي
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT period FROM accounts_transaction_unpartitioned")
+        periods = {row[0] for row in cursor.fetchall()}
+    now = timezone.now()
+    period = now.year * 100 + now.month
+    for _ in range(4):
+        periods.add(period)
+        period = _next_period(period)
+    for period in sorted(periods):
+        execute(
+            f"CREATE TABLE accounts_transaction_p{period} PARTITION OF accounts_transaction "
+            f"FOR VALUES FROM ({period}) TO ({_next_period(period)})"
+        )
+    execute(
+        "CREATE TABLE accounts_transaction_default PARTITION OF accounts_transaction DEFAULT"
+    )
+
+    execute(
+        "INSERT INTO accounts_transaction SELECT * FROM accounts_transaction_unpartitioned"
+    )
+    execute("DROP TABLE accounts_transaction_unpartitioned")
+
+    # القيود بعد النسخ: مفتاح أجنبي مؤجَّل قبل INSERT يترك أحداث trigger معلقة
+    # تمنع CREATE INDEX التالي في نفس الـ transaction.
+    # مفتاح التقسيم يجب أن يكون جزءاً من المفتاح الأساسي
+    execute("ALTER TABLE accounts_transaction ADD PRIMARY KEY (id, period)")
+    execute(
+        "ALTER TABLE accounts_transaction ADD CONSTRAINT accounts_transaction_customer_id_fk "
+        "FOREIGN KEY (customer_id) REFERENCES accounts_customer (id) "
+        "DEFERRABLE INITIALLY DEFERRED"
+    )
+
+
+def unpartition_ledger(apps, schema_editor):
+    """العكس: نسخ الدفتر إلى جدول عادي بمفتاح أساسي (id) وحذف الجدول المقسم وأقسامه."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    execute = schema_editor.execute
+    execute("ALTER TABLE accounts_transaction RENAME TO accounts_transaction_partitioned")
+    execute(
+        "CREATE TABLE accounts_transaction "
+        "(LIKE accounts_transaction_partitioned INCLUDING DEFAULTS)"
+    )
+    execute(
+        "INSERT INTO accounts_transaction SELECT * FROM accounts_transaction_partitioned"
+    )
+    # حذف الجدول المقسم يحذف sequence الدفتر معه؛ id يعود عمود IDENTITY كما أنشأه Django
+    execute("ALTER TABLE accounts_transaction ALTER COLUMN id DROP DEFAULT")
+    execute("DROP TABLE accounts_transaction_partitioned CASCADE")
+    execute(
+        "ALTER TABLE accounts_transaction ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY"
+    )
+    execute(
+        "SELECT setval(pg_get_serial_sequence('accounts_transaction', 'id'), "
+        "COALESCE((SELECT MAX(id) FROM accounts_transaction), 0) + 1, false)"
+    )
+    # القيود بعد النسخ: مفتاح أجنبي مؤجَّل قبل INSERT يترك أحداث trigger معلقة
+    # تمنع ALTER TABLE التالي (حذف العمود period) في نفس الـ transaction
+    execute("ALTER TABLE accounts_transaction ADD PRIMARY KEY (id)")
+    execute(
+        "ALTER TABLE accounts_transaction ADD CONSTRAINT accounts_transaction_customer_id_fk "
+        "FOREIGN KEY (customer_id) REFERENCES accounts_customer (id) "
+        "DEFERRABLE INITIALLY DEFERRED"
+    )
+    execute(
+        "CREATE INDEX accounts_transaction_customer_id_idx ON accounts_transaction (customer_id)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_wallet_balance_non_negative"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WalletSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period", models.IntegerField()),
+                ("balance", models.IntegerField()),
+                ("total_deposited", models.IntegerField()),
+                ("total_spent", models.IntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="period",
+            field=accounts.models.LedgerPeriodField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_periods, migrations.RunPython.noop),
+        migrations.RunPython(partition_ledger, unpartition_ledger),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["customer", "period"], name="txn_customer_period_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="walletsnapshot",
+            name="customer",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="wallet_snapshots",
+                to="accounts.customer",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="walletsnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("customer", "period"), name="unique_wallet_snapshot_period"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_ledger_partitions_and_snapshots"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["customer", "-timestamp", "-id"], name="txn_customer_ts_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_transaction_history_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customer",
+            name="is_pooled",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(
+                condition=models.Q(("is_pooled", True)),
+                fields=["id"],
+                name="customer_pooled_idx",
+            ),
+        ),
+    ]
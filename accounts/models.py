@@ -1,5 +1,6 @@
 # في accounts/models.py
 from django.db import models
+from django.utils import timezone
 import random
 import string
 from django.contrib.auth.models import User # لاستخدام نموذج المستخدم الافتراضي لـ JWT
@@ -13,6 +14,18 @@ def generate_serial():
     chars = string.ascii_letters + string.digits
     return ''.join(random.choices(chars, k=15)) 
 
+# دالة لحساب شهر الدفتر (YYYYMM) لتاريخ معين - مفتاح تقسيم جدول المعاملات
+def period_of(dt):
+    return dt.year * 100 + dt.month
+
+# حقل شهر الدفتر: يُحسب تلقائياً من timestamp عند الإدراج (يعمل أيضاً مع bulk_create)
+class LedgerPeriodField(models.IntegerField):
+    def pre_save(self, model_instance, add):
+        if add:
+            timestamp = getattr(model_instance, 'timestamp', None) or timezone.now()
+            setattr(model_instance, self.attname, period_of(timestamp))
+        return super().pre_save(model_instance, add)
+
 class Customer(models.Model):
     # الطول 15 كما هو مطلوب
     serial = models.CharField(max_length=15, unique=True, default=generate_serial)
@@ -27,6 +40,14 @@ class Customer(models.Model):
     
     # ربط العميل بكائن User الافتراضي لتشغيل SimpleJWT بشكل صحيح
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True) 
+    
+    # حساب مُجهز مسبقاً في المخزون ولم يُحجز بعد (انظر account_pool)
+    is_pooled = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(is_pooled=True), name='customer_pooled_idx'),
+        ]
 
     def __str__(self):
         return f"{self.serial} - {self.name or 'TEMP'}"
@@ -38,6 +59,12 @@ class Wallet(models.Model):
     total_deposited = models.IntegerField(default=0) 
     total_spent = models.IntegerField(default=0)     
     
+    class Meta:
+        constraints = [
+            # الرصيد لا يمكن أن يصبح سالباً حتى لو تم تجاوز التحقق في الكود
+            models.CheckConstraint(check=models.Q(balance__gte=0), name='wallet_balance_non_negative'),
+        ]
+    
     def __str__(self):
         return f"Wallet for {self.customer.serial} - Balance: {self.balance}"
 
@@ -54,6 +81,34 @@ class Transaction(models.Model):
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES) 
     description = models.TextField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # شهر المعاملة: مفتاح التقسيم الشهري في PostgreSQL ومفتاح التوجيه في SQLite
+    # (يجب أن يبقى بعد timestamp ليُحسب من قيمته)
+    period = LedgerPeriodField(editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'period'], name='txn_customer_period_idx'),
+            # سجل المعاملات (الأحدث أولاً) بترقيم keyset على (timestamp, id)
+            models.Index(fields=['customer', '-timestamp', '-id'], name='txn_customer_ts_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.customer.serial} - {self.transaction_type} ({self.amount})"
+
+# نموذج WalletSnapshot (لقطة رصيد شهرية)
+# الرصيد في أي لحظة = آخر لقطة قبلها + مجموع المعاملات بعدها (بدلاً من SUM كامل للدفتر)
+class WalletSnapshot(models.Model):
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='wallet_snapshots')
+    period = models.IntegerField() # آخر شهر مشمول في اللقطة (YYYYMM)
+    balance = models.IntegerField()
+    total_deposited = models.IntegerField()
+    total_spent = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'period'], name='unique_wallet_snapshot_period'),
+        ]
     
     def __str__(self):
-        return f"{self.customer.serial} - {self.transaction_type} ({self.amount})"
\ No newline at end of file
+        return f"Snapshot {self.customer_id} @ {self.period} - Balance: {self.balance}"
\ No newline at end of file
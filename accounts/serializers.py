@@ -1,17 +1,23 @@
 # في accounts/serializers.py
 from rest_framework import serializers
 from .models import Customer, Wallet, Transaction
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from . import wallet_ops, account_pool
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import TokenError
+from .tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from . import last_login
 from django.utils import timezone
 from datetime import timedelta
 from django.db import transaction
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate
+from config.projections import ProjectionSerializer
 
 # [ملاحظة]: يجب التأكد من وجود هذه الملفات والوحدات ليعمل الكود
-from sales.models import ChargeCode 
+from sales.models import ChargeCode, CHARGE_CODE_LENGTH, is_well_formed_charge_code
+from sales import code_filter
 from notifications.utils import create_notification 
 
 # **************************************************
@@ -21,7 +27,9 @@ from notifications.utils import create_notification
 # 1. تخصيص الدخول: استخدام السيريال (Serial) بدلاً من اسم المستخدم
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     # نغير الحقل الأساسي من 'username' إلى 'serial'
+    username_field = 'serial'
     default_field_names = ['serial']
+    token_class = RefreshToken
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -34,6 +42,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         # إضافة بيانات العميل إلى التوكن (Payload)
         try:
             customer = user.customer
+            token['customer_id'] = customer.id
             token['serial'] = customer.serial
             token['is_active'] = customer.is_active
         except Customer.DoesNotExist:
@@ -45,7 +54,8 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         serial = attrs.get('serial')
 
         try:
-            customer = Customer.objects.get(serial=serial)
+            # استعلام واحد للعميل والمستخدم معاً (select_related يملأ أيضاً user.customer لـ get_token)
+            customer = Customer.objects.select_related('user').get(serial=serial)
         except Customer.DoesNotExist:
             raise serializers.ValidationError("Serial غير صالح.")
         
@@ -62,6 +72,10 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         
         # إتمام عملية الدخول للحصول على التوكن
         refresh = self.get_token(user)
+        
+        # تحديث last_login مؤجل ويُكتب على دفعات
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            last_login.record(user.pk)
 
         data = {}
         data['refresh'] = str(refresh)
@@ -74,6 +88,29 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         return data
 
+# تجديد التوكن: التوكن القديم يُلغى في القائمة السوداء (Redis) عند التدوير
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+# تسجيل الخروج: إلغاء توكن التحديث حتى انتهاء صلاحيته
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        try:
+            self.token = RefreshToken(attrs['refresh'])
+        except TokenError as e:
+            raise serializers.ValidationError({"refresh": str(e)})
+        return attrs
+
+    def save(self, **kwargs):
+        try:
+            self.token.blacklist()
+        except TokenError:
+            # ملغى بالفعل: تسجيل الخروج ناجح في الحالتين
+            pass
+
 # 2. استرداد السيريال (بالهاتف والبين)
 class SerialRecoverySerializer(serializers.Serializer):
     phone = serializers.CharField(max_length=15)
@@ -102,22 +139,20 @@ class SerialRecoverySerializer(serializers.Serializer):
 class TemporaryCreationSerializer(serializers.Serializer):
     
     def create(self, validated_data):
-        # 1. إنشاء كائن User (اللازم لـ JWT)
-        # نستخدم اسم مستخدم وهمي فريد هنا (يمكن أن يكون السيريال نفسه)
-        temp_username = f"temp_{timezone.now().timestamp()}_{random.randint(1000, 9999)}"
-        user = User.objects.create_user(username=temp_username) 
-        user.is_active = False # تعطيل المستخدم مؤقتاً في User Model أيضاً
-        user.save()
-        
-        # 2. إنشاء العميل المؤقت (Serial, Pin يتولد، Name/Phone فارغين)
-        # is_active = False افتراضياً
-        customer = Customer.objects.create(user=user) 
-        
-        # 3. إنشاء محفظة Wallet للعميل
-        Wallet.objects.create(customer=customer)
-        
-        # 4. منح توكن JWT للدخول المؤقت
-        refresh = RefreshToken.for_user(user)
+        # 1. حجز حساب جاهز (User + Customer + Wallet) من المخزون بعملية ذرية واحدة
+        customer = account_pool.claim()
+        if customer is None:
+            # المخزون فارغ: إنشاء الحساب مباشرة (Serial, Pin يتولد، Name/Phone فارغين)
+            customer = account_pool.create_account()
+        return self.credentials(customer)
+
+    @staticmethod
+    def credentials(customer):
+        """بيانات الدخول للحساب المؤقت، وتُبنى من جديد عند إعادة الطلب بنفس Idempotency-Key."""
+        # منح توكن JWT للدخول المؤقت (بدون تحميل كائن User من قاعدة البيانات)
+        user = User(pk=customer.user_id)
+        user.customer = customer
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
 
         return {
             'refresh': str(refresh),
@@ -136,6 +171,8 @@ class FinalActivationSerializer(serializers.Serializer):
     def validate(self, attrs):
         phone = attrs.get('phone')
         customer = self.context['request'].user.customer # العميل المسجل دخوله حالياً
+        # الهوية المخزنة لا تحمل هذه الحقول: نقرؤها معاً في استعلام واحد
+        customer.refresh_from_db(fields=['created_at', 'name'])
         
         # التحقق من أن رقم الهاتف لم يُسجل من قبل في أي حساب آخر
         if Customer.objects.filter(phone=phone).exclude(id=customer.id).exists():
@@ -152,33 +189,28 @@ class FinalActivationSerializer(serializers.Serializer):
         return attrs
 
     def update(self, instance, validated_data):
-        # instance هنا هو كائن User المرتبط بالعميل
-        customer = instance.customer
+        # instance هنا هو كائن العميل المسجل دخوله
+        customer = instance
         
-        # 1. تحديث بيانات العميل وتفعيله
+        # 1. تفعيل كائن المستخدم أولاً (UPDATE لا يطلق إشارات)
+        User.objects.filter(pk=customer.user_id).update(is_active=True)
+        
+        # تحديث بيانات العميل وتفعيله (save يكتب الحقول المحملة فقط،
+        # وإشارة الحفظ تُلغي الهوية المخزنة للمستخدم)
         customer.name = validated_data.get('name', customer.name)
         customer.phone = validated_data.get('phone', customer.phone)
         customer.is_active = True # تفعيل الحساب
         customer.save()
         
-        # تفعيل كائن المستخدم أيضاً
-        instance.is_active = True
-        instance.save()
-        
         # 2. إضافة الرصيد الأولي 
-        wallet = customer.wallet 
         initial_balance = 100 
         
         with transaction.atomic():
-            wallet.balance += initial_balance
-            wallet.total_deposited += initial_balance
-            wallet.save()
-            
-            # 3. تسجيل المعاملة
-            Transaction.objects.create(
-                customer=customer,
-                amount=initial_balance,
-                transaction_type='INITIAL',
+            # 3. تحديث المحفظة وتسجيل المعاملة في عملية ذرية واحدة
+            wallet_ops.credit(
+                customer,
+                initial_balance,
+                'INITIAL',
                 description="تفعيل الحساب الأولي بعد إضافة البيانات الشخصية"
             )
             
@@ -235,11 +267,15 @@ class ReactivationSerializer(serializers.Serializer):
 
 # 6. شحن الرصيد بكود الشحن
 class RechargeByCodeSerializer(serializers.Serializer):
-    charge_code = serializers.CharField(max_length=12)
+    charge_code = serializers.CharField(max_length=CHARGE_CODE_LENGTH)
 
     def validate(self, attrs):
         code = attrs.get('charge_code')
         
+        # رفض الأكواد المشوهة (حرف التحقق) وغير الموجودة (فلتر Bloom) بدون قاعدة البيانات
+        if not is_well_formed_charge_code(code) or not code_filter.might_exist(code):
+            raise serializers.ValidationError({"charge_code": "كود الشحن غير صالح."})
+        
         try:
             # يجب أن يكون ChargeCode مرتبطاً بـ SubscriptionPackage عبر foreign key
             charge_code_obj = ChargeCode.objects.select_related('package').get(code=code)
@@ -256,37 +292,34 @@ class RechargeByCodeSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         customer = self.context['request'].user.customer # العميل المسجل دخوله
-        wallet = customer.wallet 
         
         with transaction.atomic():
-            # 1. تحديث حالة كود الشحن
-            self.charge_code_obj.is_used = True
-            self.charge_code_obj.activated_by = customer
-            self.charge_code_obj.activation_date = timezone.now()
-            self.charge_code_obj.save()
-            
-            # 2. تحديث رصيد المحفظة
-            wallet.balance += self.recharge_value
-            wallet.total_deposited += self.recharge_value
-            wallet.save()
+            # 1. تحديث حالة كود الشحن (UPDATE مشروط: يمنع استخدام نفس الكود مرتين بالتزامن)
+            claimed = ChargeCode.objects.filter(pk=self.charge_code_obj.pk, is_used=False).update(
+                is_used=True,
+                activated_by=customer,
+                activation_date=timezone.now()
+            )
+            if not claimed:
+                raise serializers.ValidationError({"charge_code": "هذا الكود تم استخدامه بالفعل."})
             
-            # 3. تسجيل المعاملة
-            Transaction.objects.create(
-                customer=customer,
-                amount=self.recharge_value,
-                transaction_type='CHARGE',
+            # 2. تحديث رصيد المحفظة وتسجيل المعاملة
+            new_balance = wallet_ops.credit(
+                customer,
+                self.recharge_value,
+                'CHARGE',
                 description=f"شحن رصيد بواسطة الكود: {self.charge_code_obj.code}"
             )
             
-            # 4. تحفيز الإشعار
+            # 3. تحفيز الإشعار
             create_notification(
                 customer, 
                 title="تم شحن الرصيد بنجاح!",
-                message=f"تم إضافة {self.recharge_value} كوينز إلى محفظتك. رصيدك الحالي: {wallet.balance}."
+                message=f"تم إضافة {self.recharge_value} كوينز إلى محفظتك. رصيدك الحالي: {new_balance}."
             )
             
             return {
-                'new_balance': wallet.balance,
+                'new_balance': new_balance,
                 'recharged_amount': self.recharge_value,
                 'message': 'تم شحن الحساب بنجاح.'
             }
@@ -299,6 +332,16 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = ('amount', 'transaction_type', 'description', 'timestamp')
 
 
+# 7.ب نسخة سريعة لسجل المعاملات (من values() بدون كائنات نماذج)
+class TransactionProjection(ProjectionSerializer):
+    fields = {
+        'amount': 'amount',
+        'transaction_type': 'transaction_type',
+        'description': 'description',
+        'timestamp': 'timestamp',
+    }
+
+
 # 8. Serializer لعرض حالة المحفظة الكاملة
 class WalletStatusSerializer(serializers.ModelSerializer):
     recent_transactions = serializers.SerializerMethodField()
@@ -310,5 +353,18 @@ class WalletStatusSerializer(serializers.ModelSerializer):
     def get_recent_transactions(self, obj):
         # obj هو كائن Wallet
         # جلب آخر 10 معاملات لهذا العميل
-        transactions = Transaction.objects.filter(customer=obj.customer).order_by('-timestamp')[:10]
-        return TransactionSerializer(transactions, many=True).data
\ No newline at end of file
+        transactions = Transaction.objects.filter(customer_id=obj.customer_id).order_by('-timestamp', '-id')[:10]
+        return TransactionSerializer(transactions, many=True).data
+
+
+# 9. Serializer للتحقق من فلاتر سجل المعاملات (query params)
+class TransactionHistoryFilterSerializer(serializers.Serializer):
+    transaction_type = serializers.ChoiceField(choices=Transaction.TRANSACTION_TYPES, required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        since, until = attrs.get('since'), attrs.get('until')
+        if since and until and since > until:
+            raise serializers.ValidationError({"since": "تاريخ البداية بعد تاريخ النهاية."})
+        return attrs
\ No newline at end of file
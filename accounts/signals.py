@@ -0,0 +1,34 @@
+# في accounts/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+
+from .authentication import invalidate_principal
+from .models import Customer, Wallet
+from .wallet_cache import schedule_refresh
+
+
+# تعديلات المحفظة خارج wallet_ops (مثل WalletInline في لوحة الإدارة) تُحدّث الكاش أيضاً
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+def refresh_wallet_status_cache(sender, instance, **kwargs):
+    schedule_refresh(instance.customer_id)
+
+
+# الهوية المخزنة للمصادقة (accounts.authentication) تتبع حالة المستخدم والعميل.
+# الإبطال بعد الـ commit: لو تم قبله لأعاد طلب متزامن تخزين الحالة القديمة من قاعدة البيانات.
+# robust: فشل الكاش يُسجَّل ولا يُفشل الحفظ الذي ثبت بالفعل
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_principal(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_principal(user_id), robust=True)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer_principal(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_principal(user_id), robust=True)
+
@@ -1,3 +1,269 @@
-from django.test import TestCase
+# في accounts/tests.py
+import pickle
+import uuid
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from config import throttling
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from products.models import Category, TechnicalFile
+from sales.models import ChargeCode, Purchase, SubscriptionPackage
+from sales.views import purchase_file
+
+from .account_pool import create_account
+from . import authentication, wallet_ops
+from .authentication import get_principal
+from .models import Customer, Transaction, Wallet
+from .serializers import CustomTokenObtainPairSerializer, RechargeByCodeSerializer
+from .views import CustomTokenObtainPairView, CustomTokenRefreshView, LogoutView, TemporaryCreationView
+
+
+@override_settings(IDEMPOTENCY_ACCOUNT_TTL=300)
+class TemporaryCreationIdempotencyTests(TestCase):
+    """إنشاء الحساب المؤقت مع Idempotency-Key: نفس الحساب عند الإعادة، ولا بيانات دخول في الكاش."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.key = str(uuid.uuid4())
+
+    def post(self, key=None, address='203.0.113.7', **extra):
+        request = APIRequestFactory(HTTP_HOST='localhost').post(
+            '/api/accounts/temporary/', {}, format='json',
+            REMOTE_ADDR=address, HTTP_IDEMPOTENCY_KEY=key or self.key, **extra
+        )
+        return TemporaryCreationView.as_view()(request)
+
+    def test_retry_returns_same_account(self):
+        first = self.post()
+        second = self.post()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        for field in ('customer_id', 'serial', 'pin'):
+            self.assertEqual(first.data[field], second.data[field])
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_credentials_are_not_cached(self):
+        response = self.post()
+        values = [pickle.loads(value) for value in cache._cache.values()]
+        records = [value for value in values if isinstance(value, dict) and 'fingerprint' in value]
+        self.assertEqual([record['data'] for record in records], [{'customer_id': response.data['customer_id']}])
+
+    def test_forwarded_for_does_not_select_another_caller(self):
+        self.post(address='203.0.113.7')
+        response = self.post(address='198.51.100.9', HTTP_X_FORWARDED_FOR='203.0.113.7')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_activated_account_is_not_replayed(self):
+        first = self.post()
+        Customer.objects.filter(pk=first.data['customer_id']).update(name='عميل')
+        second = self.post()
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertNotEqual(first.data['customer_id'], second.data['customer_id'])
+
+    def test_short_anonymous_key_is_rejected(self):
+        self.assertEqual(self.post(key='1').status_code, 400)
+        self.assertEqual(Customer.objects.count(), 0)
+
+    def test_cache_read_failure_serves_request(self):
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError):
+            response = self.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_cache_write_failure_keeps_response(self):
+        with mock.patch.object(cache, 'set', side_effect=ConnectionError), \
+                mock.patch.object(cache, 'delete', side_effect=ConnectionError):
+            response = self.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Customer.objects.count(), 1)
+
+
+class WalletStatusCacheFailureTests(TestCase):
+    """الكاش معطل بعد commit الخصم: الشراء ينجح والخصم مرة واحدة."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.customer = create_account()
+        Wallet.objects.filter(customer=self.customer).update(balance=100)
+        category = Category.objects.create(name='wallet-cache')
+        self.file = TechnicalFile.objects.create(
+            category=category, title='ملف', description='-', price_coins=30,
+            file_url='https://files.example.com/a.zip',
+        )
+
+    def test_purchase_succeeds_when_refresh_fails(self):
+        request = APIRequestFactory(HTTP_HOST='localhost').post(
+            '/api/sales/purchases/', {'file_id': self.file.id}, format='json'
+        )
+        force_authenticate(request, user=get_principal(self.customer.user_id))
+        with mock.patch.object(cache, 'incr', side_effect=ConnectionError), \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = purchase_file(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertGreater(len(callbacks), 1)
+        self.assertEqual(Wallet.objects.get(customer=self.customer).balance, 70)
+        self.assertEqual(Transaction.objects.filter(customer=self.customer, transaction_type='PURCHASE').count(), 1)
+        self.assertEqual(Purchase.objects.filter(customer=self.customer).count(), 1)
+
+
+class PrincipalCacheFailureTests(TestCase):
+    """الهوية المخزنة مع كاش معطل: تُحمَّل من قاعدة البيانات، والحفظ لا يفشل بعد الـ commit."""
+
+    def setUp(self):
+        authentication._local.clear()
+        self.addCleanup(authentication._local.clear)
+        self.customer = create_account()
+
+    def test_get_principal_falls_back_to_database(self):
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError), \
+                mock.patch.object(cache, 'set', side_effect=ConnectionError):
+            principal = get_principal(self.customer.user_id)
+        self.assertEqual(principal.customer_id, self.customer.id)
+        self.assertEqual(principal.serial, self.customer.serial)
+
+    def test_save_survives_failed_invalidation(self):
+        get_principal(self.customer.user_id)
+        with mock.patch.object(cache, 'delete', side_effect=ConnectionError), \
+                self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.get(pk=self.customer.pk).save()
+        # النسخة المحلية أُبطلت قبل محاولة الكاش المشترك
+        self.assertIsNone(authentication._local_get(self.customer.user_id))
+
+
+class WalletOpsTests(TestCase):
+    """الخصم والإضافة الذريان على فرعي _apply: UPDATE ... RETURNING و F() ثم القراءة."""
+
+    def setUp(self):
+        self.customer = create_account()
+        Wallet.objects.filter(customer=self.customer).update(balance=100)
+
+    def branches(self):
+        for returning in (True, False):
+            with self.subTest(returning=returning), \
+                    mock.patch.object(connection.features, 'can_return_columns_from_insert', returning):
+                yield
+
+    def wallet(self):
+        return Wallet.objects.values('balance', 'total_deposited', 'total_spent').get(customer=self.customer)
+
+    def test_debit_and_credit(self):
+        for _ in self.branches():
+            before = self.wallet()
+            self.assertEqual(wallet_ops.debit(self.customer, 30, 'PURCHASE'), before['balance'] - 30)
+            self.assertEqual(wallet_ops.credit(self.customer, 50, 'CHARGE'), before['balance'] + 20)
+            self.assertEqual(self.wallet(), {
+                'balance': before['balance'] + 20,
+                'total_deposited': before['total_deposited'] + 50,
+                'total_spent': before['total_spent'] + 30,
+            })
+        self.assertEqual(
+            list(Transaction.objects.filter(customer=self.customer).order_by('id').values_list('amount', flat=True)),
+            [-30, 50, -30, 50],
+        )
+
+    def test_insufficient_balance_changes_nothing(self):
+        for _ in self.branches():
+            before = self.wallet()
+            with self.assertRaises(wallet_ops.InsufficientBalance):
+                wallet_ops.debit(self.customer, before['balance'] + 1, 'PURCHASE')
+            with self.assertRaises(wallet_ops.InsufficientBalance):
+                wallet_ops.debit_many(self.customer, [(before['balance'], 'أ'), (1, 'ب')], 'PURCHASE')
+            self.assertEqual(self.wallet(), before)
+        self.assertFalse(Transaction.objects.filter(customer=self.customer).exists())
+
+    def test_missing_wallet(self):
+        Wallet.objects.filter(customer=self.customer).delete()
+        for _ in self.branches():
+            with self.assertRaises(Wallet.DoesNotExist):
+                wallet_ops.credit(self.customer, 10, 'CHARGE')
+        self.assertFalse(Transaction.objects.filter(customer=self.customer).exists())
+
+    def test_balance_constraint_rejects_negative(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Wallet.objects.filter(customer=self.customer).update(balance=-1)
+        self.assertEqual(self.wallet()['balance'], 100)
+
+    def test_charge_code_is_claimed_once(self):
+        code = ChargeCode.objects.create(package=SubscriptionPackage.objects.create(name='باقة', coin_value=40))
+        request = SimpleNamespace(user=SimpleNamespace(customer=self.customer))
+        # طلبان متزامنان: كلاهما يرى الكود غير مستخدم قبل الحفظ
+        first, second = (
+            RechargeByCodeSerializer(data={'charge_code': code.code}, context={'request': request})
+            for _ in range(2)
+        )
+        self.assertTrue(first.is_valid())
+        self.assertTrue(second.is_valid())
+
+        self.assertEqual(first.save()['new_balance'], 140)
+        with self.assertRaises(serializers.ValidationError):
+            second.save()
+        self.assertEqual(self.wallet()['balance'], 140)
+        self.assertEqual(Transaction.objects.filter(customer=self.customer, transaction_type='CHARGE').count(), 1)
+        code.refresh_from_db()
+        self.assertEqual(code.activated_by_id, self.customer.id)
+
+
+class TokenBlacklistTests(TestCase):
+    """القائمة السوداء (LocMemCache بدون Redis): توكن التحديث بعد تسجيل الخروج مرفوض."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        customer = create_account()
+        User.objects.filter(pk=customer.user_id).update(is_active=True)
+        user = User.objects.get(pk=customer.user_id)
+        self.refresh, self.other = (str(CustomTokenObtainPairSerializer.get_token(user)) for _ in range(2))
+
+    def post(self, view, refresh):
+        request = APIRequestFactory(HTTP_HOST='localhost').post('/', {'refresh': refresh}, format='json')
+        return view.as_view()(request)
+
+    def test_logout_revokes_refresh_token(self):
+        self.assertEqual(self.post(LogoutView, self.refresh).status_code, 200)
+        self.assertEqual(self.post(CustomTokenRefreshView, self.refresh).status_code, 401)
+        # التوكنات الأخرى للمستخدم نفسه غير متأثرة
+        self.assertEqual(self.post(CustomTokenRefreshView, self.other).status_code, 200)
+
+    def test_rotation_revokes_used_token(self):
+        response = self.post(CustomTokenRefreshView, self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.post(CustomTokenRefreshView, self.refresh).status_code, 401)
+        self.assertEqual(self.post(CustomTokenRefreshView, response.data['refresh']).status_code, 200)
+
+
+class LoginThrottleTests(TestCase):
+    """GCRA على الدلاء المحلية (بدون Redis): الدفعة المسموحة كاملة ثم 429 مع Retry-After."""
+
+    def setUp(self):
+        throttling.local_buckets._buckets.clear()
+        self.addCleanup(throttling.local_buckets._buckets.clear)
+
+    def login(self, address='203.0.113.7'):
+        request = APIRequestFactory(HTTP_HOST='localhost').post(
+            '/api/accounts/login/', {'serial': 'X' * 15}, format='json', REMOTE_ADDR=address
+        )
+        return CustomTokenObtainPairView.as_view()(request)
+
+    def test_burst_then_429(self):
+        burst = int(api_settings.DEFAULT_THROTTLE_RATES['login'].split('/')[0])
+        statuses = [self.login().status_code for _ in range(burst)]
+        self.assertNotIn(429, statuses)
+
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # الحد لكل عنوان
+        self.assertNotEqual(self.login(address='198.51.100.9').status_code, 429)
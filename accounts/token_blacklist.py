@@ -0,0 +1,153 @@
+# في accounts/token_blacklist.py
+"""
+قائمة سوداء لتوكنات التحديث (refresh) بدون جداول OutstandingToken/BlacklistedToken.
+
+- كل jti ملغى يُحفظ في Redis بمفتاح مستقل مدته = العمر المتبقي للتوكن، فيختفي تلقائياً.
+- فهرس ZSET (jti -> exp) ورقم إصدار يسمحان لكل عملية ببناء فلتر Bloom محلي
+  يُزامَن مرة كل TOKEN_BLACKLIST_SYNC_SECONDS: الفحص الشائع "غير ملغى" لا يصل إلى Redis.
+- المزامنة تزايدية: سجل ZSET (jti -> رقم تسلسلي) محدود بـ TOKEN_BLACKLIST_LOG_SIZE،
+  وكل عملية تقرأ منه ما بعد آخر رقم رأته فقط. إعادة البناء الكاملة من الفهرس (غير المنتهي فقط)
+  عند التأخر عن نافذة السجل، أو امتلاء الفلتر، أو مرة كل TOKEN_BLACKLIST_REBUILD_SECONDS
+  لإسقاط التوكنات المنتهية من الفلتر المحلي.
+- الإلغاء SET NX: توكن التحديث المُدوَّر لا يُقبل مرتين حتى لو لم تُزامَن الفلاتر بعد.
+- بدون Redis (LocMemCache لعقدة واحدة) يُستخدم الكاش مباشرة.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from config.bloom import BloomFilter
+from config.redis_utils import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = 'token_blacklist:index'
+VERSION_KEY = 'token_blacklist:version'
+LOG_KEY = 'token_blacklist:log'
+
+# SET NX ثم الفهرس والسجل بنفس الرقم التسلسلي في خطوة ذرية واحدة
+REVOKE_SCRIPT = """
+if not redis.call('SET', KEYS[1], 1, 'EX', ARGV[3], 'NX') then
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[4])
+local seq = redis.call('INCR', KEYS[3])
+redis.call('ZADD', KEYS[4], seq, ARGV[1])
+redis.call('ZREMRANGEBYRANK', KEYS[4], 0, -tonumber(ARGV[5]) - 1)
+return 1
+"""
+
+_local = {'filter': None, 'version': 0, 'count': 0, 'capacity': 0, 'built_at': 0.0, 'checked_at': 0.0}
+_lock = threading.Lock()
+_script = None
+
+
+def jti_key(jti):
+    return f"token_blacklist:jti:{jti}"
+
+
+def _rebuild_local(client, now):
+    """بناء الفلتر المحلي من الفهرس (التوكنات غير المنتهية فقط)."""
+    pipe = client.pipeline(transaction=True)
+    pipe.get(redis_key(VERSION_KEY))
+    pipe.zrangebyscore(redis_key(INDEX_KEY), time.time(), '+inf')
+    version, jtis = pipe.execute()
+
+    capacity = max(settings.TOKEN_BLACKLIST_BLOOM_CAPACITY, len(jtis) * 2)
+    bloom = BloomFilter.for_capacity(capacity, settings.TOKEN_BLACKLIST_BLOOM_ERROR_RATE)
+    for jti in jtis:
+        bloom.add(jti.decode())
+    _local.update(
+        filter=bloom, version=int(version or 0), count=len(jtis), capacity=capacity, built_at=now,
+    )
+
+
+def _sync_local(client):
+    """
+    إضافة ما أُلغي بعد آخر رقم تسلسلي رأته العملية.
+    يُرجع False إذا تجاوز السجل هذا الرقم (تأخرنا أكثر من حجمه) فيلزم بناء كامل.
+    """
+    last = _local['version']
+    entries = client.zrangebyscore(redis_key(LOG_KEY), f"({last}", '+inf', withscores=True)
+    if not entries:
+        return True
+    if int(entries[0][1]) != last + 1:
+        return False
+    for jti, seq in entries:
+        _local['filter'].add(jti.decode())
+    _local['count'] += len(entries)
+    _local['version'] = int(entries[-1][1])
+    return True
+
+
+def _refresh_local(client):
+    """مزامنة الفلتر المحلي مع Redis إذا تغيّر الإصدار."""
+    now = time.monotonic()
+    if now - _local['checked_at'] < settings.TOKEN_BLACKLIST_SYNC_SECONDS:
+        return _local['filter']
+
+    with _lock:
+        if now - _local['checked_at'] < settings.TOKEN_BLACKLIST_SYNC_SECONDS:
+            return _local['filter']
+        stale = (
+            _local['filter'] is None
+            or _local['count'] > _local['capacity']
+            or now - _local['built_at'] > settings.TOKEN_BLACKLIST_REBUILD_SECONDS
+        )
+        if stale:
+            _rebuild_local(client, now)
+        elif int(client.get(redis_key(VERSION_KEY)) or 0) != _local['version']:
+            if not _sync_local(client):
+                _rebuild_local(client, now)
+        _local['checked_at'] = now
+        return _local['filter']
+
+
+def revoke(jti, exp):
+    """
+    إلغاء التوكن حتى وقت انتهائه exp (epoch).
+    يُرجع False إذا كان ملغى من قبل (لاستخدامه في رفض إعادة استعمال توكن مُدوَّر).
+    """
+    ttl = int(exp - time.time())
+    if ttl <= 0:
+        # منتهي الصلاحية أصلاً: التحقق من exp يرفضه
+        return True
+
+    global _script
+
+    client = get_redis()
+    if client is None:
+        return cache.add(jti_key(jti), 1, ttl)
+
+    if _script is None:
+        _script = client.register_script(REVOKE_SCRIPT)
+    added = _script(
+        keys=[redis_key(jti_key(jti)), redis_key(INDEX_KEY), redis_key(VERSION_KEY), redis_key(LOG_KEY)],
+        args=[jti, exp, ttl, time.time(), settings.TOKEN_BLACKLIST_LOG_SIZE],
+        client=client,
+    )
+
+    local = _local['filter']
+    if local is not None:
+        local.add(jti)
+        _local['count'] += 1
+    return bool(added)
+
+
+def is_revoked(jti):
+    client = get_redis()
+    if client is None:
+        return cache.get(jti_key(jti)) is not None
+
+    try:
+        bloom = _refresh_local(client)
+    except Exception:
+        logger.warning("token blacklist filter unavailable, checking Redis directly", exc_info=True)
+        bloom = None
+    if bloom is not None and jti not in bloom:
+        return False
+    return client.exists(redis_key(jti_key(jti))) > 0
@@ -0,0 +1,23 @@
+# في accounts/tokens.py
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from . import token_blacklist
+
+
+class RefreshToken(tokens.RefreshToken):
+    """توكن تحديث يستخدم القائمة السوداء في Redis (token_blacklist) بدلاً من تطبيق token_blacklist."""
+
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        super().verify(*args, **kwargs)
+
+    def check_blacklist(self):
+        if token_blacklist.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError("Token is blacklisted")
+
+    def blacklist(self):
+        if not token_blacklist.revoke(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            # ملغى بالفعل (طلب تحديث متزامن أو إعادة استعمال توكن قديم)
+            raise TokenError("Token is blacklisted")
@@ -1,8 +1,9 @@
 from django.urls import path
 from .views import (
-    CustomTokenObtainPairView, SerialRecoveryView, 
+    CustomTokenObtainPairView, CustomTokenRefreshView, LogoutView, SerialRecoveryView, 
     TemporaryCreationView, FinalActivationView, 
-    ReactivationView, RechargeByCodeView, WalletStatusView
+    ReactivationView, RechargeByCodeView, WalletStatusView,
+    TransactionHistoryView
 )
 
 urlpatterns = [
@@ -11,9 +12,12 @@ urlpatterns = [
     path('auth/final-activate/', FinalActivationView.as_view(), name='final_activate'),
     path('auth/reactivate/', ReactivationView.as_view(), name='reactivate'),
     path('auth/login/', CustomTokenObtainPairView.as_view(), name='auth_login'),
+    path('auth/refresh/', CustomTokenRefreshView.as_view(), name='auth_refresh'),
+    path('auth/logout/', LogoutView.as_view(), name='auth_logout'),
     path('auth/recover-serial/', SerialRecoveryView.as_view(), name='recover_serial'),
     
     # المحفظة
     path('wallet/recharge-by-code/', RechargeByCodeView.as_view(), name='recharge_by_code'),
     path('wallet/status/', WalletStatusView.as_view(), name='wallet_status'),
+    path('wallet/transactions/', TransactionHistoryView.as_view(), name='wallet_transactions'),
 ]
\ No newline at end of file
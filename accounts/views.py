@@ -4,15 +4,23 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework import generics 
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 # استيراد جميع الـ Serializers المطلوبة
 from .serializers import (
-    CustomTokenObtainPairSerializer, SerialRecoverySerializer, 
+    CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer,
+    LogoutSerializer, SerialRecoverySerializer, 
     TemporaryCreationSerializer, FinalActivationSerializer, 
     ReactivationSerializer, RechargeByCodeSerializer,
-    WalletStatusSerializer
+    WalletStatusSerializer, TransactionProjection,
+    TransactionHistoryFilterSerializer
 )
-from .models import Customer
+from .models import Customer, Transaction, period_of
+from .wallet_cache import get_wallet_status
+from config.pagination import KeysetCursorPagination
+from config.throttling import LoginRateThrottle, RecoverSerialRateThrottle, RechargeRateThrottle
+from django.http import Http404
+from django.utils.decorators import method_decorator
+from config.idempotency import idempotent
 
 # **************************************************
 # 1. مسارات المصادقة والدخول (Authentication)
@@ -21,11 +29,28 @@ from .models import Customer
 # عارض الدخول المخصص (يستخدم السيريال فقط)
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LoginRateThrottle]
+
+# عارض تجديد التوكن (مع القائمة السوداء في Redis)
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
+# عارض تسجيل الخروج (إلغاء توكن التحديث)
+class LogoutView(APIView):
+    permission_classes = [AllowAny]
+    serializer_class = LogoutSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response({'message': 'تم تسجيل الخروج بنجاح.'}, status=status.HTTP_200_OK)
 
 # عارض استرداد السيريال (بالهاتف والبين)
 class SerialRecoveryView(APIView):
     permission_classes = [AllowAny]
     serializer_class = SerialRecoverySerializer
+    throttle_classes = [RecoverSerialRateThrottle]
 
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
@@ -38,11 +63,26 @@ class SerialRecoveryView(APIView):
 # 2. مسارات التفعيل على مرحلتين (Two-Stage Activation)
 # **************************************************
 
+def _account_record(data):
+    # لا نخزن السيريال والبين والتوكن في الكاش، فقط رقم العميل
+    return {'customer_id': data['customer_id']}
+
+
+def _account_replay(record):
+    customer = Customer.objects.filter(pk=record['customer_id'], name__isnull=True).first()
+    # حساب حُذف أو فُعّل منذ الطلب الأول: لا نعيد بيانات دخوله
+    return TemporaryCreationSerializer.credentials(customer) if customer else None
+
+
 # أ. إنشاء الحساب المؤقت (بعد تأكيد الدفع - يعطي Serial/Pin و JWT)
 class TemporaryCreationView(generics.CreateAPIView):
     serializer_class = TemporaryCreationSerializer
     permission_classes = [AllowAny]
     
+    # إعادة المحاولة بنفس Idempotency-Key تُرجع نفس الحساب (بتوكن جديد) بدلاً من إنشاء حساب آخر
+    @method_decorator(idempotent(
+        ttl_setting='IDEMPOTENCY_ACCOUNT_TTL', to_record=_account_record, from_record=_account_replay,
+    ))
     def create(self, request, *args, **kwargs):
         # نمرر بيانات فارغة لأن البيانات يتم توليدها في Serializer.save
         serializer = self.get_serializer(data={})
@@ -55,9 +95,9 @@ class FinalActivationView(generics.UpdateAPIView):
     serializer_class = FinalActivationSerializer
     permission_classes = [IsAuthenticated] 
     
-    # يحدد كائن العميل المسجل دخوله (request.user) للتحديث
+    # يحدد كائن العميل المسجل دخوله (من الهوية المخزنة في request.user) للتحديث
     def get_object(self):
-        return self.request.user
+        return self.request.user.customer
 
 # ج. إعادة التنشيط (بعد تجاوز مهلة الـ 48 ساعة)
 class ReactivationView(APIView):
@@ -78,10 +118,12 @@ class ReactivationView(APIView):
 class RechargeByCodeView(generics.CreateAPIView):
     serializer_class = RechargeByCodeSerializer
     permission_classes = [IsAuthenticated] 
+    throttle_classes = [RechargeRateThrottle]
     
     def perform_create(self, serializer):
         return serializer.save()
 
+    @method_decorator(idempotent)
     def create(self, request, *args, **kwargs):
         # يجب تمرير request إلى السياق للوصول إلى العميل المسجل دخوله
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -95,6 +137,31 @@ class WalletStatusView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = WalletStatusSerializer
     
-    def get_object(self):
-        # الحصول على كائن Wallet المرتبط بالعميل المسجل دخوله
-        return self.request.user.wallet
\ No newline at end of file
+    def retrieve(self, request, *args, **kwargs):
+        # رقم العميل من الهوية المخزنة (بدون استعلام)، ثم الحالة من الكاش
+        data = get_wallet_status(request.user.customer_id)
+        if data is None:
+            raise Http404("لا توجد محفظة لهذا العميل.")
+        return Response(data)
+
+# ج. سجل المعاملات الكامل (ترقيم بالمؤشر على (timestamp, id) بدون COUNT)
+class TransactionHistoryView(generics.ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = TransactionProjection
+    pagination_class = KeysetCursorPagination
+    ordering = ('-timestamp', '-id')
+
+    def get_queryset(self):
+        filters = TransactionHistoryFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        queryset = Transaction.objects.filter(customer_id=self.request.user.customer_id)
+        if 'transaction_type' in params:
+            queryset = queryset.filter(transaction_type=params['transaction_type'])
+        # تقييد period أيضاً حتى تُقرأ أقسام الأشهر المطلوبة فقط
+        if 'since' in params:
+            queryset = queryset.filter(timestamp__gte=params['since'], period__gte=period_of(params['since']))
+        if 'until' in params:
+            queryset = queryset.filter(timestamp__lte=params['until'], period__lte=period_of(params['until']))
+        return TransactionProjection.project(queryset)
@@ -0,0 +1,109 @@
+# في accounts/wallet_cache.py
+"""
+نموذج قراءة مُخزَّن لحالة المحفظة (الرصيد، المجاميع، آخر المعاملات).
+
+يُحفظ في CACHES['default'] تحت مفتاح لكل عميل يحمل رقم إصدار الشكل،
+ويُعاد بناؤه بعد commit في كل مسار يكتب على Wallet/Transaction
+(wallet_ops، وتعديلات المدير عبر الإشارات)، فتكلفة قراءة الحالة = GET واحد من الكاش.
+
+إعادتا بناء بعد commit متزامنين قد تنتهيان بأي ترتيب، لذلك تأخذ كل إعادة بناء
+رقماً متزايداً (INCR) قبل قراءة قاعدة البيانات: صاحب الرقم الأكبر قرأ بعد كل
+commit سبقه. الكتابة تتخطى إذا كان المخزن أحدث، وبعدها إذا تجاوز العداد رقمنا
+(إعادة بناء أحدث بدأت) نحذف المفتاح بدل ترك حالة قديمة ساعة كاملة.
+
+الكاش تحسين وليس شرطاً: إذا تعذر الوصول إليه تُقرأ الحالة من قاعدة البيانات،
+وفشل إعادة البناء بعد commit لا يُفشل العملية التي ثبتت (ولا الـ hooks بعدها).
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Wallet
+
+logger = logging.getLogger(__name__)
+
+# يُرفع عند تغيير شكل البيانات المخزنة حتى لا تُقرأ نسخ قديمة
+WALLET_STATUS_VERSION = 2
+
+
+def wallet_status_key(customer_id):
+    return f"wallet_status:v{WALLET_STATUS_VERSION}:{customer_id}"
+
+
+def wallet_status_ticket_key(customer_id):
+    return f"wallet_status:ticket:{customer_id}"
+
+
+def build_wallet_status(customer_id):
+    """بناء حالة المحفظة من قاعدة البيانات. يُرجع None إذا لم تكن هناك محفظة."""
+    # استيراد متأخر لتجنب الاستيراد الدائري (serializers -> wallet_ops -> wallet_cache)
+    from .serializers import WalletStatusSerializer
+
+    wallet = Wallet.objects.filter(customer_id=customer_id).first()
+    if wallet is None:
+        return None
+    data = WalletStatusSerializer(wallet).data
+    data = dict(data)
+    data['recent_transactions'] = [dict(t) for t in data['recent_transactions']]
+    return data
+
+
+def _next_ticket(customer_id):
+    key = wallet_status_ticket_key(customer_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # يبدأ العداد من الساعة، فلو فُقد (eviction) لا يعود إلى أرقام أصغر من المخزنة
+        cache.add(key, time.time_ns() // 1000, None)
+        return cache.incr(key)
+
+
+def refresh_wallet_status(customer_id):
+    """إعادة بناء الحالة وكتابتها في الكاش (write-through) إذا لم تسبقها إعادة بناء أحدث."""
+    key = wallet_status_key(customer_id)
+    ticket = _next_ticket(customer_id)
+    data = build_wallet_status(customer_id)
+
+    stored = cache.get(key)
+    if stored is not None and stored['ticket'] > ticket:
+        return stored['data']
+    if data is None:
+        cache.delete(key)
+        return None
+
+    cache.set(key, {'ticket': ticket, 'data': data}, settings.WALLET_STATUS_CACHE_TTL)
+    if cache.get(wallet_status_ticket_key(customer_id), ticket) > ticket:
+        # إعادة بناء أحدث بدأت وربما كتبت قبلنا: الحذف آمن والقراءة التالية تعيد البناء
+        cache.delete(key)
+    return data
+
+
+def schedule_refresh(customer_id):
+    """إعادة البناء بعد نجاح الـ transaction الحالي فقط (لا نكتب حالة لم تُثبَّت)."""
+    transaction.on_commit(lambda: _refresh_after_commit(customer_id))
+
+
+def _refresh_after_commit(customer_id):
+    try:
+        refresh_wallet_status(customer_id)
+    except Exception:
+        # العملية ثبتت ولا يجوز أن تتحول إلى خطأ 500؛ نحذف الحالة المخزنة إن أمكن لتُبنى عند القراءة
+        logger.warning("failed to refresh wallet status for customer %s", customer_id, exc_info=True)
+        try:
+            cache.delete(wallet_status_key(customer_id))
+        except Exception:
+            logger.warning("failed to drop wallet status for customer %s", customer_id, exc_info=True)
+
+
+def get_wallet_status(customer_id):
+    try:
+        stored = cache.get(wallet_status_key(customer_id))
+        if stored is not None:
+            return stored['data']
+        return refresh_wallet_status(customer_id)
+    except Exception:
+        logger.warning("wallet status cache unavailable, reading from database", exc_info=True)
+        return build_wallet_status(customer_id)
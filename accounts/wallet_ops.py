@@ -0,0 +1,126 @@
+# في accounts/wallet_ops.py
+"""
+عمليات المحفظة الذرية (خصم / إضافة رصيد).
+
+كل عملية تُنفَّذ كـ UPDATE مشروط واحد على صف المحفظة
+(balance = balance - X WHERE balance >= X RETURNING balance)
+داخل نفس الـ transaction الذي يُدرج سجل المعاملة، بدون قراءة المحفظة
+إلى Python أولاً، وبالتالي لا توجد نافذة قراءة-تعديل-كتابة بين الطلبات المتزامنة.
+بعد الـ commit يُعاد بناء حالة المحفظة المخزنة في الكاش (wallet_cache).
+"""
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Wallet, Transaction
+from .wallet_cache import schedule_refresh
+
+
+class InsufficientBalance(Exception):
+    """الرصيد غير كافٍ لإتمام عملية الخصم."""
+
+
+def _apply(customer_id, balance_delta, deposited_delta=0, spent_delta=0, min_balance=None):
+    """
+    تطبيق التغيير على محفظة العميل في استعلام واحد.
+    يُرجع الرصيد الجديد، أو None إذا لم يتحقق الشرط (رصيد غير كافٍ أو لا توجد محفظة).
+    """
+    # UPDATE ... RETURNING مدعوم في PostgreSQL و SQLite >= 3.35
+    if connection.features.can_return_columns_from_insert:
+        qn = connection.ops.quote_name
+        opts = Wallet._meta
+        balance = qn(opts.get_field('balance').column)
+        deposited = qn(opts.get_field('total_deposited').column)
+        spent = qn(opts.get_field('total_spent').column)
+
+        sql = (
+            f"UPDATE {qn(opts.db_table)} SET "
+            f"{balance} = {balance} + %s, "
+            f"{deposited} = {deposited} + %s, "
+            f"{spent} = {spent} + %s "
+            f"WHERE {qn(opts.get_field('customer').column)} = %s"
+        )
+        params = [balance_delta, deposited_delta, spent_delta, customer_id]
+        if min_balance is not None:
+            sql += f" AND {balance} >= %s"
+            params.append(min_balance)
+        sql += f" RETURNING {balance}"
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # قواعد بيانات بدون RETURNING: نفس الـ UPDATE المشروط بتعبيرات F() ثم قراءة الرصيد
+    wallets = Wallet.objects.filter(customer_id=customer_id)
+    if min_balance is not None:
+        wallets = wallets.filter(balance__gte=min_balance)
+    updated = wallets.update(
+        balance=F('balance') + balance_delta,
+        total_deposited=F('total_deposited') + deposited_delta,
+        total_spent=F('total_spent') + spent_delta,
+    )
+    if not updated:
+        return None
+    return Wallet.objects.filter(customer_id=customer_id).values_list('balance', flat=True).first()
+
+
+def credit(customer, amount, transaction_type, description=None):
+    """إضافة رصيد إلى محفظة العميل وتسجيل المعاملة. يُرجع الرصيد الجديد."""
+    with transaction.atomic():
+        new_balance = _apply(customer.pk, amount, deposited_delta=amount)
+        if new_balance is None:
+            raise Wallet.DoesNotExist(f"لا توجد محفظة للعميل {customer.pk}")
+
+        Transaction.objects.create(
+            customer=customer,
+            amount=amount,
+            transaction_type=transaction_type,
+            description=description
+        )
+        schedule_refresh(customer.pk)
+    return new_balance
+
+
+def debit(customer, amount, transaction_type, description=None):
+    """
+    خصم رصيد من محفظة العميل وتسجيل المعاملة. يُرجع الرصيد الجديد.
+    يرفع InsufficientBalance إذا كان الرصيد أقل من المبلغ المطلوب.
+    """
+    with transaction.atomic():
+        new_balance = _apply(customer.pk, -amount, spent_delta=amount, min_balance=amount)
+        if new_balance is None:
+            raise InsufficientBalance(f"الرصيد غير كافٍ. يتطلب {amount} كوين")
+
+        Transaction.objects.create(
+            customer=customer,
+            amount=-amount,
+            transaction_type=transaction_type,
+            description=description
+        )
+        schedule_refresh(customer.pk)
+    return new_balance
+
+
+def debit_many(customer, entries, transaction_type):
+    """
+    خصم عدة مبالغ دفعة واحدة: entries = [(amount, description), ...].
+    UPDATE واحد على المحفظة بالمجموع وسجل معاملة لكل مبلغ بـ bulk_create. يُرجع الرصيد الجديد.
+    يرفع InsufficientBalance إذا كان الرصيد أقل من المجموع.
+    """
+    total = sum(amount for amount, _ in entries)
+    with transaction.atomic():
+        new_balance = _apply(customer.pk, -total, spent_delta=total, min_balance=total)
+        if new_balance is None:
+            raise InsufficientBalance(f"الرصيد غير كافٍ. يتطلب {total} كوين")
+
+        Transaction.objects.bulk_create([
+            Transaction(
+                customer=customer,
+                amount=-amount,
+                transaction_type=transaction_type,
+                description=description
+            )
+            for amount, description in entries
+        ])
+        schedule_refresh(customer.pk)
+    return new_balance
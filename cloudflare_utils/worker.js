@@ -1,3 +1,28 @@
+// روابط موقّعة (/s/TOKEN): نفس تنسيق sales/utils/signed_links.py في Django
+const SIGNING_CONTEXT = 'signed-download-links:v1';
+const SIGNATURE_BYTES = 16;
+const encoder = new TextEncoder();
+let signingKey = null;
+let signingSecret = null;
+
+function base64UrlDecode(value) {
+  const padded = value.replace(/-/g, '+').replace(/_/g, '/') + '==='.slice((value.length + 3) % 4);
+  return Uint8Array.from(atob(padded), c => c.charCodeAt(0));
+}
+
+async function getSigningKey(secret) {
+  // المفتاح المشتق يُحسب مرة واحدة لكل isolate
+  if (signingKey && signingSecret === secret) {
+    return signingKey;
+  }
+  const hmac = { name: 'HMAC', hash: 'SHA-256' };
+  const master = await crypto.subtle.importKey('raw', encoder.encode(secret), hmac, false, ['sign']);
+  const derived = await crypto.subtle.sign('HMAC', master, encoder.encode(SIGNING_CONTEXT));
+  signingKey = await crypto.subtle.importKey('raw', derived, hmac, false, ['sign']);
+  signingSecret = secret;
+  return signingKey;
+}
+
 export default {
   async fetch(request, env) {
     const url = new URL(request.url);
@@ -40,7 +65,62 @@ export default {
       return Response.redirect(tokenData.file_url, 302);
     }
     
-    // 2. API لتخزين التوكنات من Django
+    // 2. رابط موقّع: /s/TOKEN — التحقق بدون طلب إلى Django، ثم KV لرابط الملف وعلامة الاستخدام الوحيد.
+    // الحمولة مقروءة لحامل الرابط، لذلك تحمل مفتاح الملف (f) فقط ورابط المصدر في KV (file:KEY)
+    if (path.startsWith('/s/')) {
+      const link = await this.verifySignedLink(path.slice(3), env);
+      if (!link) {
+        return this.errorPage('الرابط غير صالح أو انتهت صلاحيته');
+      }
+      
+      const now = Date.now();
+      if (now > link.e * 1000) {
+        return this.errorPage('⏰ انتهت صلاحية الرابط (ساعتان)');
+      }
+      
+      const usedKey = `used:${link.n}`;
+      const [fileUrl, used] = await Promise.all([
+        env.KV_BINDING.get(`file:${link.f}`),
+        env.KV_BINDING.get(usedKey)
+      ]);
+      if (!fileUrl) {
+        return this.errorPage('الملف غير متاح حالياً');
+      }
+      if (used) {
+        return this.errorPage('🔄 تم استخدام هذا الرابط مسبقاً');
+      }
+      
+      // العلامة تبقى حتى انتهاء صلاحية الرابط (أقل مدة في KV دقيقة واحدة)
+      await env.KV_BINDING.put(usedKey, JSON.stringify({
+        purchase_id: link.p,
+        used_at: now,
+        downloaded_ip: request.headers.get('CF-Connecting-IP')
+      }), {
+        expirationTtl: Math.max(60, Math.ceil(link.e - now / 1000))
+      });
+      
+      return Response.redirect(fileUrl, 302);
+    }
+    
+    // خريطة الملفات للروابط الموقّعة من Django: {files: {KEY: file_url أو null للحذف}}
+    if (path === '/_api/files' && request.method === 'POST') {
+      if (request.headers.get('X-API-Secret') !== env.API_SECRET) {
+        return new Response('❌ غير مصرح', { status: 401 });
+      }
+      
+      const { files } = await request.json();
+      await Promise.all(Object.entries(files || {}).map(([key, fileUrl]) => (
+        fileUrl === null
+          ? env.KV_BINDING.delete(`file:${key}`)
+          : env.KV_BINDING.put(`file:${key}`, fileUrl)
+      )));
+      
+      return new Response(JSON.stringify({ success: true }), {
+        headers: { 'Content-Type': 'application/json' }
+      });
+    }
+    
+    // 3. API لتخزين التوكنات من Django
     if (path === '/_api/store' && request.method === 'POST') {
       // التحقق من السرية
       const apiKey = request.headers.get('X-API-Secret');
@@ -81,6 +161,46 @@ export default {
     return new Response('🚀 خدمة التحميل المحمية نشطة', { status: 200 });
   },
   
+  async verifySignedLink(token, env) {
+    const [payload, signature] = token.split('.');
+    if (!payload || !signature) {
+      return null;
+    }
+    
+    let given;
+    try {
+      given = base64UrlDecode(signature);
+    } catch (e) {
+      return null;
+    }
+    const key = await getSigningKey(env.API_SECRET);
+    const expected = new Uint8Array(await crypto.subtle.sign('HMAC', key, encoder.encode(payload)));
+    if (given.length !== SIGNATURE_BYTES) {
+      return null;
+    }
+    // مقارنة بزمن ثابت
+    let diff = 0;
+    for (let i = 0; i < SIGNATURE_BYTES; i++) {
+      diff |= given[i] ^ expected[i];
+    }
+    if (diff !== 0) {
+      return null;
+    }
+    
+    let link;
+    try {
+      link = JSON.parse(new TextDecoder().decode(base64UrlDecode(payload)));
+    } catch (e) {
+      return null;
+    }
+    // توقيع صحيح على حمولة غير متوقعة يبقى رابطاً غير صالح
+    if (!link || typeof link !== 'object' || typeof link.f !== 'string'
+        || typeof link.e !== 'number' || typeof link.n !== 'string') {
+      return null;
+    }
+    return link;
+  },
+  
   errorPage(message) {
     const html = `<!DOCTYPE html>
     <html dir="rtl">
@@ -0,0 +1,91 @@
+"""
+Minimal async view layer for the ASGI deployment mode (ASGI_MODE=True).
+
+DRF 3.14 dispatches synchronously, and under ASGI Django runs sync views on a
+single shared thread per process, so I/O-bound endpoints get native
+``async def`` versions built on this module instead of APIView:
+
+- ``api_view`` checks the method, authenticates with the same
+  ``CachedJWTAuthentication`` as the sync API and applies the default
+  throttles (both run in a thread, since they may touch the cache/database),
+  wraps the request in a DRF ``Request`` (for ``query_params`` / ``data``) and
+  turns DRF ``APIException`` into the same JSON error bodies as DRF's default
+  exception handler.
+- ``json_response`` renders with the project's ORJSONRenderer.
+
+There is no content negotiation; these views are JSON only.
+"""
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from accounts.authentication import CachedJWTAuthentication
+
+from .renderers import ORJSONRenderer
+
+_renderer = ORJSONRenderer()
+_authenticator = CachedJWTAuthentication()
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    response = HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def _error_response(exc):
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+    headers = {}
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        headers['WWW-Authenticate'] = _authenticator.authenticate_header(None)
+    if getattr(exc, 'wait', None):
+        headers['Retry-After'] = str(int(exc.wait))
+    return json_response(data, exc.status_code, headers)
+
+
+def _check_throttles(request, throttle_classes):
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            raise exceptions.Throttled(throttle.wait())
+
+
+def api_view(methods, authenticated=True, throttle_classes=None):
+    """Decorator for ``async def view(request, ...)`` receiving a DRF Request."""
+    methods = [method.upper() for method in methods]
+    if throttle_classes is None:
+        throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                drf_request = Request(request, parsers=[JSONParser()])
+                if authenticated:
+                    user_auth = await sync_to_async(_authenticator.authenticate)(request)
+                    if user_auth is None:
+                        raise exceptions.NotAuthenticated()
+                    drf_request.user, drf_request.auth = user_auth
+                if throttle_classes:
+                    await sync_to_async(_check_throttles)(drf_request, throttle_classes)
+                return await view(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return _error_response(exc)
+
+        # token authentication only, like the DRF views (csrf_exempt itself is sync-only in Django 4.2)
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
@@ -0,0 +1,40 @@
+"""
+A small Bloom filter with a Redis-compatible bit layout.
+
+Bit ``i`` lives in byte ``i // 8`` under mask ``0x80 >> (i % 8)``, the same
+layout Redis uses for SETBIT/GETBIT, so a filter can be built locally,
+stored with SET and updated in place with SETBIT.
+"""
+
+import hashlib
+import math
+
+
+class BloomFilter:
+
+    def __init__(self, size, hashes, bits=None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        size = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes)
+
+    def positions(self, item):
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 0x80 >> (position & 7)
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[p >> 3] & (0x80 >> (p & 7)) for p in self.positions(item))
@@ -0,0 +1,167 @@
+"""
+Idempotency-Key handling for money-moving endpoints.
+
+Clients on flaky networks retry POSTs. With an ``Idempotency-Key`` header the
+first successful response (status and body) is stored in the cache (Redis in
+production) under the caller and the key, and retries get that response back
+with ``Idempotent-Replayed: true`` without running the view again, so the
+wallet and ledger tables are not touched twice.
+
+- The caller is the customer for authenticated requests, otherwise the client
+  address (account creation is anonymous).
+- While the first request runs, a short lock (``cache.add``) makes concurrent
+  retries fail fast with 409 instead of racing it.
+- Only 2xx responses are stored. Errors release the key so the client can fix
+  the request (e.g. recharge the wallet) and retry with the same key.
+- Reusing a key with a different body is rejected with 422.
+- The cache is an optimisation, not a dependency: if it fails before the view
+  runs the request is served without idempotency, and a failed write after a
+  successful view never replaces the successful response.
+
+Anonymous callers are identified by the address the last trusted proxy saw
+(``REST_FRAMEWORK['NUM_PROXIES']``, else ``REMOTE_ADDR``), never by a header
+the client controls, and must send a key of at least
+``MIN_ANONYMOUS_KEY_LENGTH`` characters (e.g. a UUID) since many clients can share
+one address behind a NAT.
+
+Endpoints whose body holds credentials store a reference instead of the body
+(``to_record``) and rebuild the response from the database on replay
+(``from_record``, which may return ``None`` when the record is stale), with a
+shorter TTL read from the ``ttl_setting`` setting.
+
+Requests without the header behave exactly as before. The decorator wraps the
+DRF handler, so authentication, permissions and throttles still run first::
+
+    @api_view(['POST'])
+    @idempotent
+    def purchase_file(request): ...
+
+    @method_decorator(idempotent)
+    def create(self, request, *args, **kwargs): ...
+
+    @method_decorator(idempotent(ttl_setting='IDEMPOTENCY_ACCOUNT_TTL',
+                                 to_record=..., from_record=...))
+    def create(self, request, *args, **kwargs): ...
+"""
+
+import functools
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+MIN_ANONYMOUS_KEY_LENGTH = 16
+
+
+def _caller(request):
+    user = request.user
+    if user and user.is_authenticated:
+        return f"customer:{getattr(user, 'customer_id', None) or user.pk}"
+    if api_settings.NUM_PROXIES is None:
+        # Without a trusted proxy count X-Forwarded-For is whatever the client sent
+        return f"ip:{request.META.get('REMOTE_ADDR')}"
+    return f"ip:{BaseThrottle().get_ident(request)}"
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _identity(data):
+    return data
+
+
+def idempotent(view=None, *, ttl_setting='IDEMPOTENCY_KEY_TTL', to_record=_identity, from_record=_identity):
+    if view is None:
+        return functools.partial(idempotent, ttl_setting=ttl_setting, to_record=to_record, from_record=from_record)
+
+    scope = f"{view.__module__}.{view.__qualname__}"
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(request, *args, **kwargs)
+        authenticated = bool(request.user and request.user.is_authenticated)
+        min_length = 1 if authenticated else MIN_ANONYMOUS_KEY_LENGTH
+        if not min_length <= len(key) <= MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f"{HEADER} must be {min_length}-{MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        digest = hashlib.sha256(f"{scope}\0{_caller(request)}\0{key}".encode()).hexdigest()
+        record_key = f"idempotency:{digest}"
+        lock_key = f"idempotency:lock:{digest}"
+        fingerprint = _fingerprint(request)
+
+        try:
+            response = _replay(cache.get(record_key), fingerprint, from_record)
+            if response is not None:
+                return response
+            locked = cache.add(lock_key, 1, settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        except Exception:
+            logger.warning("Idempotency cache unavailable, serving %s without replay", scope, exc_info=True)
+            return view(request, *args, **kwargs)
+
+        if not locked:
+            return Response(
+                {'detail': f"A request with this {HEADER} is still in progress."},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Retry-After': '1'},
+            )
+        try:
+            # The first request may have finished between the get() and the add()
+            try:
+                record = cache.get(record_key)
+            except Exception:
+                logger.warning("Idempotency cache read failed for %s", scope, exc_info=True)
+                record = None
+            response = _replay(record, fingerprint, from_record)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                try:
+                    cache.set(
+                        record_key,
+                        {'fingerprint': fingerprint, 'status': response.status_code, 'data': to_record(response.data)},
+                        getattr(settings, ttl_setting),
+                    )
+                except Exception:
+                    # The view already committed: its response goes out even if the replay is lost
+                    logger.warning("Idempotency record not stored for %s", scope, exc_info=True)
+            return response
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                logger.warning("Idempotency lock not released for %s", scope, exc_info=True)
+
+    return wrapper
+
+
+def _replay(record, fingerprint, from_record):
+    if record is None:
+        return None
+    if record['fingerprint'] != fingerprint:
+        return Response(
+            {'detail': f"This {HEADER} was already used with a different request body."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    data = from_record(record['data'])
+    if data is None:
+        return None
+    return Response(data, status=record['status'], headers={'Idempotent-Replayed': 'true'})
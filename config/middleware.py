@@ -1,6 +1,9 @@
 # config/middleware.py
 import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.http import JsonResponse
+from whitenoise.middleware import WhiteNoiseMiddleware as _WhiteNoiseMiddleware
 
 class HealthCheckMiddleware:
     def __init__(self, get_response):
@@ -31,4 +34,32 @@ class HealthCheckMiddleware:
                 'uptime_robot': 'enabled'
             })
         
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+class WhiteNoiseMiddleware(_WhiteNoiseMiddleware):
+    """
+    WhiteNoise قادر على العمل sync و async.
+    WhiteNoise 6.6 متزامن فقط: تحت ASGI يحوّل Django كل ما بعده إلى sync ويحجز خيطاً
+    لكل طلب طوال انتظاره، فلا تستفيد الـ views غير المتزامنة.
+    """
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # DEBUG فقط: يبحث في نظام الملفات
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,35 @@
+"""
+Read-only "projection" serializers for list endpoints.
+
+A projection declares the output keys and the ``values()`` lookups they come
+from. The view paginates ``Projection.project(queryset)`` (one query, the
+joins done by the ORM, no model instances), and the serializer turns each row
+into a plain dict. They plug into DRF generic views in place of a
+ModelSerializer, for listing only.
+"""
+
+
+class ProjectionSerializer:
+    # output key -> values() lookup, e.g. {'category_name': 'category__name'}
+    fields = {}
+    # Extra lookups fetched but not rendered (keyset pagination needs the ordering keys)
+    keys = ('id',)
+
+    def __init__(self, instance=None, many=True, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def project(cls, queryset):
+        lookups = list(dict.fromkeys([*cls.fields.values(), *cls.keys]))
+        return queryset.values(*lookups)
+
+    def to_representation(self, row):
+        return {name: row[lookup] for name, lookup in self.fields.items()}
+
+    @property
+    def data(self):
+        if not self.many:
+            return self.to_representation(self.instance)
+        return [self.to_representation(row) for row in self.instance]
@@ -0,0 +1,27 @@
+"""
+Access to the raw Redis client behind CACHES['default'].
+
+Some features need Redis data structures the Django cache API does not
+expose (bitmaps, sets, sorted sets, Lua scripts). They call ``get_redis()``
+and fall back to the plain cache API when the project runs on LocMemCache.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def get_redis():
+    """Return the raw redis-py client, or None when the cache is not django-redis."""
+    backend = settings.CACHES['default']['BACKEND']
+    if not backend.startswith('django_redis.'):
+        return None
+    try:
+        from django_redis import get_redis_connection
+    except ImportError:
+        return None
+    return get_redis_connection('default')
+
+
+def redis_key(name):
+    """Namespace a raw Redis key the same way the cache namespaces its keys."""
+    return cache.make_key(name)
@@ -0,0 +1,32 @@
+"""
+JSON rendering with orjson.
+
+orjson serializes dicts/lists of plain values several times faster than the
+stdlib encoder used by DRF's JSONRenderer. Datetimes are emitted in the same
+ISO 8601 form DRF uses (UTC as ``Z``). Without orjson installed the renderer
+behaves exactly like JSONRenderer.
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            options |= orjson.OPT_INDENT_2
+        # Decimals, UUID subclasses, lazy strings... fall back to DRF's encoder
+        return orjson.dumps(data, default=JSONEncoder().default, option=options)
@@ -7,12 +7,18 @@ from pathlib import Path
 import dj_database_url
 import warnings
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # ============= CORE SETTINGS =============
 SECRET_KEY = os.environ.get('SECRET_KEY', 'fallback-secret-key-for-render')
 DEBUG = os.environ.get('DEBUG', 'False') == 'True'
+# Served by gunicorn + uvicorn workers (config.asgi); I/O-bound endpoints switch to async views
+ASGI_MODE = os.environ.get('ASGI_MODE', 'False') == 'True'
+# The async notification list benchmarked slower than the sync view (bench_asgi), so under
+# ASGI_MODE it stays sync unless this is turned on separately
+ASGI_ASYNC_NOTIFICATIONS = os.environ.get('ASGI_ASYNC_NOTIFICATIONS', 'False') == 'True'
 
 # Render.com specific
 RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
@@ -54,7 +60,7 @@ INSTALLED_APPS = [
 # ============= MIDDLEWARE =============
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "config.middleware.WhiteNoiseMiddleware",  # async-capable subclass (ASGI_MODE)
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -73,6 +79,9 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+# Idempotency-Key on purchase/recharge/account creation (config.idempotency)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 
 # ============= DATABASE =============
 # Render provides DATABASE_URL automatically
@@ -81,10 +90,16 @@ if DATABASE_URL:
     DATABASES = {
         'default': dj_database_url.config(
             default=DATABASE_URL,
-            conn_max_age=600,
+            # Persistent connections are per thread; under ASGI each request may land on a
+            # different thread, so rely on the server-side pooler (Supabase/PgBouncer) instead.
+            # DATABASE_URL must then point at the pooler, not the direct host (see render.yaml)
+            conn_max_age=0 if ASGI_MODE else 600,
             conn_health_checks=True,
         )
     }
+    if ASGI_MODE:
+        # The transaction-mode pooler cannot keep named cursors between statements (.iterator())
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
     print("✅ Using Render PostgreSQL database")
 else:
     DATABASES = {
@@ -173,30 +188,49 @@ else:
     }
     print("⚠️  Upstash Redis disabled | Using Local Memory Cache")
 
+# Read models (cached projections)
+WALLET_STATUS_CACHE_TTL = int(os.environ.get('WALLET_STATUS_CACHE_TTL', 60 * 60))  # 1 hour
+
+# Charge code Bloom filter (Redis only)
+CHARGE_CODE_FILTER_REFRESH_SECONDS = int(os.environ.get('CHARGE_CODE_FILTER_REFRESH_SECONDS', 30))
+CHARGE_CODE_FILTER_RECHECK_SECONDS = float(os.environ.get('CHARGE_CODE_FILTER_RECHECK_SECONDS', 1))  # per process
+CHARGE_CODE_FILTER_ERROR_RATE = float(os.environ.get('CHARGE_CODE_FILTER_ERROR_RATE', 0.001))
+
 # ============= REST FRAMEWORK CONFIGURATION =============
 REST_FRAMEWORK = {
+    # الجلسات مطلوبة فقط لواجهة DRF القابلة للتصفح أثناء التطوير
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
+    ) if DEBUG else (
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
+    # One Redis EVALSHA per request (anon/user rate + the view's scope rate)
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'config.throttling.RedisRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
-        'user': '1000/day'
+        'user': '1000/day',
+        'login': '10/min',
+        'recover_serial': '5/hour',
+        'recharge': '10/min',
+        'purchases': '30/min',
     },
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Proxies in front of the app that append to X-Forwarded-For (Render: 1). Unset, throttling keys on
+    # the raw header (DRF default) and config.idempotency on REMOTE_ADDR
+    'NUM_PROXIES': int(os.environ['NUM_PROXIES']) if os.environ.get('NUM_PROXIES') else None,
+    # Keyset pagination (no COUNT, no OFFSET); views declare their `ordering`
+    'DEFAULT_PAGINATION_CLASS': 'config.pagination.KeysetCursorPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'config.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ] if DEBUG else [
-        'rest_framework.renderers.JSONRenderer',
+        'config.renderers.ORJSONRenderer',
     ]
 }
 
@@ -229,6 +263,48 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Pre-provisioned temporary accounts (see replenish_account_pool)
+ACCOUNT_POOL_WATERMARK = int(os.environ.get('ACCOUNT_POOL_WATERMARK', 50))
+
+# last_login updates are buffered per worker and flushed in one UPDATE
+LAST_LOGIN_FLUSH_INTERVAL = int(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', 5))  # seconds
+
+# Revoked refresh tokens live in Redis (accounts.token_blacklist); each worker keeps
+# a Bloom filter of them, re-synced at most every TOKEN_BLACKLIST_SYNC_SECONDS from a
+# log of the last TOKEN_BLACKLIST_LOG_SIZE revocations, and rebuilt without expired
+# tokens every TOKEN_BLACKLIST_REBUILD_SECONDS
+TOKEN_BLACKLIST_SYNC_SECONDS = int(os.environ.get('TOKEN_BLACKLIST_SYNC_SECONDS', 5))
+TOKEN_BLACKLIST_LOG_SIZE = int(os.environ.get('TOKEN_BLACKLIST_LOG_SIZE', 10000))
+TOKEN_BLACKLIST_REBUILD_SECONDS = int(os.environ.get('TOKEN_BLACKLIST_REBUILD_SECONDS', 3600))
+TOKEN_BLACKLIST_BLOOM_CAPACITY = int(os.environ.get('TOKEN_BLACKLIST_BLOOM_CAPACITY', 100000))
+TOKEN_BLACKLIST_BLOOM_ERROR_RATE = float(os.environ.get('TOKEN_BLACKLIST_BLOOM_ERROR_RATE', 0.001))
+
+# Authenticated principal cache (accounts.authentication): per-process LRU + shared cache
+PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 300))  # seconds
+PRINCIPAL_LOCAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_LOCAL_CACHE_TTL', 10))  # seconds
+PRINCIPAL_LOCAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_LOCAL_CACHE_SIZE', 10000))
+
+# Public catalog responses (products.cache): stored per catalog version, and
+# cacheable by browsers / Cloudflare for the given number of seconds
+CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 86400))
+CATALOG_CACHE_MAX_AGE = int(os.environ.get('CATALOG_CACHE_MAX_AGE', 60))
+CATALOG_CACHE_EDGE_MAX_AGE = int(os.environ.get('CATALOG_CACHE_EDGE_MAX_AGE', 300))
+
+# TechnicalFile.file_image derivatives (products.images)
+FILE_IMAGE_WIDTHS = [int(w) for w in os.environ.get('FILE_IMAGE_WIDTHS', '160,320,640,1280').split(',')]
+FILE_IMAGE_WORKERS = int(os.environ.get('FILE_IMAGE_WORKERS', 2))
+
+# Per-customer owned file ids (sales.ownership)
+OWNED_FILES_CACHE_TTL = int(os.environ.get('OWNED_FILES_CACHE_TTL', 86400))  # seconds
+
+# Per-worker throttle buckets kept in front of Redis (config.throttling)
+THROTTLE_LOCAL_MAX_KEYS = int(os.environ.get('THROTTLE_LOCAL_MAX_KEYS', 10000))
+
+# Idempotency-Key replay for money-moving endpoints (config.idempotency)
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 86400))  # seconds a response is replayed
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 30))  # seconds, in-flight lock
+IDEMPOTENCY_ACCOUNT_TTL = int(os.environ.get('IDEMPOTENCY_ACCOUNT_TTL', 300))  # seconds, account creation retries
+
 # ============= SECURITY SETTINGS =============
 CSRF_TRUSTED_ORIGINS = [
     'https://*.onrender.com',
@@ -253,10 +329,10 @@ if not DEBUG:
     X_FRAME_OPTIONS = 'DENY'
     
     # Rate limiting for production
-    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].update({
         'anon': '50/day',
         'user': '500/day'
-    }
+    })
 
 # ============= TEMPLATES CONFIGURATION =============
 TEMPLATES = [
@@ -338,3 +414,16 @@ warnings.filterwarnings('ignore', category=UserWarning, module='whitenoise')
 CLOUDFLARE_WORKER_ENABLED = os.environ.get('CLOUDFLARE_WORKER_ENABLED', 'True') == 'True'
 CLOUDFLARE_WORKER_URL = os.environ.get('CLOUDFLARE_WORKER_URL', '')
 CLOUDFLARE_WORKER_SECRET = os.environ.get('CLOUDFLARE_WORKER_SECRET', '')
+
+# Pooled client for the Worker API (sales.utils.worker_client)
+CLOUDFLARE_WORKER_POOL_SIZE = int(os.environ.get('CLOUDFLARE_WORKER_POOL_SIZE', 10))
+CLOUDFLARE_WORKER_CONNECT_TIMEOUT = float(os.environ.get('CLOUDFLARE_WORKER_CONNECT_TIMEOUT', 1.0))  # seconds
+CLOUDFLARE_WORKER_READ_TIMEOUT = float(os.environ.get('CLOUDFLARE_WORKER_READ_TIMEOUT', 2.0))  # seconds
+CLOUDFLARE_WORKER_DEADLINE = float(os.environ.get('CLOUDFLARE_WORKER_DEADLINE', 4.0))  # total, including retries
+CLOUDFLARE_WORKER_MAX_RETRIES = int(os.environ.get('CLOUDFLARE_WORKER_MAX_RETRIES', 2))
+CLOUDFLARE_WORKER_RETRY_BACKOFF = float(os.environ.get('CLOUDFLARE_WORKER_RETRY_BACKOFF', 0.1))  # seconds
+CLOUDFLARE_WORKER_BREAKER_THRESHOLD = int(os.environ.get('CLOUDFLARE_WORKER_BREAKER_THRESHOLD', 5))
+CLOUDFLARE_WORKER_BREAKER_RESET_SECONDS = float(os.environ.get('CLOUDFLARE_WORKER_BREAKER_RESET_SECONDS', 30))
+# Mint HMAC-signed /s/<token> links locally instead of storing tokens through
+# /_api/store (requires the matching cloudflare_utils/worker.js deployed)
+CLOUDFLARE_WORKER_SIGNED_LINKS = os.environ.get('CLOUDFLARE_WORKER_SIGNED_LINKS', 'False') == 'True'
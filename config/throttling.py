@@ -0,0 +1,208 @@
+"""
+Redis rate limiting with one EVALSHA per request.
+
+Every limit is a GCRA (generic cell rate algorithm) bucket: Redis stores a
+single "theoretical arrival time" per key, and a Lua script checks and
+advances all the limits a request is subject to atomically, using the Redis
+clock so gunicorn workers never disagree.
+
+Each worker also keeps a local copy of the same buckets. A worker's own
+allowed requests are a subset of the global ones, so when its local bucket
+is empty (or Redis recently said "wait N seconds") the request is rejected
+without a network round trip. Without Redis (LocMemCache) the local buckets
+are the limiter.
+
+Requires Redis >= 5 (effects replication of scripts that call TIME).
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .redis_utils import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+# KEYS: one bucket per limit; ARGV: (emission interval ms, period ms) per key.
+# Returns {0, 0} when allowed, else {index of the first exhausted key, wait ms}.
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tats = {}
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[2 * i - 1])
+    local period = tonumber(ARGV[2 * i])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then tat = now end
+    local new_tat = tat + interval
+    if new_tat - period > now then
+        return {i, new_tat - period - now}
+    end
+    tats[i] = new_tat
+end
+for i = 1, #KEYS do
+    redis.call('SET', KEYS[i], tats[i], 'PX', tats[i] - now)
+end
+return {0, 0}
+"""
+
+_script = None
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'100/day' -> (emission interval ms, period ms)."""
+    num, period = rate.split('/')
+    period_ms = DURATIONS[period[0]] * 1000
+    return max(1, period_ms // int(num)), period_ms
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class LocalBuckets:
+    """Per-process GCRA buckets, bounded LRU by key."""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tat ms, blocked until ms]
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        entry = self._buckets.get(key)
+        if entry is None:
+            entry = self._buckets[key] = [0, 0]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return entry
+
+    def check(self, limits, now):
+        """Wait in ms before the request could conform locally (0 = conforms)."""
+        wait = 0
+        with self._lock:
+            for key, interval, period in limits:
+                tat, blocked_until = self._entry(key)
+                new_tat = max(tat, now) + interval
+                wait = max(wait, blocked_until - now, new_tat - period - now)
+        return wait
+
+    def record(self, limits, now):
+        with self._lock:
+            for key, interval, period in limits:
+                entry = self._entry(key)
+                entry[0] = max(entry[0], now) + interval
+
+    def block(self, key, until):
+        with self._lock:
+            entry = self._entry(key)
+            entry[1] = max(entry[1], until)
+
+
+local_buckets = LocalBuckets(settings.THROTTLE_LOCAL_MAX_KEYS)
+
+
+def consume(limits):
+    """
+    Check and consume one request against every (key, interval ms, period ms) limit.
+    Returns 0 when allowed, otherwise the wait in seconds.
+    """
+    global _script
+
+    now = _now_ms()
+    wait = local_buckets.check(limits, now)
+    if wait > 0:
+        return wait / 1000
+
+    client = get_redis()
+    if client is not None:
+        try:
+            if _script is None:
+                _script = client.register_script(GCRA_SCRIPT)
+            args = []
+            for _, interval, period in limits:
+                args += [interval, period]
+            denied, wait = _script(keys=[redis_key(key) for key, _, _ in limits], args=args, client=client)
+        except Exception:
+            # Redis unavailable: the local buckets keep limiting this worker
+            logger.warning("redis throttle unavailable, using local buckets", exc_info=True)
+        else:
+            if denied:
+                local_buckets.block(limits[denied - 1][0], now + wait)
+                return wait / 1000
+
+    local_buckets.record(limits, now)
+    return 0
+
+
+class RedisRateThrottle(BaseThrottle):
+    """
+    Replaces AnonRateThrottle + UserRateThrottle: the 'anon' or 'user' rate
+    depending on authentication, plus an optional per-endpoint ``scope`` rate,
+    all checked in the same script call.
+    """
+
+    scope = None
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def get_rate(self, scope):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
+
+    def get_limits(self, request, view):
+        authenticated = bool(request.user and request.user.is_authenticated)
+        ident = self.get_ident_for(request)
+        scopes = ['user' if authenticated else 'anon']
+        if self.scope:
+            scopes.append(self.scope)
+
+        limits = []
+        for scope in scopes:
+            rate = self.get_rate(scope)
+            if rate is None:
+                continue
+            interval, period = parse_rate(rate)
+            limits.append((self.cache_format % {'scope': scope, 'ident': ident}, interval, period))
+        return limits
+
+    def allow_request(self, request, view):
+        limits = self.get_limits(request, view)
+        if not limits:
+            return True
+        self._wait = consume(limits)
+        return self._wait == 0
+
+    def wait(self):
+        return self._wait
+
+
+class LoginRateThrottle(RedisRateThrottle):
+    scope = 'login'
+
+    def get_ident_for(self, request):
+        # Login attempts are limited per client address even with a token attached
+        return self.get_ident(request)
+
+
+class RecoverSerialRateThrottle(LoginRateThrottle):
+    scope = 'recover_serial'
+
+
+class RechargeRateThrottle(RedisRateThrottle):
+    scope = 'recharge'
+
+
+class PurchaseRateThrottle(RedisRateThrottle):
+    scope = 'purchases'
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.urls import path
 from django.http import JsonResponse
 
@@ -8,8 +10,29 @@ def home(request):
 def health(request):
     return JsonResponse({'status': 'healthy', 'service': 'Django Health Check'})
 
+async def ready(request):
+    """فحص الجاهزية: قاعدة البيانات والكاش بالاستدعاءات غير المتزامنة."""
+    checks = {}
+    try:
+        await User.objects.only('id').afirst()
+        checks['database'] = 'ok'
+    except Exception as e:
+        checks['database'] = str(e)
+    try:
+        await cache.aset('health:ready', 1, 10)
+        checks['cache'] = 'ok' if await cache.aget('health:ready') == 1 else 'miss'
+    except Exception as e:
+        checks['cache'] = str(e)
+
+    healthy = all(value == 'ok' for value in checks.values())
+    return JsonResponse(
+        {'status': 'ready' if healthy else 'degraded', 'checks': checks},
+        status=200 if healthy else 503,
+    )
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', home, name='home'),
     path('health/', health, name='health'),
+    path('health/ready/', ready, name='health-ready'),
 ]
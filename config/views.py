@@ -68,7 +68,21 @@ def health_check(request):
             'error': str(e)[:100]
         }
     
-    # 4. تحديد الحالة العامة
+    # 4. مخزون الحسابات المؤقتة الجاهزة
+    try:
+        from accounts.account_pool import pool_stats
+        pool = pool_stats()
+        checks['account_pool'] = {
+            'status': 'healthy' if pool['depth'] >= pool['watermark'] // 4 else 'warning',
+            **pool
+        }
+    except Exception as e:
+        checks['account_pool'] = {
+            'status': 'unknown',
+            'error': str(e)[:100]
+        }
+    
+    # 5. تحديد الحالة العامة
     has_critical = any(
         check.get('status') == 'unhealthy' 
         for check in checks.values()
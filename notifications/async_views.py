@@ -0,0 +1,15 @@
+# في notifications/async_views.py
+"""قائمة الإشعارات بالـ ORM غير المتزامن لوضع ASGI (ASGI_MODE و ASGI_ASYNC_NOTIFICATIONS، راجع notifications/urls.py)."""
+from config.async_api import api_view, json_response
+from config.pagination import KeysetCursorPagination
+from .models import Notification
+from .serializers import NotificationProjection
+from .views import NotificationListView
+
+
+@api_view(['GET'])
+async def notification_list(request):
+    queryset = NotificationProjection.project(Notification.objects.filter(customer_id=request.user.customer_id))
+    paginator = KeysetCursorPagination()
+    page = await paginator.apaginate_queryset(queryset, request, view=NotificationListView)
+    return json_response(paginator.get_paginated_data(NotificationProjection(page, many=True).data))
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["customer", "-timestamp", "-id"],
+                name="notif_customer_ts_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["customer", "is_read"], name="notif_customer_read_idx"
+            ),
+        ),
+    ]
@@ -18,6 +18,12 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-timestamp'] # الأحدث يظهر أولاً
+        indexes = [
+            # قائمة الإشعارات بترقيم keyset على (timestamp, id)
+            models.Index(fields=['customer', '-timestamp', '-id'], name='notif_customer_ts_id_idx'),
+            # عدد/قائمة غير المقروءة
+            models.Index(fields=['customer', 'is_read'], name='notif_customer_read_idx'),
+        ]
         
     def __str__(self):
         return f"[{'READ' if self.is_read else 'NEW'}] {self.title} for {self.customer.serial}"
\ No newline at end of file
@@ -1,6 +1,7 @@
 # في notifications/serializers.py
 from rest_framework import serializers
 from .models import Notification
+from config.projections import ProjectionSerializer
 
 # Serializer لعرض بيانات الإشعار
 class NotificationSerializer(serializers.ModelSerializer):
@@ -12,4 +13,14 @@ class NotificationSerializer(serializers.ModelSerializer):
         
 # Serializer لتحديث حالة is_read (لجعل الإشعار مقروءاً)
 class MarkAsReadSerializer(serializers.Serializer):
-    notification_id = serializers.IntegerField()
\ No newline at end of file
+    notification_id = serializers.IntegerField()
+
+# نسخة سريعة لقائمة الإشعارات (من values() بدون كائنات نماذج)
+class NotificationProjection(ProjectionSerializer):
+    fields = {
+        'id': 'id',
+        'title': 'title',
+        'message': 'message',
+        'is_read': 'is_read',
+        'timestamp': 'timestamp',
+    }
@@ -1,10 +1,18 @@
 # في notifications/urls.py
+from django.conf import settings
 from django.urls import path
 from .views import NotificationListView, MarkNotificationAsReadView
 
+# النسخة async (notifications/async_views.py) كانت أبطأ من المتزامنة في bench_asgi،
+# لذلك تُفعَّل بإعداد مستقل عن ASGI_MODE
+if settings.ASGI_MODE and settings.ASGI_ASYNC_NOTIFICATIONS:
+    from .async_views import notification_list
+else:
+    notification_list = NotificationListView.as_view()
+
 urlpatterns = [
     # 1. جلب جميع الإشعارات
-    path('list/', NotificationListView.as_view(), name='notification_list'),
+    path('list/', notification_list, name='notification_list'),
     
     # 2. وضع إشعار كـ "مقروء"
     path('mark-read/', MarkNotificationAsReadView.as_view(), name='mark_read'),
@@ -5,16 +5,17 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from .models import Notification
-from .serializers import NotificationSerializer, MarkAsReadSerializer
+from .serializers import NotificationProjection, MarkAsReadSerializer
 
 # 1. عارض جلب قائمة الإشعارات (لعميل معين)
 class NotificationListView(generics.ListAPIView):
-    serializer_class = NotificationSerializer
+    serializer_class = NotificationProjection
     permission_classes = [IsAuthenticated]
+    ordering = ('-timestamp', '-id')
 
     # جلب الإشعارات التي تخص العميل المسجل دخوله فقط
     def get_queryset(self):
-        return Notification.objects.filter(customer=self.request.user.customer).order_by('-timestamp')
+        return NotificationProjection.project(Notification.objects.filter(customer_id=self.request.user.customer_id))
 
 # 2. عارض لتحديد إشعار واحد كمقروء
 class MarkNotificationAsReadView(APIView):
@@ -25,13 +26,13 @@ class MarkNotificationAsReadView(APIView):
         serializer.is_valid(raise_exception=True)
         
         notification_id = serializer.validated_data['notification_id']
-        customer = request.user.customer # العميل الحالي
+        customer_id = request.user.customer_id # العميل الحالي (من الهوية المخزنة)
         
         # البحث عن الإشعار الذي يخص العميل المطلوب تحديثه
         notification = get_object_or_404(
             Notification, 
             id=notification_id, 
-            customer=customer
+            customer_id=customer_id
         )
         
         notification.is_read = True
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Category, TechnicalFile
+from . import search
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -9,3 +10,23 @@ class CategoryAdmin(admin.ModelAdmin):
 class TechnicalFileAdmin(admin.ModelAdmin):
     list_display = ['title', 'category', 'price_coins', 'is_available']
     search_fields = ['title', 'description']
+    readonly_fields = ['purchase_count']
+
+    # حقول تكتبها مسارات أخرى بـ UPDATE ذري (المشتريات، النسخ المصغرة)؛ تعديل المدير لا يكتب
+    # القيم المحملة مع النموذج فوقها
+    BACKGROUND_FIELDS = {'purchase_count', 'file_image_variants'}
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        obj.save(update_fields=[
+            field.name for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name not in self.BACKGROUND_FIELDS
+        ])
+
+    def get_search_results(self, request, queryset, search_term):
+        # البحث النصي المفهرس بدلاً من ILIKE '%x%' على كل الصفوف
+        if not search_term:
+            return queryset, False
+        matches = search.search(queryset.model.objects.all(), search_term).values('id')
+        return queryset.filter(id__in=matches), False
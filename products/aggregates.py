@@ -0,0 +1,70 @@
+# في products/aggregates.py
+"""
+إحصاءات التصنيف المخزنة (file_count, min_price, max_price) للملفات المتاحة.
+
+كل تغيير في ملف = إزالة مساهمته القديمة وإضافة الجديدة بـ UPDATE مشروط على صف التصنيف:
+- الإضافة: العدد +1 والحدود بـ LEAST/GREATEST (بدون قراءة).
+- الإزالة: العدد -1، ويُعاد حساب الحد الأدنى/الأعلى بـ subquery (بحث في الفهرس
+  (is_available, category, price_coins, id)) فقط إذا كان السعر المُزال هو الحد نفسه.
+المسارات التي تتجاوز الإشارات (bulk_create، update) تُصلح بأمر repair_category_stats.
+"""
+from django.db.models import Case, Count, F, Max, Min, OuterRef, Subquery, Value, When
+from django.db.models.functions import Greatest, Least
+
+from .models import Category, TechnicalFile
+
+
+def _available_prices(category_ref, descending=False):
+    return (
+        TechnicalFile.objects.filter(category_id=category_ref, is_available=True)
+        .order_by('-price_coins' if descending else 'price_coins')
+        .values('price_coins')[:1]
+    )
+
+
+def add(category_id, price):
+    Category.objects.filter(pk=category_id).update(
+        file_count=F('file_count') + 1,
+        # LEAST/GREATEST مع NULL تختلف بين قواعد البيانات، نعالج NULL صراحة
+        min_price=Case(When(min_price__isnull=True, then=Value(price)), default=Least('min_price', Value(price))),
+        max_price=Case(When(max_price__isnull=True, then=Value(price)), default=Greatest('max_price', Value(price))),
+    )
+
+
+def remove(category_id, price):
+    categories = Category.objects.filter(pk=category_id)
+    categories.filter(file_count__gt=0).update(file_count=F('file_count') - 1)
+    categories.filter(min_price__gte=price).update(min_price=Subquery(_available_prices(OuterRef('pk'))))
+    categories.filter(max_price__lte=price).update(
+        max_price=Subquery(_available_prices(OuterRef('pk'), descending=True))
+    )
+
+
+def apply_change(old_state, new_state):
+    """old_state/new_state: (category_id, price) أو None (غير متاح / غير موجود)."""
+    if old_state == new_state:
+        return
+    if old_state is not None:
+        remove(*old_state)
+    if new_state is not None:
+        add(*new_state)
+
+
+def recompute_all(batch_size=500):
+    """إعادة حساب كل التصنيفات من استعلام GROUP BY واحد. يُرجع عدد التصنيفات المُصحّحة."""
+    stats = {
+        row['category_id']: (row['count'], row['min_price'], row['max_price'])
+        for row in TechnicalFile.objects.filter(is_available=True).order_by()
+        .values('category_id')
+        .annotate(count=Count('id'), min_price=Min('price_coins'), max_price=Max('price_coins'))
+    }
+
+    changed = []
+    for category in Category.objects.only('id', 'file_count', 'min_price', 'max_price').iterator():
+        expected = stats.get(category.pk, (0, None, None))
+        if (category.file_count, category.min_price, category.max_price) != expected:
+            category.file_count, category.min_price, category.max_price = expected
+            changed.append(category)
+
+    Category.objects.bulk_update(changed, ['file_count', 'min_price', 'max_price'], batch_size=batch_size)
+    return len(changed)
@@ -0,0 +1,151 @@
+# في products/bestsellers.py
+"""
+ترتيب الأكثر مبيعاً لكل تصنيف، محدَّث تدريجياً مع كل شراء.
+
+- المصدر الدائم: العمود TechnicalFile.purchase_count (+1 بـ UPDATE داخل transaction الشراء).
+- للقراءة: sorted set في Redis لكل تصنيف (bestsellers:<category_id>) وآخر للكل (bestsellers:all)،
+  ZINCRBY بعد نجاح الـ transaction، والقراءة ZREVRANGE بـ O(log n + limit).
+- تحتوي المجموعات على الملفات المتاحة فقط: الإشارات تنقل/تحذف العضو عند تغيّر التصنيف أو الإتاحة.
+- قبل بناء المجموعات (أو بدون Redis) القراءة من الفهرس (is_available, category, -purchase_count, id).
+- rebuild_bestsellers يعيد حساب العدادات والمجموعات من المشتريات في استعلام مجمّع واحد.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from config.redis_utils import get_redis, redis_key
+
+from .models import TechnicalFile
+
+logger = logging.getLogger(__name__)
+
+ALL = 'all'
+READY_KEY = 'bestsellers:ready'
+
+
+def ranking_key(category_id):
+    return f"bestsellers:{category_id}"
+
+
+def record_purchase(technical_file, count=1):
+    """يُستدعى داخل transaction الشراء: العداد الدائم الآن، والترتيب بعد نجاح الـ commit."""
+    TechnicalFile.objects.filter(pk=technical_file.pk).update(purchase_count=F('purchase_count') + count)
+    files = [(technical_file.pk, technical_file.category_id)]
+    transaction.on_commit(lambda: _increment(files, count))
+
+
+def record_purchases(technical_files):
+    """الشراء المجمّع (كل ملف مرة واحدة): UPDATE واحد لكل الملفات و pipeline واحد بعد الـ commit."""
+    files = [(technical_file.pk, technical_file.category_id) for technical_file in technical_files]
+    TechnicalFile.objects.filter(pk__in=[file_id for file_id, _ in files]).update(
+        purchase_count=F('purchase_count') + 1
+    )
+    transaction.on_commit(lambda: _increment(files, 1))
+
+
+def _increment(files, count):
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for file_id, category_id in files:
+            pipe.zincrby(redis_key(ranking_key(category_id)), count, file_id)
+            pipe.zincrby(redis_key(ranking_key(ALL)), count, file_id)
+        pipe.execute()
+    except Exception:
+        # العداد في قاعدة البيانات صحيح؛ rebuild_bestsellers يُصلح الترتيب
+        logger.warning("failed to update bestseller ranking for files %s", [f for f, _ in files], exc_info=True)
+
+
+def apply_change(file_id, old_category_id, new_category_id):
+    """
+    نقل الملف بين الترتيبات عند تغيّر تصنيفه أو إتاحته.
+    old/new_category_id: تصنيف الملف إن كان متاحاً، وإلا None.
+    """
+    if old_category_id == new_category_id:
+        return
+    transaction.on_commit(lambda: _move(file_id, old_category_id, new_category_id))
+
+
+def _move(file_id, old_category_id, new_category_id):
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=True)
+        if old_category_id is not None:
+            pipe.zrem(redis_key(ranking_key(old_category_id)), file_id)
+            pipe.zrem(redis_key(ranking_key(ALL)), file_id)
+        if new_category_id is not None:
+            count = TechnicalFile.objects.filter(pk=file_id).values_list('purchase_count', flat=True).first()
+            if count:
+                pipe.zadd(redis_key(ranking_key(new_category_id)), {file_id: count})
+                pipe.zadd(redis_key(ranking_key(ALL)), {file_id: count})
+        pipe.execute()
+    except Exception:
+        logger.warning("failed to move file %s between bestseller rankings", file_id, exc_info=True)
+
+
+def top_ids(category_id=None, limit=10):
+    """[(file_id, purchase_count)] الأكثر مبيعاً أولاً."""
+    key = ranking_key(category_id if category_id is not None else ALL)
+    client = get_redis()
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.exists(redis_key(READY_KEY))
+            pipe.zrevrange(redis_key(key), 0, limit - 1, withscores=True)
+            ready, ranking = pipe.execute()
+            if ready:
+                return [(int(member), int(score)) for member, score in ranking]
+        except Exception:
+            logger.warning("bestseller ranking unavailable, falling back to database", exc_info=True)
+
+    queryset = TechnicalFile.objects.filter(is_available=True, purchase_count__gt=0)
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    return list(queryset.order_by('-purchase_count', 'id').values_list('id', 'purchase_count')[:limit])
+
+
+def rebuild(batch_size=500):
+    """
+    إعادة حساب purchase_count لكل الملفات (LEFT JOIN + GROUP BY على المشتريات)
+    واستبدال كل الترتيبات في Redis ذرياً. يُرجع عدد العدادات المُصحّحة.
+    مشتريات تتم أثناء إعادة البناء قد لا تظهر في الترتيب حتى التشغيل التالي (العداد نفسه صحيح).
+    """
+    rows = (
+        TechnicalFile.objects.order_by()
+        .annotate(purchases=Count('purchase'))
+        .values_list('id', 'category_id', 'is_available', 'purchase_count', 'purchases')
+    )
+
+    changed = []
+    rankings = {}
+    for file_id, category_id, is_available, stored, purchases in rows.iterator():
+        if stored != purchases:
+            changed.append(TechnicalFile(pk=file_id, purchase_count=purchases))
+        if is_available and purchases:
+            rankings.setdefault(category_id, {})[file_id] = purchases
+            rankings.setdefault(ALL, {})[file_id] = purchases
+
+    TechnicalFile.objects.bulk_update(changed, ['purchase_count'], batch_size=batch_size)
+
+    client = get_redis()
+    if client is not None:
+        # المفاتيح الجديدة تُكتب مؤقتاً ثم RENAME، والقديمة غير الموجودة في النتيجة تُحذف
+        stale = set(client.scan_iter(redis_key(ranking_key('*')))) - {redis_key(READY_KEY).encode()}
+        pipe = client.pipeline(transaction=True)
+        for category_id, members in rankings.items():
+            key = redis_key(ranking_key(category_id))
+            stale.discard(key.encode())
+            items = list(members.items())
+            for offset in range(0, len(items), batch_size):
+                pipe.zadd(key + ':tmp', dict(items[offset:offset + batch_size]))
+            pipe.rename(key + ':tmp', key)
+        if stale:
+            pipe.delete(*stale)
+        pipe.set(redis_key(READY_KEY), 1)
+        pipe.execute()
+    return len(changed)
@@ -0,0 +1,140 @@
+# في products/cache.py
+"""
+كاش استجابات الكتالوج العام (التصنيفات والملفات) للزوار غير المسجلين.
+
+- رقم إصدار عام للكتالوج يُرفع عند أي حفظ/حذف لـ Category أو TechnicalFile (products/signals.py).
+- الاستجابة تُخزن كبايتات JSON جاهزة ونسخة مضغوطة gzip تحت مفتاح يحمل رقم الإصدار،
+  فالنسخ القديمة لا تُقرأ أبداً وتنتهي بمهلة CATALOG_CACHE_TTL.
+- ETag مشتق من الإصدار والمسار والمضيف فقط: If-None-Match يُجاب بـ 304 بقراءة الإصدار وحدها.
+  المضيف (والبروتوكول) جزء من المفتاح لأن الاستجابات تحمل روابط مطلقة.
+- Cache-Control عام ليُخزنها Cloudflare على الحافة. الاستجابات التي تعتمد على المستخدم
+  تُعلَّم private لأن Cloudflare يتجاهل Vary: Authorization.
+- إذا تعذر الوصول إلى الكاش يُعرض الكتالوج بدون كاش (بدون ETag)، ورفع الإصدار
+  بعد commit لا يُفشل الحفظ الذي ثبت.
+"""
+import gzip
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from config.renderers import ORJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'catalog:version'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+        return cache.incr(VERSION_KEY)
+
+
+def schedule_bump():
+    """رفع الإصدار بعد نجاح الـ transaction فقط (robust: فشل الكاش يُسجَّل ولا يُرفع)."""
+    transaction.on_commit(bump_version, robust=True)
+
+
+def is_cacheable(request):
+    # المستخدم المسجل قد يرى بيانات خاصة به، وواجهة DRF القابلة للتصفح ليست JSON
+    return (
+        request.method in ('GET', 'HEAD')
+        and not _is_personal(request)
+        and request.accepted_renderer.format == 'json'
+    )
+
+
+def _is_personal(request):
+    return 'HTTP_AUTHORIZATION' in request.META or request.user.is_authenticated
+
+
+def _digest(request):
+    query = sorted(request.GET.lists())
+    url = f"{request.scheme}://{request.get_host()}{request.path}?{query}"
+    return hashlib.blake2b(url.encode(), digest_size=8).hexdigest()
+
+
+def make_etag(version, request):
+    return f'"c{version}-{_digest(request)}"'
+
+
+def response_key(version, request):
+    return f"catalog:v{version}:{_digest(request)}"
+
+
+def _set_headers(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = (
+        f"public, max-age={settings.CATALOG_CACHE_MAX_AGE}, s-maxage={settings.CATALOG_CACHE_EDGE_MAX_AGE}"
+    )
+    patch_vary_headers(response, ('Accept-Encoding', 'Authorization'))
+    return response
+
+
+def _not_modified(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    tags = {tag.strip() for tag in if_none_match.split(',')}
+    return etag in tags or f"W/{etag}" in tags or '*' in tags
+
+
+def _accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+class CachedCatalogMixin:
+    """يُضاف قبل ListAPIView/RetrieveAPIView في عارضات الكتالوج."""
+
+    def get(self, request, *args, **kwargs):
+        if not is_cacheable(request):
+            response = super().get(request, *args, **kwargs)
+            if _is_personal(request):
+                patch_cache_control(response, private=True)
+                patch_vary_headers(response, ('Authorization',))
+            return response
+
+        try:
+            version = get_version()
+        except Exception:
+            logger.warning("catalog cache unavailable, serving uncached", exc_info=True)
+            return super().get(request, *args, **kwargs)
+        etag = make_etag(version, request)
+        if _not_modified(request, etag):
+            return _set_headers(HttpResponseNotModified(), etag)
+
+        key = response_key(version, request)
+        try:
+            entry = cache.get(key)
+        except Exception:
+            logger.warning("catalog cache unavailable, serving uncached", exc_info=True)
+            return super().get(request, *args, **kwargs)
+        if entry is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            body = ORJSONRenderer().render(response.data)
+            entry = {'body': body, 'gzip': gzip.compress(body)}
+            try:
+                cache.set(key, entry, settings.CATALOG_CACHE_TTL)
+            except Exception:
+                logger.warning("failed to cache catalog response %s", key, exc_info=True)
+
+        if _accepts_gzip(request):
+            response = HttpResponse(entry['gzip'], content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(entry['body'], content_type='application/json')
+        return _set_headers(response, etag)
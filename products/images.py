@@ -0,0 +1,127 @@
+# في products/images.py
+"""
+نسخ مصغرة من صور الملفات التقنية (عدة عروض بصيغتي WebP و JPEG).
+
+- التوليد لا يتم في عمال الويب (لا fork من عملية gunicorn ذات خيوط، ولا نسخة Django كاملة
+  لكل عملية ضمن حد 512MB): الأمر generate_file_images يعالج الصور التي تحتاج نسخاً
+  (needs_variants) ويعمل كـ cron job منفصل (render.yaml)، والتحجيم فيه بعمليات spawn.
+- أسماء النسخ مشتقة من hash محتوى الصورة الأصلية: file_images/variants/<hash>/<width>w.<ext>
+  فهي ثابتة (immutable) وتُخزن على R2 بـ Cache-Control طويل.
+- الخريطة تُحفظ في TechnicalFile.file_image_variants مع اسم المصدر لمعرفة متى تتقادم،
+  والخريطة المتقادمة لا تُعرض حتى يولّد الأمر النسخ الجديدة.
+"""
+import hashlib
+import io
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+VARIANT_DIR = 'file_images/variants'
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def render_variants(data, widths):
+    """
+    تعمل داخل عملية منفصلة: بايتات الصورة الأصلية -> [(width, fmt, bytes)].
+    لا تُكبَّر الصورة أبداً؛ العروض الأكبر من الأصل تُختصر إلى عرض الأصل مرة واحدة.
+    """
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    results = []
+    done = set()
+    for width in sorted(widths):
+        width = min(width, image.width)
+        if width in done:
+            continue
+        done.add(width)
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for fmt, options in FORMATS.items():
+            frame = resized
+            if fmt == 'jpeg' and frame.mode != 'RGB':
+                frame = frame.convert('RGB')
+            elif fmt == 'webp' and frame.mode not in ('RGB', 'RGBA'):
+                frame = frame.convert('RGBA')
+            buffer = io.BytesIO()
+            frame.save(buffer, **options)
+            results.append((width, fmt, buffer.getvalue()))
+    return results
+
+
+@lru_cache(maxsize=None)
+def variant_storage():
+    """نفس تخزين الوسائط، لكن على S3/R2 تُرفع النسخ بـ Cache-Control دائم."""
+    storage_class = default_storage.__class__
+    if hasattr(storage_class, 'object_parameters'):
+        parameters = dict(getattr(settings, 'AWS_S3_OBJECT_PARAMETERS', {}))
+        parameters['CacheControl'] = IMMUTABLE_CACHE_CONTROL
+        return storage_class(object_parameters=parameters)
+    return default_storage
+
+
+def variant_name(digest, width, fmt):
+    return f"{VARIANT_DIR}/{digest}/{width}w.{fmt}"
+
+
+def store_variants(source_name, data, rendered):
+    """حفظ النسخ (إن لم تكن موجودة) وإرجاع خريطة {fmt: {width: name}, 'source': name}."""
+    storage = variant_storage()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    variants = {'source': source_name}
+    for width, fmt, content in rendered:
+        name = variant_name(digest, width, fmt)
+        if not storage.exists(name):
+            storage.save(name, ContentFile(content))
+        variants.setdefault(fmt, {})[str(width)] = name
+    return variants
+
+
+def read_source(name):
+    with default_storage.open(name, 'rb') as source:
+        return source.read()
+
+
+def save_variants(file_id, variants):
+    from .cache import bump_version
+    from .models import TechnicalFile
+
+    # update() بدلاً من save(): لا نُطلق إشارة post_save (ولا نعيد الجدولة) مرة أخرى
+    TechnicalFile.objects.filter(pk=file_id).update(file_image_variants=variants)
+    bump_version()
+
+
+def needs_variants(technical_file):
+    name = technical_file.file_image.name if technical_file.file_image else None
+    return (technical_file.file_image_variants or {}).get('source') != name
+
+
+def schedule(technical_file):
+    """
+    بعد نجاح الـ transaction: حذف الصورة يُفرغ الخريطة فوراً (بدون عمل CPU)،
+    والصورة الجديدة تنتظر generate_file_images.
+    """
+    if technical_file.file_image:
+        return
+    file_id = technical_file.pk
+    transaction.on_commit(lambda: save_variants(file_id, {}))
+
+
+def variant_urls(variants, source=None):
+    """تحويل الخريطة المخزنة إلى روابط للعرض في الـ API (فارغة إذا كانت لصورة سابقة)."""
+    if (variants or {}).get('source') != (source or None):
+        return {}
+    storage = variant_storage()
+    return {
+        fmt: {width: storage.url(name) for width, name in sizes.items()}
+        for fmt, sizes in (variants or {}).items()
+        if fmt != 'source'
+    }
@@ -0,0 +1,71 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products import search
+from products.models import Category, TechnicalFile
+
+WORDS = [
+    'برنامج', 'تعريف', 'شاشة', 'هاتف', 'سامسونج', 'ايفون', 'فلاش', 'روم', 'تحديث', 'صيانة',
+    'بوردة', 'مخطط', 'شاحن', 'بطارية', 'كاميرا', 'معالج', 'ذاكرة', 'شبكة', 'راوتر', 'طابعة',
+    'firmware', 'driver', 'schematic', 'bios', 'unlock', 'root', 'recovery', 'boot', 'modem', 'emmc',
+]
+# أرقام موديلات: كلمات نادرة تمثل معظم عمليات البحث الفعلية
+MODELS = [f"{prefix}{number}" for prefix in 'agmns' for number in range(100, 500)]
+VOCABULARY = WORDS + MODELS
+
+
+class Command(BaseCommand):
+    help = (
+        "مقارنة البحث النصي المفهرس ببحث LIKE على كتالوج مؤقت "
+        "(p50/p99 لأول صفحة نتائج). البيانات تُلغى في النهاية (rollback)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with transaction.atomic():
+            category = Category.objects.create(name='bench_search')
+            self.populate(category, options['files'], options['batch_size'], rng)
+            queryset = TechnicalFile.objects.filter(category=category, is_available=True)
+
+            terms = [rng.choice(VOCABULARY) for _ in range(options['queries'])]
+            self.report('like', terms, lambda q: search.like_search(queryset, q).order_by('-id'))
+            self.report('search', terms, lambda q: search.search(queryset, q))
+
+            transaction.set_rollback(True)
+
+    def populate(self, category, count, batch_size, rng):
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            TechnicalFile.objects.bulk_create([
+                TechnicalFile(
+                    category=category,
+                    title=' '.join(rng.sample(WORDS, 2) + [rng.choice(MODELS)]),
+                    description=' '.join(rng.choices(VOCABULARY, k=25)),
+                    price_coins=rng.randint(1, 500),
+                    file_url=f'https://files.example.com/{offset + i}',
+                )
+                for i in range(min(batch_size, count - offset))
+            ])
+        self.stdout.write(f"📦 {count} ملف في {time.perf_counter() - started:.1f}s")
+
+    def report(self, label, terms, run):
+        timings = []
+        for term in terms:
+            started = time.perf_counter()
+            list(run(term)[:20])
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{label:<8} | p50: {statistics.median(timings):.2f}ms | p99: {p99:.2f}ms"
+        )
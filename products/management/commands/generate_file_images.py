@@ -0,0 +1,74 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products import images
+from products.cache import bump_version
+from products.models import TechnicalFile
+
+
+class Command(BaseCommand):
+    help = (
+        "توليد النسخ المصغرة (WebP/JPEG) لصور الكتالوج التي تحتاجها بالتوازي. "
+        "يعمل كـ cron job (render.yaml) وليس داخل عمال الويب."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.FILE_IMAGE_WORKERS)
+        parser.add_argument('--chunk-size', type=int, default=50)
+        parser.add_argument('--force', action='store_true', help="إعادة التوليد حتى لو كانت النسخ حديثة")
+
+    def handle(self, *args, **options):
+        files = (
+            TechnicalFile.objects.exclude(file_image='').exclude(file_image__isnull=True)
+            .only('id', 'file_image', 'file_image_variants').order_by('id')
+        )
+        pending = [f for f in files.iterator() if options['force'] or images.needs_variants(f)]
+        if not pending:
+            self.stdout.write("لا توجد صور تحتاج إلى نسخ مصغرة.")
+            return
+
+        started = time.perf_counter()
+        done = failed = 0
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        # spawn وليس fork: خيوط القراءة تعمل قبل إنشاء العمليات، والعملية الجديدة تستورد
+        # products.images و Pillow فقط بدلاً من نسخة كاملة من ذاكرة Django
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool, \
+                ThreadPoolExecutor(max_workers=workers * 2) as io:
+            for offset in range(0, len(pending), chunk_size):
+                chunk = pending[offset:offset + chunk_size]
+                # القراءة من التخزين (R2) متوازية في خيوط، والتحجيم في العمليات
+                sources = list(io.map(self.read, chunk))
+                futures = [
+                    pool.submit(images.render_variants, data, settings.FILE_IMAGE_WIDTHS) if data else None
+                    for data in sources
+                ]
+                for technical_file, data, future in zip(chunk, sources, futures):
+                    try:
+                        if future is None:
+                            raise ValueError("source image is missing")
+                        variants = images.store_variants(technical_file.file_image.name, data, future.result())
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f"❌ {technical_file.pk}: {e}")
+                        continue
+                    TechnicalFile.objects.filter(pk=technical_file.pk).update(file_image_variants=variants)
+                    done += 1
+                self.stdout.write(f"... {done + failed}/{len(pending)}")
+
+        bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {done} صورة ({failed} فشل) في {time.perf_counter() - started:.1f}s"
+        ))
+
+    @staticmethod
+    def read(technical_file):
+        try:
+            return images.read_source(technical_file.file_image.name)
+        except Exception:
+            return None
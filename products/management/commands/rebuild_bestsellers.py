@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.bestsellers import rebuild
+
+
+class Command(BaseCommand):
+    help = "إعادة حساب عدد مشتريات كل ملف وترتيبات الأكثر مبيعاً في Redis من استعلام مجمّع واحد على المشتريات."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        changed = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ تم تصحيح {changed} عداد وإعادة بناء الترتيبات"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.aggregates import recompute_all
+from products.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = "إعادة حساب إحصاءات التصنيفات (عدد الملفات المتاحة وأدنى/أعلى سعر) من استعلام واحد مجمّع."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        changed = recompute_all(batch_size=options['batch_size'])
+        if changed:
+            bump_version()
+        self.stdout.write(self.style.SUCCESS(f"✅ تم تصحيح {changed} تصنيف"))
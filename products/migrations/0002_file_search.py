@@ -0,0 +1,70 @@
+from django.db import migrations
+
+# تعريفات مُضمَّنة (نسخة من products.search وقت كتابة الـ migration) حتى لا يتغير
+# سلوك الـ migration مع تعديل الكود لاحقاً
+SQLITE_FTS_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_technicalfile_fts USING fts5("
+    "title, description, content='products_technicalfile', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS products_technicalfile_fts_ai AFTER INSERT ON products_technicalfile BEGIN "
+    "INSERT INTO products_technicalfile_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS products_technicalfile_fts_ad AFTER DELETE ON products_technicalfile BEGIN "
+    "INSERT INTO products_technicalfile_fts(products_technicalfile_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS products_technicalfile_fts_au "
+    "AFTER UPDATE OF title, description ON products_technicalfile BEGIN "
+    "INSERT INTO products_technicalfile_fts(products_technicalfile_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO products_technicalfile_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); "
+    "END",
+    "INSERT INTO products_technicalfile_fts(products_technicalfile_fts) VALUES ('rebuild')",
+]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        # عمود مولّد ومخزن: يُحدَّث تلقائياً مع كل INSERT/UPDATE بدون triggers
+        schema_editor.execute(
+            "ALTER TABLE products_technicalfile ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('arabic'::regconfig, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('arabic'::regconfig, coalesce(description, '')), 'B')"
+            ") STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX products_technicalfile_search_idx "
+            "ON products_technicalfile USING GIN (search_vector)"
+        )
+    elif connection.vendor == "sqlite":
+        for sql in SQLITE_FTS_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS products_technicalfile_search_idx")
+        schema_editor.execute(
+            "ALTER TABLE products_technicalfile DROP COLUMN IF EXISTS search_vector"
+        )
+    elif connection.vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(
+                f"DROP TRIGGER IF EXISTS products_technicalfile_fts_{suffix}"
+            )
+        schema_editor.execute("DROP TABLE IF EXISTS products_technicalfile_fts")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
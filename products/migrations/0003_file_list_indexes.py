@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_file_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="technicalfile",
+            index=models.Index(
+                fields=["is_available", "category", "price_coins", "id"],
+                name="file_avail_cat_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="technicalfile",
+            index=models.Index(
+                condition=models.Q(("is_available", True)),
+                fields=["price_coins", "id"],
+                name="file_available_price_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_file_list_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="technicalfile",
+            name="file_image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-18 08:54
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def backfill_category_stats(apps, schema_editor):
+    Category = apps.get_model("products", "Category")
+    TechnicalFile = apps.get_model("products", "TechnicalFile")
+    stats = (
+        TechnicalFile.objects.filter(is_available=True)
+        .order_by()
+        .values("category_id")
+        .annotate(count=Count("id"), low=Min("price_coins"), high=Max("price_coins"))
+    )
+    for row in stats:
+        Category.objects.filter(pk=row["category_id"]).update(
+            file_count=row["count"], min_price=row["low"], max_price=row["high"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_technicalfile_file_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="file_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="max_price",
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="min_price",
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_category_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 08:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_purchase_count(apps, schema_editor):
+    TechnicalFile = apps.get_model("products", "TechnicalFile")
+    Purchase = apps.get_model("sales", "Purchase")
+    counts = Purchase.objects.order_by().values("file_id").annotate(count=Count("id"))
+    for row in counts:
+        TechnicalFile.objects.filter(pk=row["file_id"]).update(
+            purchase_count=row["count"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_category_file_stats"),
+        ("sales", "0003_purchase_history_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="technicalfile",
+            name="purchase_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="technicalfile",
+            index=models.Index(
+                fields=["is_available", "category", "-purchase_count", "id"],
+                name="file_bestseller_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_purchase_count, migrations.RunPython.noop),
+    ]
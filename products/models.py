@@ -4,6 +4,11 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     
+    # إحصاءات الملفات المتاحة، تُحدَّث تدريجياً (products/aggregates.py)
+    file_count = models.PositiveIntegerField(default=0, editable=False)
+    min_price = models.IntegerField(null=True, blank=True, editable=False)
+    max_price = models.IntegerField(null=True, blank=True, editable=False)
+    
     class Meta:
         verbose_name_plural = "Categories"
         
@@ -13,11 +18,30 @@ class Category(models.Model):
 class TechnicalFile(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='files')
     file_image = models.ImageField(upload_to='file_images/', blank=True, null=True)
+    # النسخ المصغرة (products/images.py): {'webp': {'320': name}, 'jpeg': {...}, 'source': file_image.name}
+    file_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     title = models.CharField(max_length=200)
     description = models.TextField()
     price_coins = models.IntegerField()
     file_url = models.URLField(max_length=500)
     is_available = models.BooleanField(default=True)
+    # عدد المشتريات، يُزاد بـ UPDATE ذري عند كل شراء (products/bestsellers.py)
+    purchase_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # قائمة الملفات: تصفية بالتصنيف ونطاق السعر مع ترقيم keyset على (price_coins, id)
+            models.Index(fields=['is_available', 'category', 'price_coins', 'id'], name='file_avail_cat_price_idx'),
+            models.Index(fields=['price_coins', 'id'], condition=models.Q(is_available=True), name='file_available_price_idx'),
+            # الأكثر مبيعاً عند عدم توفر ترتيب Redis
+            models.Index(fields=['is_available', 'category', '-purchase_count', 'id'], name='file_bestseller_idx'),
+        ]
+
+    def stats_state(self):
+        """(التصنيف، السعر) إذا كان الملف متاحاً ويُحتسب في إحصاءات تصنيفه، وإلا None."""
+        if not self.is_available:
+            return None
+        return (self.category_id, self.price_coins)
 
     def __str__(self):
         return f"{self.title} - {self.price_coins} Coins"
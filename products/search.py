@@ -0,0 +1,98 @@
+# في products/search.py
+"""
+البحث النصي في الملفات التقنية.
+
+- PostgreSQL: عمود search_vector (tsvector مولّد ومخزن بإعداد 'arabic'، العنوان بوزن A
+  والوصف بوزن B) مع فهرس GIN، والترتيب بـ ts_rank.
+- SQLite: جدول FTS5 ظلي (products_technicalfile_fts) تحدّثه triggers، والترتيب بـ bm25.
+- غير ذلك: LIKE على العنوان والوصف بدون ترتيب.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'arabic'
+FTS_TABLE = 'products_technicalfile_fts'
+
+SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, description, content='products_technicalfile', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+]
+SQLITE_TRIGGERS_SQL = [
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products_technicalfile BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products_technicalfile BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON products_technicalfile BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+]
+
+
+def install_sqlite_fts(conn, force_rebuild=False):
+    """
+    إنشاء جدول FTS5 و triggers إن لم تكن موجودة.
+    SQLite يعيد بناء الجدول في بعض الـ migrations فتُحذف triggers معه،
+    لذلك تُستدعى أيضاً بعد كل migrate (post_migrate) وتُعيد بناء الفهرس إذا كانت ناقصة.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f"{FTS_TABLE}_%"]
+        )
+        missing = cursor.fetchone()[0] < len(SQLITE_TRIGGERS_SQL)
+        for sql in SQLITE_FTS_SQL + SQLITE_TRIGGERS_SQL:
+            cursor.execute(sql)
+        if missing or force_rebuild:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def fts_match_expression(query):
+    """تحويل نص المستخدم إلى تعبير MATCH آمن: كل كلمة بين علامتي تنصيص مع بحث بالبادئة."""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def like_search(queryset, query):
+    return queryset.filter(Q(title__icontains=query) | Q(description__icontains=query))
+
+
+def search(queryset, query):
+    """تصفية queryset بالنص query وترتيبها حسب الصلة (الأعلى أولاً)."""
+    vendor = connection.vendor
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+        vector = RawSQL(f"{table}.search_vector", [], output_field=SearchVectorField())
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return (
+            queryset.annotate(search=vector)
+            .filter(search=search_query)
+            .annotate(rank=SearchRank(vector, search_query))
+            .order_by('-rank', '-id')
+        )
+
+    if vendor == 'sqlite':
+        match = fts_match_expression(query)
+        if not match:
+            return queryset.none()
+        # bm25: القيمة الأصغر = صلة أعلى، والعنوان أهم من الوصف
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {table}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+            select={'rank': f"bm25({FTS_TABLE}, 10.0, 1.0)"},
+            order_by=['rank', '-id'],
+        )
+
+    return like_search(queryset, query).order_by('-id')
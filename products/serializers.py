@@ -1,18 +1,98 @@
 from rest_framework import serializers
 from .models import Category, TechnicalFile
+from .images import variant_urls
+from django.core.files.storage import default_storage
+from config.projections import ProjectionSerializer
+from sales.ownership import owned_among
+
+def owned_file_ids(context, file_ids):
+    """ملفات الصفحة التي يملكها المستخدم الحالي (فحص واحد في الكاش، بدون استعلامات)."""
+    request = context.get('request')
+    customer_id = getattr(getattr(request, 'user', None), 'customer_id', None)
+    if not customer_id:
+        return set()
+    return owned_among(customer_id, file_ids)
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ('id', 'name', 'description')
+        fields = ('id', 'name', 'description', 'file_count', 'min_price', 'max_price')
+
+class FileListFilterSerializer(serializers.Serializer):
+    category = serializers.IntegerField(required=False, min_value=1)
+    min_price = serializers.IntegerField(required=False, min_value=0)
+    max_price = serializers.IntegerField(required=False, min_value=0)
+    affordable = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('affordable') and not self.context['request'].user.is_authenticated:
+            raise serializers.ValidationError({"affordable": "يتطلب تسجيل الدخول."})
+        if 'min_price' in attrs and 'max_price' in attrs and attrs['min_price'] > attrs['max_price']:
+            raise serializers.ValidationError({"min_price": "الحد الأدنى أكبر من الحد الأقصى."})
+        return attrs
+
+class FileSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=100)
+
+class TopFilesQuerySerializer(serializers.Serializer):
+    category = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=50, default=10)
 
 class FileDetailSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    file_image_variants = serializers.SerializerMethodField()
+    is_owned = serializers.SerializerMethodField()
     
     class Meta:
         model = TechnicalFile
         fields = (
             'id', 'title', 'description', 
-            'file_image', 'price_coins', 
-            'category_name'
+            'file_image', 'file_image_variants', 'price_coins', 
+            'category_name', 'is_owned'
         )
+
+    def get_file_image_variants(self, obj):
+        return variant_urls(obj.file_image_variants, obj.file_image.name if obj.file_image else None)
+
+    def get_is_owned(self, obj):
+        return obj.id in owned_file_ids(self.context, [obj.id])
+
+# نسخة سريعة للقوائم (FileList / FileSearch) من values() بنفس شكل FileDetailSerializer
+class FileListProjection(ProjectionSerializer):
+    fields = {
+        'id': 'id',
+        'title': 'title',
+        'description': 'description',
+        'file_image': 'file_image',
+        'file_image_variants': 'file_image_variants',
+        'price_coins': 'price_coins',
+        'category_name': 'category__name',
+    }
+    keys = ('id', 'price_coins')
+
+    @property
+    def data(self):
+        # الملكية لكل ملفات الصفحة دفعة واحدة قبل التحويل
+        rows = list(self.instance) if self.many else [self.instance]
+        self.owned = owned_file_ids(self.context, [row['id'] for row in rows])
+        if self.many:
+            self.instance = rows
+        return super().data
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        image = data['file_image']
+        data['file_image_variants'] = variant_urls(data['file_image_variants'], image)
+        if image:
+            # نفس سلوك ImageField: رابط مطلق عند وجود request في السياق
+            url = default_storage.url(image)
+            request = self.context.get('request')
+            data['file_image'] = request.build_absolute_uri(url) if request is not None else url
+        else:
+            data['file_image'] = None
+        data['is_owned'] = row['id'] in self.owned
+        return data
+
+# الأكثر مبيعاً: نفس شكل القائمة مع عدد المشتريات
+class TopFileProjection(FileListProjection):
+    fields = {**FileListProjection.fields, 'purchase_count': 'purchase_count'}
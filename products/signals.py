@@ -0,0 +1,74 @@
+from django.db import connections, transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate
+from django.dispatch import receiver
+
+from . import aggregates, bestsellers, images
+from .cache import schedule_bump
+from .models import Category, TechnicalFile
+from .search import FTS_TABLE, install_sqlite_fts
+
+
+# أي تعديل في الكتالوج (لوحة الإدارة أو غيرها) يُبطل كل الاستجابات المخزنة
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=TechnicalFile)
+@receiver(post_delete, sender=TechnicalFile)
+def bump_catalog_version(sender, instance, **kwargs):
+    schedule_bump()
+
+
+# إحصاءات التصنيف: الحالة السابقة للملف تُقرأ من قاعدة البيانات (وليس من النسخة في الذاكرة،
+# فقد تكون قديمة) ثم يُطبَّق الفرق. داخل transaction يُقفل الصف حتى لا يحسب حفظان متزامنان
+# الفرق من نفس الحالة السابقة
+def _stored_stats_state(pk):
+    files = TechnicalFile.objects.filter(pk=pk)
+    if transaction.get_connection().in_atomic_block:
+        files = files.select_for_update()
+    previous = files.values_list('category_id', 'price_coins', 'is_available').first()
+    return previous[:2] if previous and previous[2] else None
+
+
+@receiver(pre_save, sender=TechnicalFile)
+def capture_stats_state(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._stats_state = None if instance._state.adding else _stored_stats_state(instance.pk)
+
+
+@receiver(post_save, sender=TechnicalFile)
+def update_category_stats(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_state, new_state = instance.__dict__.pop('_stats_state', None), instance.stats_state()
+    aggregates.apply_change(old_state, new_state)
+    # ترتيب الأكثر مبيعاً يتبع التصنيف والإتاحة (أول عنصر في الحالة)
+    bestsellers.apply_change(instance.pk, old_state and old_state[0], new_state and new_state[0])
+
+
+@receiver(pre_delete, sender=TechnicalFile)
+def capture_deleted_stats_state(sender, instance, **kwargs):
+    instance._stats_state = _stored_stats_state(instance.pk)
+
+
+@receiver(post_delete, sender=TechnicalFile)
+def remove_from_category_stats(sender, instance, **kwargs):
+    old_state = instance.__dict__.pop('_stats_state', None)
+    aggregates.apply_change(old_state, None)
+    bestsellers.apply_change(instance.pk, old_state and old_state[0], None)
+
+
+# توليد النسخ المصغرة في الخلفية عند رفع صورة جديدة أو حذفها
+@receiver(post_save, sender=TechnicalFile)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw and images.needs_variants(instance):
+        images.schedule(instance)
+
+
+# SQLite: إعادة إنشاء triggers البحث إذا حذفها إعادة بناء الجدول في migration لاحقة
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    connection = connections[using]
+    if sender.label != 'products' or connection.vendor != 'sqlite':
+        return
+    if FTS_TABLE in connection.introspection.table_names():
+        install_sqlite_fts(connection)
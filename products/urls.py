@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import CategoryList, FileList, FileDetail
+from .views import CategoryList, FileList, FileDetail, FileSearch, TopFiles
 
 urlpatterns = [
     path('categories/', CategoryList.as_view(), name='category-list'),
     path('files/', FileList.as_view(), name='file-list'),
+    path('files/search/', FileSearch.as_view(), name='file-search'),
+    path('files/top/', TopFiles.as_view(), name='file-top'),
     path('files/<int:id>/', FileDetail.as_view(), name='file-detail'),
 ]
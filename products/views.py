@@ -1,16 +1,73 @@
 from rest_framework import generics
+from config.pagination import UncountedPageNumberPagination
 from .models import Category, TechnicalFile
-from .serializers import CategorySerializer, FileDetailSerializer
+from .serializers import (
+    CategorySerializer, FileDetailSerializer, FileListFilterSerializer, FileSearchQuerySerializer,
+    FileListProjection, TopFilesQuerySerializer, TopFileProjection
+)
+from . import bestsellers, search
+from .cache import CachedCatalogMixin
+from accounts.wallet_cache import get_wallet_status
 
-class CategoryList(generics.ListAPIView):
+class CategoryList(CachedCatalogMixin, generics.ListAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    ordering = ('name',)
 
-class FileList(generics.ListAPIView):
-    queryset = TechnicalFile.objects.filter(is_available=True)
-    serializer_class = FileDetailSerializer
+class FileList(CachedCatalogMixin, generics.ListAPIView):
+    serializer_class = FileListProjection
+    # الأرخص أولاً، على الفهارس (is_available, category, price_coins, id)
+    ordering = ('price_coins', 'id')
+
+    def get_queryset(self):
+        filters = FileListFilterSerializer(data=self.request.query_params, context={'request': self.request})
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
 
-class FileDetail(generics.RetrieveAPIView):
-    queryset = TechnicalFile.objects.filter(is_available=True)
+        queryset = TechnicalFile.objects.filter(is_available=True)
+        if 'category' in params:
+            queryset = queryset.filter(category_id=params['category'])
+        if 'min_price' in params:
+            queryset = queryset.filter(price_coins__gte=params['min_price'])
+        if 'max_price' in params:
+            queryset = queryset.filter(price_coins__lte=params['max_price'])
+        if params.get('affordable'):
+            # الرصيد من حالة المحفظة المخزنة (بدون استعلام عند وجودها في الكاش)
+            status = get_wallet_status(self.request.user.customer_id)
+            queryset = queryset.filter(price_coins__lte=status['balance'] if status else 0)
+        return FileListProjection.project(queryset)
+
+class FileDetail(CachedCatalogMixin, generics.RetrieveAPIView):
+    queryset = TechnicalFile.objects.filter(is_available=True).select_related('category')
     serializer_class = FileDetailSerializer
     lookup_field = 'id'
+
+class FileSearch(CachedCatalogMixin, generics.ListAPIView):
+    serializer_class = FileListProjection
+    pagination_class = UncountedPageNumberPagination
+
+    def get_queryset(self):
+        params = FileSearchQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        queryset = TechnicalFile.objects.filter(is_available=True)
+        return FileListProjection.project(search.search(queryset, params.validated_data['q']))
+
+class TopFiles(generics.ListAPIView):
+    serializer_class = TopFileProjection
+    pagination_class = None
+
+    def get_queryset(self):
+        params = TopFilesQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        ranking = bestsellers.top_ids(params.validated_data.get('category'), params.validated_data['limit'])
+        # الترتيب من Redis، والبيانات بـ pk IN (...) واحد؛ العدد من الترتيب نفسه
+        rows = {
+            row['id']: row
+            for row in TopFileProjection.project(
+                TechnicalFile.objects.filter(pk__in=[file_id for file_id, _ in ranking], is_available=True)
+            )
+        }
+        return [
+            {**rows[file_id], 'purchase_count': count}
+            for file_id, count in ranking if file_id in rows
+        ]
@@ -0,0 +1,57 @@
+# في sales/async_views.py
+"""
+نسخ async من views المعتمدة على الشبكة، تُستخدم في وضع ASGI (ASGI_MODE=True، راجع sales/urls.py).
+انتظار الـ Worker لا يحجز عامل gunicorn: نفس العامل يخدم طلبات أخرى في الأثناء.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework import status
+
+from config.async_api import api_view, json_response
+from .models import Purchase
+from . import download_quota
+from .utils.async_worker_client import AsyncCloudflareWorkerClient
+
+
+@api_view(['POST'])
+async def create_download(request, purchase_id):
+    """إنشاء رابط تحميل عند الضغط على زر التحميل"""
+    customer_id = request.user.customer_id
+
+    # حجز تحميل ذرياً (UPDATE مشروط واحد) قبل الاتصال بالـ Worker
+    reservation = await sync_to_async(download_quota.reserve)(purchase_id, customer_id)
+    if reservation is None:
+        if not await Purchase.objects.filter(id=purchase_id, customer_id=customer_id).aexists():
+            return json_response({"error": "الشراء غير موجود"}, status=status.HTTP_404_NOT_FOUND)
+        return json_response({
+            "error": "تم استنفاذ التحميلات",
+            "remaining": 0
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # إنشاء رابط محمي. الحجز يُعاد إذا لم يُنشأ الرابط لأي سبب، بما في ذلك استثناء غير متوقع
+    # أو إلغاء الطلب (انقطاع العميل) أثناء انتظار الـ Worker
+    download_url = {}
+    try:
+        download_url = await AsyncCloudflareWorkerClient().create_protected_link(
+            file_url=reservation.file_url,
+            metadata={
+                'purchase_id': purchase_id,
+                'customer_id': customer_id,
+                'file_id': reservation.file_id
+            }
+        )
+    finally:
+        if not download_url.get('success'):
+            await sync_to_async(download_quota.release)(reservation)
+
+    if not download_url.get('success'):
+        return json_response(
+            {"error": download_url.get('error', 'فشل إنشاء الرابط')},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    return json_response({
+        "success": True,
+        "download_url": download_url.get('download_url'),
+        "expires_in": "ساعتين",
+        "remaining_downloads": download_quota.remaining(reservation)
+    })
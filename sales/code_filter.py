@@ -0,0 +1,170 @@
+"""
+فلتر Bloom لأكواد الشحن غير المستخدمة.
+
+- النسخة المرجعية في Redis (bitmap + hash للبيانات الوصفية)، وكل عملية تحتفظ بنسخة محلية
+  تُحدَّث عند تغيّر رقم الإصدار (يُفحص مرة كل CHARGE_CODE_FILTER_REFRESH_SECONDS).
+- النسخة المحلية قد تتأخر عن أكواد أضافتها عملية أخرى، لذلك عدم الوجود محلياً يُؤكَّد
+  بقراءة رقم الإصدار وحده (HGET) وإعادة التحميل فقط إذا تغيّر. التأكيد مرة واحدة على الأكثر
+  كل CHARGE_CODE_FILTER_RECHECK_SECONDS لكل عملية، فسيل من الأكواد المخمَّنة لا يكلّف
+  طلباً إلى Redis لكل كود ولا يتزاحم على القفل.
+- الكود غير الموجود في الفلتر لا يصل إلى قاعدة البيانات إطلاقاً.
+- الأكواد الجديدة تُضاف عند التوليد (SETBIT). الأكواد المستخدمة لا يمكن حذفها من Bloom،
+  فتُزال عند إعادة البناء الدورية من الفهرس الجزئي (rebuild_charge_code_filter).
+- أثناء إعادة البناء تُسجَّل الأكواد المضافة في مجموعة انتظار وتُطبَّق على الفلتر الجديد
+  بعد استبداله، فلا تضيع الأكواد المُنشأة بين مسح قاعدة البيانات والاستبدال.
+- بدون Redis أو قبل بناء الفلتر: الفحص يمر دائماً (fail open) ويبقى فحص حرف التحقق فقط.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from redis.exceptions import WatchError
+
+from config.bloom import BloomFilter
+from config.redis_utils import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+BITS_KEY = 'charge_codes:bloom'
+META_KEY = 'charge_codes:bloom:meta'
+PENDING_KEY = 'charge_codes:bloom:pending'
+
+_local = {'filter': None, 'version': None, 'checked_at': 0.0, 'rechecked_at': 0.0}
+_lock = threading.Lock()
+
+
+def _refresh_local(client, force=False):
+    """تحميل النسخة المحلية من Redis إذا تغيّر الإصدار (force: بدون انتظار فترة الفحص)."""
+    now = time.monotonic()
+    if not force and now - _local['checked_at'] < settings.CHARGE_CODE_FILTER_REFRESH_SECONDS:
+        return _local['filter']
+
+    with _lock:
+        if not force and now - _local['checked_at'] < settings.CHARGE_CODE_FILTER_REFRESH_SECONDS:
+            return _local['filter']
+        meta = client.hgetall(redis_key(META_KEY))
+        version = meta.get(b'version')
+        if version is None:
+            _local['filter'] = None
+        elif version != _local['version']:
+            bits = client.get(redis_key(BITS_KEY)) or b''
+            bloom = BloomFilter(int(meta[b'size']), int(meta[b'hashes']))
+            bloom.bits[:len(bits)] = bits
+            _local['filter'] = bloom
+        _local['version'] = version
+        _local['checked_at'] = now
+        return _local['filter']
+
+
+def might_exist(code):
+    """False تعني أن الكود غير موجود بالتأكيد ضمن الأكواد غير المستخدمة."""
+    client = get_redis()
+    if client is None:
+        return True
+    try:
+        bloom = _refresh_local(client)
+        if bloom is not None and code not in bloom:
+            bloom = _recheck_local(client)
+    except Exception:
+        logger.warning("charge code filter unavailable, falling back to database", exc_info=True)
+        return True
+    return bloom is None or code in bloom
+
+
+def _recheck_local(client):
+    """تأكيد الرفض مقابل الإصدار الحالي في Redis (أكواد أضافتها عمليات أخرى)."""
+    now = time.monotonic()
+    if now - _local['rechecked_at'] < settings.CHARGE_CODE_FILTER_RECHECK_SECONDS:
+        return _local['filter']
+    _local['rechecked_at'] = now
+    if client.hget(redis_key(META_KEY), 'version') == _local['version']:
+        return _local['filter']
+    return _refresh_local(client, force=True)
+
+
+def add_codes(codes):
+    """إضافة أكواد جديدة إلى الفلتر في Redis (والنسخة المحلية) بعد إدراجها."""
+    client = get_redis()
+    if client is None or not codes:
+        return
+    with client.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                # WATCH: إذا استُبدل الفلتر (إعادة بناء) بين القراءة والكتابة نعيد المحاولة بالحجم الجديد
+                pipe.watch(redis_key(META_KEY))
+                meta = pipe.hgetall(redis_key(META_KEY))
+                if b'version' not in meta and b'rebuilding' not in meta:
+                    return
+                pipe.multi()
+                if b'rebuilding' in meta:
+                    pipe.sadd(redis_key(PENDING_KEY), *codes)
+                if b'version' in meta:
+                    bloom = BloomFilter(int(meta[b'size']), int(meta[b'hashes']))
+                    for code in codes:
+                        for position in bloom.positions(code):
+                            pipe.setbit(redis_key(BITS_KEY), position, 1)
+                    pipe.hincrby(redis_key(META_KEY), 'count', len(codes))
+                    pipe.hincrby(redis_key(META_KEY), 'version', 1)
+                results = pipe.execute()
+                break
+            except WatchError:
+                continue
+    if b'version' not in meta:
+        return
+
+    with _lock:
+        local = _local['filter']
+        if local is not None and local.size == bloom.size:
+            for code in codes:
+                local.add(code)
+            # النسخة المحلية كانت على الإصدار السابق مباشرة (WATCH): هي الآن مطابقة للجديد
+            if _local['version'] == meta[b'version']:
+                _local['version'] = str(results[-1]).encode()
+
+    if int(meta.get(b'count', 0)) + len(codes) > int(meta.get(b'capacity', 0)):
+        logger.warning("charge code filter is over capacity; run rebuild_charge_code_filter")
+
+
+def rebuild(codes, capacity, error_rate=None):
+    """
+    بناء الفلتر من الصفر واستبدال النسخة في Redis ذرياً.
+    codes: مُكرِّر على الأكواد غير المستخدمة (من الفهرس الجزئي).
+    يجب استدعاء الدالة قبل بدء المسح (المُكرِّر كسول) حتى تُسجَّل الأكواد المضافة أثناءه.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+
+    # من هنا تُسجِّل add_codes الأكواد الجديدة في مجموعة الانتظار
+    pipe = client.pipeline(transaction=True)
+    pipe.delete(redis_key(PENDING_KEY))
+    pipe.hset(redis_key(META_KEY), 'rebuilding', 1)
+    pipe.execute()
+
+    bloom = BloomFilter.for_capacity(capacity, error_rate or settings.CHARGE_CODE_FILTER_ERROR_RATE)
+    count = 0
+    for code in codes:
+        bloom.add(code)
+        count += 1
+
+    tmp_key = redis_key(BITS_KEY + ':tmp')
+    client.set(tmp_key, bytes(bloom.bits))
+    pipe = client.pipeline(transaction=True)
+    pipe.rename(tmp_key, redis_key(BITS_KEY))
+    pipe.hset(redis_key(META_KEY), mapping={
+        'size': bloom.size,
+        'hashes': bloom.hashes,
+        'capacity': capacity,
+        'count': count,
+    })
+    pipe.hdel(redis_key(META_KEY), 'rebuilding')
+    pipe.hincrby(redis_key(META_KEY), 'version', 1)
+    pipe.smembers(redis_key(PENDING_KEY))
+    pipe.delete(redis_key(PENDING_KEY))
+    pending = pipe.execute()[-2]
+
+    # الأكواد المُنشأة بعد بدء المسح: بعد الاستبدال تكتب add_codes على الفلتر الجديد مباشرة
+    if pending:
+        add_codes([code.decode() for code in pending])
+    return count
@@ -0,0 +1,75 @@
+# في sales/download_quota.py
+"""
+حجز حصة التحميل ذرياً قبل طلب رابط من الـ Worker.
+
+الحجز UPDATE مشروط واحد على صف الشراء:
+    downloads_count = downloads_count + 1, last_download_at = now
+    WHERE id = X AND customer_id = Y AND downloads_count < max_downloads
+    RETURNING downloads_count, max_downloads, file_id, (رابط الملف)
+فالنقرات المتزامنة لا تتجاوز max_downloads ولا تضيع زيادة.
+إذا فشل إنشاء الرابط تُعاد الحصة بـ UPDATE ذري معاكس (release)؛
+last_download_at يبقى وقت آخر محاولة.
+"""
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from products.models import TechnicalFile
+
+from .models import Purchase
+
+Reservation = namedtuple('Reservation', 'purchase_id file_id file_url downloads_count max_downloads')
+
+
+def reserve(purchase_id, customer_id):
+    """يُرجع Reservation، أو None إذا لم يوجد الشراء أو استُنفدت التحميلات."""
+    now = timezone.now()
+
+    # UPDATE ... RETURNING مدعوم في PostgreSQL و SQLite >= 3.35
+    if connection.features.can_return_columns_from_insert:
+        qn = connection.ops.quote_name
+        opts = Purchase._meta
+        files = TechnicalFile._meta
+        count = qn(opts.get_field('downloads_count').column)
+        limit = qn(opts.get_field('max_downloads').column)
+
+        sql = (
+            f"UPDATE {qn(opts.db_table)} SET "
+            f"{count} = {count} + 1, "
+            f"{qn(opts.get_field('last_download_at').column)} = %s "
+            f"WHERE {qn(opts.pk.column)} = %s AND {qn(opts.get_field('customer').column)} = %s "
+            f"AND {count} < {limit} "
+            f"RETURNING {count}, {limit}, {qn(opts.get_field('file').column)}, ("
+            f"SELECT {qn(files.get_field('file_url').column)} FROM {qn(files.db_table)} "
+            f"WHERE {qn(files.pk.column)} = {qn(opts.get_field('file').column)})"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [connection.ops.adapt_datetimefield_value(now), purchase_id, customer_id])
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return Reservation(purchase_id, row[2], row[3], row[0], row[1])
+
+    # قواعد بيانات بدون RETURNING: نفس الـ UPDATE المشروط بتعبيرات F() ثم قراءة الصف
+    updated = Purchase.objects.filter(
+        pk=purchase_id, customer_id=customer_id, downloads_count__lt=F('max_downloads')
+    ).update(downloads_count=F('downloads_count') + 1, last_download_at=now)
+    if not updated:
+        return None
+    row = Purchase.objects.filter(pk=purchase_id).values_list(
+        'file_id', 'file__file_url', 'downloads_count', 'max_downloads'
+    ).get()
+    return Reservation(purchase_id, *row)
+
+
+def release(reservation):
+    """إعادة الحصة المحجوزة عند فشل إنشاء الرابط."""
+    Purchase.objects.filter(pk=reservation.purchase_id, downloads_count__gt=0).update(
+        downloads_count=F('downloads_count') - 1
+    )
+
+
+def remaining(reservation):
+    return max(0, reservation.max_downloads - reservation.downloads_count)
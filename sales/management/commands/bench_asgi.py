@@ -0,0 +1,211 @@
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.account_pool import create_account
+from notifications.models import Notification
+from products.models import Category, TechnicalFile
+from sales.models import Purchase
+from sales.utils.worker_stub import WorkerStub
+
+SECRET = 'bench-secret'
+MEMORY_BUDGET_MB = 512  # خطة Render الحالية
+
+# الـ URLconf الرئيسي لا يضم مسارات التطبيقات بعد، فالقياس يركّبها في إعدادات مؤقتة
+BENCH_URLS = """
+from django.urls import include, path
+from config.urls import urlpatterns as base
+
+urlpatterns = base + [
+    path('api/sales/', include('sales.urls')),
+    path('api/notifications/', include('notifications.urls')),
+]
+"""
+BENCH_SETTINGS = """
+from config.settings import *  # noqa
+ROOT_URLCONF = 'bench_urls'
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "قياس الإنتاجية مع طلبات متزامنة: gunicorn بعمال sync (config.wsgi) مقابل عمال uvicorn "
+        "(config.asgi، ASGI_MODE=True) بنفس عدد العمال، على create_download (Worker بديل بطيء) "
+        "وقائمة الإشعارات، مع ذاكرة العمليات مقارنة بـ 512MB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help="عدد الطلبات لكل مسار")
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--latency', type=float, default=0.25, help="تأخير الـ Worker البديل بالثواني")
+        parser.add_argument('--port', type=int, default=8765, help="sync على المنفذ، و ASGI على التالي")
+
+    def handle(self, *args, **options):
+        tokens, purchase_ids = self.create_data(options['concurrency'])
+        try:
+            with WorkerStub(secret=SECRET, latency=options['latency']) as stub, \
+                    tempfile.TemporaryDirectory() as tmp:
+                Path(tmp, 'bench_urls.py').write_text(BENCH_URLS)
+                Path(tmp, 'bench_settings.py').write_text(BENCH_SETTINGS)
+                for port, mode in enumerate(('sync', 'asgi'), options['port']):
+                    with self.server(mode, port, stub.url, tmp, options) as (base_url, process):
+                        self.stdout.write(f"--- {mode} ({options['workers']} workers)")
+                        self.run(base_url, 'download', tokens, purchase_ids, options)
+                        self.run(base_url, 'notifications', tokens, purchase_ids, options)
+                        rss = self.rss_mb(process.pid)
+                        self.stdout.write(
+                            f"  memory: {rss:.0f}MB RSS ({rss / MEMORY_BUDGET_MB:.0%} of {MEMORY_BUDGET_MB}MB)"
+                        )
+        finally:
+            self.delete_data(purchase_ids)
+
+    # ===== البيانات =====
+    def create_data(self, count):
+        category = Category.objects.create(name=f"bench-{time.time_ns()}")
+        file = TechnicalFile.objects.create(
+            category=category, title='bench', description='bench', price_coins=0,
+            file_url='https://files.example.com/bench.zip',
+        )
+        tokens, purchase_ids = [], []
+        for _ in range(count):
+            customer = create_account()
+            # الحسابات الجديدة غير مفعلة، و JWT يرفض المستخدم غير المفعل
+            User.objects.filter(pk=customer.user_id).update(is_active=True)
+            purchase = Purchase.objects.create(
+                customer=customer, file=file, paid_price=0, max_downloads=1_000_000
+            )
+            Notification.objects.bulk_create(
+                Notification(customer=customer, title=f"إشعار {i}", message='bench') for i in range(30)
+            )
+            tokens.append(str(AccessToken.for_user(customer.user)))
+            purchase_ids.append(purchase.id)
+        return tokens, purchase_ids
+
+    def delete_data(self, purchase_ids):
+        purchases = Purchase.objects.filter(id__in=purchase_ids).select_related('customer__user', 'file__category')
+        categories = {p.file.category for p in purchases}
+        for purchase in purchases:
+            purchase.customer.user.delete()
+        for category in categories:
+            category.delete()
+
+    # ===== الخادم =====
+    def server(self, mode, port, worker_url, tmp, options):
+        command = self
+
+        class Server:
+            def __enter__(self):
+                env = dict(
+                    os.environ,
+                    PYTHONPATH=os.pathsep.join([tmp, str(settings.BASE_DIR)]),
+                    DJANGO_SETTINGS_MODULE='bench_settings',
+                    ASGI_MODE='True' if mode == 'asgi' else 'False',
+                    CLOUDFLARE_WORKER_ENABLED='True',
+                    CLOUDFLARE_WORKER_URL=worker_url,
+                    CLOUDFLARE_WORKER_SECRET=SECRET,
+                )
+                app = 'config.asgi:application' if mode == 'asgi' else 'config.wsgi:application'
+                worker_class = ['-k', 'uvicorn.workers.UvicornWorker'] if mode == 'asgi' else []
+                self.process = subprocess.Popen(
+                    [sys.executable, '-m', 'gunicorn', app, *worker_class,
+                     '--bind', f"127.0.0.1:{port}", '--workers', str(options['workers']),
+                     '--timeout', '120'],
+                    env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                )
+                base_url = f"http://127.0.0.1:{port}"
+                command.wait_ready(base_url, self.process)
+                return base_url, self.process
+
+            def __exit__(self, *exc):
+                self.process.send_signal(signal.SIGTERM)
+                try:
+                    self.process.wait(10)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+
+        return Server()
+
+    def wait_ready(self, base_url, process):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(process.stderr.read().decode(errors='replace')[-2000:])
+            try:
+                if httpx.get(f"{base_url}/health/", headers={'X-Forwarded-Proto': 'https'}).status_code == 200:
+                    # كل العمال جاهزون وليس الأول فقط
+                    time.sleep(1)
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        raise CommandError("gunicorn did not start")
+
+    @staticmethod
+    def rss_mb(pid):
+        """مجموع RSS للعملية الرئيسية وعمالها من /proc."""
+        pids = [pid]
+        children = Path(f"/proc/{pid}/task/{pid}/children")
+        if children.exists():
+            pids += [int(child) for child in children.read_text().split()]
+        total = 0
+        for p in pids:
+            for line in Path(f"/proc/{p}/status").read_text().splitlines():
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1])
+        return total / 1024
+
+    # ===== القياس =====
+    def run(self, base_url, endpoint, tokens, purchase_ids, options):
+        latencies, statuses, elapsed = asyncio.run(
+            self.fire(base_url, endpoint, tokens, purchase_ids, options['requests'], options['concurrency'])
+        )
+        errors = Counter(code for code in statuses if code != 200)
+        latencies.sort()
+        self.stdout.write(
+            f"  {endpoint:<14} {len(statuses) / elapsed:8.1f} req/s   "
+            f"p50 {statistics.median(latencies) * 1000:7.1f}ms   "
+            f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:7.1f}ms   "
+            f"errors {sum(errors.values())}" + (f" {dict(errors)}" if errors else '')
+        )
+
+    @staticmethod
+    async def fire(base_url, endpoint, tokens, purchase_ids, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], []
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+            async def one(i):
+                n = i % len(tokens)
+                headers = {'Authorization': f"Bearer {tokens[n]}", 'X-Forwarded-Proto': 'https'}
+                async with semaphore:
+                    started = time.monotonic()
+                    try:
+                        if endpoint == 'download':
+                            response = await client.post(
+                                f"/api/sales/purchases/{purchase_ids[n]}/download/", headers=headers
+                            )
+                        else:
+                            response = await client.get('/api/notifications/list/', headers=headers)
+                        statuses.append(response.status_code)
+                    except httpx.TransportError as e:
+                        statuses.append(type(e).__name__)
+                    latencies.append(time.monotonic() - started)
+
+            started = time.monotonic()
+            await asyncio.gather(*(one(i) for i in range(total)))
+            return latencies, statuses, time.monotonic() - started
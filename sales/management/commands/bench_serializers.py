@@ -0,0 +1,76 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import Customer
+from config.renderers import ORJSONRenderer
+from products.models import Category, TechnicalFile
+from products.serializers import FileDetailSerializer, FileListProjection
+from sales.models import Purchase
+from sales.serializers import PurchaseDetailSerializer, PurchaseProjection
+
+
+class Command(BaseCommand):
+    help = (
+        "مقارنة الـ ModelSerializer + JSONRenderer بالـ projections + orjson لقوائم الملفات والمشتريات "
+        "(صفوف/ثانية شاملة الاستعلام والتحويل والـ JSON). البيانات تُلغى في النهاية (rollback)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='20,500,5000')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        with transaction.atomic():
+            customer = self.populate(max(sizes))
+            files = TechnicalFile.objects.filter(category__name='bench_serializers').order_by('price_coins', 'id')
+            purchases = Purchase.objects.filter(customer=customer).order_by('-timestamp', '-id')
+
+            for size in sizes:
+                self.report('files', size, options['repeat'],
+                            lambda: JSONRenderer().render(FileDetailSerializer(files[:size], many=True).data),
+                            lambda: ORJSONRenderer().render(
+                                FileListProjection(FileListProjection.project(files)[:size], many=True).data))
+                self.report('purchases', size, options['repeat'],
+                            lambda: JSONRenderer().render(PurchaseDetailSerializer(purchases[:size], many=True).data),
+                            lambda: ORJSONRenderer().render(
+                                PurchaseProjection(PurchaseProjection.project(purchases)[:size], many=True).data))
+
+            transaction.set_rollback(True)
+
+    def populate(self, count):
+        category = Category.objects.create(name='bench_serializers')
+        files = TechnicalFile.objects.bulk_create([
+            TechnicalFile(
+                category=category, title=f'ملف تقني رقم {i}', description='وصف الملف ' * 20,
+                price_coins=i % 500, file_url=f'https://files.example.com/{i}',
+            )
+            for i in range(count)
+        ])
+        user = User.objects.create_user(username='bench_serializers_user')
+        customer = Customer.objects.create(user=user, is_active=True)
+        Purchase.objects.bulk_create([
+            Purchase(customer=customer, file=technical_file, paid_price=technical_file.price_coins)
+            for technical_file in files
+        ])
+        return customer
+
+    def measure(self, size, repeat, run):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - started)
+        return size / best
+
+    def report(self, label, size, repeat, current, fast):
+        current_rate = self.measure(size, repeat, current)
+        fast_rate = self.measure(size, repeat, fast)
+        self.stdout.write(
+            f"{label:<10} {size:>6} صف | serializer: {current_rate:>10,.0f} صف/ث | "
+            f"projection: {fast_rate:>10,.0f} صف/ث | x{fast_rate / current_rate:.1f}"
+        )
@@ -0,0 +1,90 @@
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from sales.utils import worker_client
+from sales.utils.worker_client import CircuitBreaker, CloudflareWorkerClient, worker_metrics
+from sales.utils.worker_stub import WorkerStub
+
+SECRET = 'bench-secret'
+
+
+class Command(BaseCommand):
+    help = (
+        "قياس عميل Cloudflare Worker على خادم محلي بديل (worker_stub): "
+        "طلب جديد لكل نقرة مقابل Session مشتركة، الروابط الموقّعة محلياً، "
+        "المحاولات مع أخطاء 5xx، وقاطع الدائرة مع Worker بطيء."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=500)
+        parser.add_argument('--latency', type=float, default=0.0, help="تأخير الخادم البديل بالثواني")
+        parser.add_argument('--fail-rate', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        calls = options['calls']
+        with WorkerStub(secret=SECRET, latency=options['latency']) as stub, self.worker(stub.url):
+            self.report('requests.post', calls, stub, lambda: self.bare_post(stub.url))
+            self.report('pooled', calls, stub, lambda: CloudflareWorkerClient().create_protected_link('https://files.example.com/x'))
+            with override_settings(CLOUDFLARE_WORKER_SIGNED_LINKS=True):
+                self.report('signed', calls, stub, self.signed_link)
+
+        with WorkerStub(secret=SECRET, fail_rate=options['fail_rate']) as stub, self.worker(stub.url):
+            self.report(f"5xx {options['fail_rate']:.0%}", calls, stub,
+                        lambda: CloudflareWorkerClient().create_protected_link('https://files.example.com/x'))
+
+        # Worker أبطأ من مهلة القراءة: المهلات مصغرة هنا حتى لا يطول القياس
+        with WorkerStub(secret=SECRET, latency=0.5) as stub, self.worker(
+            stub.url, CLOUDFLARE_WORKER_READ_TIMEOUT=0.1, CLOUDFLARE_WORKER_DEADLINE=0.25,
+        ):
+            self.report('slow worker', 50, stub,
+                        lambda: CloudflareWorkerClient().create_protected_link('https://files.example.com/x'))
+
+    def worker(self, url, **overrides):
+        # قاطع دائرة ومقاييس جديدة لكل سيناريو
+        worker_client.breaker = CircuitBreaker(5, 30)
+        worker_metrics.reset()
+        return override_settings(
+            CLOUDFLARE_WORKER_ENABLED=True, CLOUDFLARE_WORKER_URL=url, CLOUDFLARE_WORKER_SECRET=SECRET, **overrides
+        )
+
+    @staticmethod
+    def signed_link():
+        # التوقيع محلي بالكامل: هذا كل ما يحدث في create_download
+        return CloudflareWorkerClient().create_protected_link(
+            'https://files.example.com/x', {'purchase_id': 1, 'file_id': 1}
+        )
+
+    @staticmethod
+    def bare_post(url):
+        # السلوك السابق: requests.post بدون Session (اتصال جديد لكل طلب)
+        response = requests.post(
+            f"{url}/_api/store",
+            headers={"X-API-Secret": SECRET},
+            json={"token": "t", "file_url": "https://files.example.com/x", "metadata": {}},
+            timeout=5,
+        )
+        return {"success": response.status_code == 200}
+
+    def report(self, label, calls, stub, run):
+        connections = stub.connections
+        timings = []
+        succeeded = 0
+        started = time.perf_counter()
+        for _ in range(calls):
+            call_started = time.perf_counter()
+            succeeded += bool(run().get('success'))
+            timings.append((time.perf_counter() - call_started) * 1000)
+        total = time.perf_counter() - started
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{label:<14} | p50: {statistics.median(timings):7.2f}ms | p99: {p99:7.2f}ms | "
+            f"{calls / total:7.0f} طلب/ث | نجاح: {succeeded}/{calls} | اتصالات: {stub.connections - connections}"
+        )
+        if label not in ('requests.post', 'signed'):
+            self.stdout.write(f"{'':<14}   {worker_metrics.snapshot()}")
@@ -0,0 +1,97 @@
+import csv
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from sales import code_filter
+from sales.models import ChargeCode, SubscriptionPackage, generate_charge_codes
+
+
+class Command(BaseCommand):
+    help = (
+        "توليد أكواد شحن بكميات كبيرة: توليد على دفعات، إزالة التكرار في الذاكرة ومقابل الفهرس، "
+        "إدراج بـ COPY (PostgreSQL) أو bulk_create، وكتابة الأكواد الجديدة إلى CSV تدريجياً."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--package', type=int, required=True, help="رقم الباقة (SubscriptionPackage.id)")
+        parser.add_argument('--count', type=int, required=True, help="عدد الأكواد المطلوبة")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--output', help="ملف CSV للأكواد الجديدة ('-' للمخرج القياسي)")
+
+    def handle(self, *args, **options):
+        try:
+            package = SubscriptionPackage.objects.get(pk=options['package'])
+        except SubscriptionPackage.DoesNotExist:
+            raise CommandError(f"الباقة {options['package']} غير موجودة.")
+
+        count = options['count']
+        batch_size = options['batch_size']
+        if count <= 0 or batch_size <= 0:
+            raise CommandError("--count و --batch-size يجب أن يكونا أكبر من صفر.")
+
+        output = options['output'] or f"charge_codes_{package.pk}_{timezone.now():%Y%m%d_%H%M%S}.csv"
+        stream = sys.stdout if output == '-' else open(output, 'w', newline='')
+        writer = csv.writer(stream)
+        writer.writerow(['code', 'package', 'coin_value'])
+
+        use_copy = connection.vendor == 'postgresql'
+        minted = 0
+        started = time.perf_counter()
+        try:
+            while minted < count:
+                codes = self.mint_batch(package, min(batch_size, count - minted), use_copy)
+                # كتابة الدفعة فوراً ثم تحريرها من الذاكرة
+                writer.writerows((code, package.name, package.coin_value) for code in codes)
+                stream.flush()
+                minted += len(codes)
+
+                elapsed = time.perf_counter() - started
+                self.stderr.write(f"{minted}/{count} | {minted / elapsed:,.0f} كود/ثانية")
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f"✅ تم توليد {minted} كود في {elapsed:.2f} ثانية ({minted / elapsed:,.0f} كود/ثانية) -> {output}"
+        ))
+
+    def mint_batch(self, package, size, use_copy, attempts=5):
+        for _ in range(attempts):
+            # إزالة التكرار داخل الدفعة ثم مقابل الأكواد الموجودة (فهرس unique على code)
+            codes = set(generate_charge_codes(size))
+            codes -= set(ChargeCode.objects.filter(code__in=codes).values_list('code', flat=True))
+            codes = list(codes)
+            try:
+                with transaction.atomic():
+                    if use_copy:
+                        self.copy_insert(package, codes)
+                    else:
+                        ChargeCode.objects.bulk_create(
+                            [ChargeCode(code=code, package=package) for code in codes],
+                            batch_size=1000
+                        )
+                code_filter.add_codes(codes)
+                return codes
+            except IntegrityError:
+                # تعارض مع عملية توليد متزامنة: نعيد الدفعة بأكواد جديدة
+                continue
+        raise CommandError("فشل إدراج دفعة الأكواد بعد عدة محاولات.")
+
+    def copy_insert(self, package, codes):
+        now = timezone.now().isoformat()
+        buffer = io.StringIO()
+        for code in codes:
+            buffer.write(f"{code},{package.pk},f,{now}\n")
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f"COPY {ChargeCode._meta.db_table} (code, package_id, is_used, created_at) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
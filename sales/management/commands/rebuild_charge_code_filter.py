@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sales import code_filter
+from sales.models import ChargeCode
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء فلتر Bloom لأكواد الشحن غير المستخدمة في Redis (يزيل الأكواد المستخدمة)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--capacity', type=int, help="السعة (الافتراضي: ضعف عدد الأكواد الحالية)")
+        parser.add_argument('--error-rate', type=float)
+
+    def handle(self, *args, **options):
+        unused = ChargeCode.objects.filter(is_used=False)
+        capacity = options['capacity'] or max(unused.count() * 2, 100_000)
+        codes = unused.values_list('code', flat=True).iterator(chunk_size=10_000)
+
+        count = code_filter.rebuild(codes, capacity, options['error_rate'])
+        if count is None:
+            raise CommandError("الفلتر يتطلب Redis (CACHES['default'] من نوع django_redis).")
+        self.stdout.write(self.style.SUCCESS(f"✅ تم بناء الفلتر: {count} كود | السعة {capacity}"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.models import TechnicalFile
+from sales.utils.worker_client import CloudflareWorkerClient
+
+
+class Command(BaseCommand):
+    help = (
+        "نشر خريطة الملفات (المفتاح -> file_url) في KV الـ Worker للروابط الموقّعة. "
+        "يُشغَّل عند تفعيل CLOUDFLARE_WORKER_SIGNED_LINKS ولإصلاح أي نشر فاشل من الإشارات."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        client = CloudflareWorkerClient()
+        if not client.worker_url:
+            raise CommandError("CLOUDFLARE_WORKER_URL غير مضبوط.")
+
+        files = TechnicalFile.objects.order_by('id').values_list('id', 'file_url')
+        chunk, published = {}, 0
+        for file_id, file_url in files.iterator(chunk_size=options['chunk_size']):
+            chunk[file_id] = file_url
+            if len(chunk) >= options['chunk_size']:
+                client.publish_files(chunk)
+                published += len(chunk)
+                chunk = {}
+        if chunk:
+            client.publish_files(chunk)
+            published += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"✅ تم نشر {published} ملف في KV الـ Worker"))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 08:40
+
+from django.db import migrations, models
+import sales.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chargecode",
+            name="code",
+            field=models.CharField(
+                default=sales.models.generate_charge_code, max_length=13, unique=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chargecode",
+            index=models.Index(
+                condition=models.Q(("is_used", False)),
+                fields=["code"],
+                name="chargecode_unused_idx",
+            ),
+        ),
+    ]
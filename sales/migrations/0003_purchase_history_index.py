@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0002_charge_code_checksum"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="purchase",
+            index=models.Index(
+                fields=["customer", "-timestamp", "-id"],
+                name="purchase_customer_ts_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 09:01
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def remove_duplicate_purchases(apps, schema_editor):
+    # مشتريات مكررة من سباق الفحص القديم: يبقى أقدم شراء لكل (عميل، ملف)،
+    # وسعر كل نسخة محذوفة يُعاد إلى المحفظة بمعاملة في الدفتر (لا يختفي مال في migration)
+    Purchase = apps.get_model("sales", "Purchase")
+    Transaction = apps.get_model("accounts", "Transaction")
+    Wallet = apps.get_model("accounts", "Wallet")
+    duplicates = (
+        Purchase.objects.order_by()
+        .values("customer_id", "file_id")
+        .annotate(count=Count("id"), first_id=Min("id"))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        extra = Purchase.objects.filter(
+            customer_id=row["customer_id"], file_id=row["file_id"]
+        ).exclude(pk=row["first_id"])
+        for purchase in extra:
+            if purchase.paid_price > 0:
+                # رصيد مُعاد = إيداع في الدفتر (amount > 0) فيُضاف إلى total_deposited
+                # كما تحسبه reconcile_wallets
+                Transaction.objects.create(
+                    customer_id=purchase.customer_id,
+                    amount=purchase.paid_price,
+                    transaction_type="CHARGE",
+                    description=f"استرجاع شراء مكرر #{purchase.pk} للملف {purchase.file_id}",
+                )
+                Wallet.objects.filter(customer_id=purchase.customer_id).update(
+                    balance=F("balance") + purchase.paid_price,
+                    total_deposited=F("total_deposited") + purchase.paid_price,
+                )
+            purchase.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0003_purchase_history_index"),
+        ("accounts", "0003_ledger_partitions_and_snapshots"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_purchases, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="purchase",
+            constraint=models.UniqueConstraint(
+                fields=("customer", "file"), name="purchase_customer_file_uniq"
+            ),
+        ),
+    ]
@@ -1,14 +1,60 @@
 from django.db import models
-import random
+import os
 import string
 from accounts.models import Customer
 from products.models import TechnicalFile
 from django.utils import timezone
 
 # ============ أكواد الشحن ============
+CHARGE_CODE_ALPHABET = string.ascii_uppercase + string.digits
+CHARGE_CODE_BODY_LENGTH = 12
+# 12 حرف عشوائي + حرف تحقق (Luhn mod 36) يكشف أخطاء الحرف الواحد وتبديل حرفين متجاورين
+CHARGE_CODE_LENGTH = CHARGE_CODE_BODY_LENGTH + 1
+_CODE_INDEX = {ch: i for i, ch in enumerate(CHARGE_CODE_ALPHABET)}
+
+# جدول تحويل بايت -> حرف من الأبجدية (36 حرف): البايتات 0..251 تُقبل (252 = 7 * 36)
+# والبايتات 252..255 تُحذف حتى لا يكون هناك انحياز في التوزيع
+_CODE_TABLE = bytes(ord(CHARGE_CODE_ALPHABET[i % 36]) for i in range(252)) + bytes(4)
+_CODE_REJECT = bytes(range(252, 256))
+
+def charge_code_check_char(body):
+    """حرف التحقق (Luhn mod N) لجسم الكود."""
+    n = len(CHARGE_CODE_ALPHABET)
+    total = 0
+    factor = 2
+    for ch in reversed(body):
+        addend = factor * _CODE_INDEX[ch]
+        total += addend // n + addend % n
+        factor = 3 - factor
+    return CHARGE_CODE_ALPHABET[-total % n]
+
+def is_well_formed_charge_code(code):
+    """
+    فحص شكل الكود بدون قاعدة البيانات.
+    الأكواد القديمة (12 حرف بدون حرف تحقق) تُقبل شكلياً وتُفحص بالفلتر وقاعدة البيانات.
+    """
+    if not code or any(ch not in _CODE_INDEX for ch in code):
+        return False
+    if len(code) == CHARGE_CODE_BODY_LENGTH:
+        return True
+    return (
+        len(code) == CHARGE_CODE_LENGTH
+        and charge_code_check_char(code[:-1]) == code[-1]
+    )
+
+def generate_charge_codes(count):
+    """توليد count كود عشوائي آمن دفعة واحدة (التحويل يتم بـ bytes.translate بدل حلقة لكل حرف)."""
+    needed = count * CHARGE_CODE_BODY_LENGTH
+    chars = b''
+    while len(chars) < needed:
+        missing = needed - len(chars)
+        chars += os.urandom(missing + missing // 60 + 16).translate(_CODE_TABLE, _CODE_REJECT)
+    chars = chars[:needed].decode('ascii')
+    bodies = (chars[i:i + CHARGE_CODE_BODY_LENGTH] for i in range(0, needed, CHARGE_CODE_BODY_LENGTH))
+    return [body + charge_code_check_char(body) for body in bodies]
+
 def generate_charge_code():
-    chars = string.ascii_uppercase + string.digits
-    return ''.join(random.choices(chars, k=12))
+    return generate_charge_codes(1)[0]
 
 class SubscriptionPackage(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -19,13 +65,19 @@ class SubscriptionPackage(models.Model):
         return f"{self.name} ({self.coin_value} Coins)"
 
 class ChargeCode(models.Model):
-    code = models.CharField(max_length=12, unique=True, default=generate_charge_code)
+    code = models.CharField(max_length=CHARGE_CODE_LENGTH, unique=True, default=generate_charge_code)
     package = models.ForeignKey(SubscriptionPackage, on_delete=models.CASCADE)
     is_used = models.BooleanField(default=False)
     activated_by = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True)
     activation_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # فهرس جزئي للأكواد غير المستخدمة فقط (مصدر بناء فلتر Bloom)
+            models.Index(fields=['code'], condition=models.Q(is_used=False), name='chargecode_unused_idx'),
+        ]
+    
     def __str__(self):
         return f"Code: {self.code} - {self.package.name}"
 
@@ -40,6 +92,16 @@ class Purchase(models.Model):
     max_downloads = models.IntegerField(default=3)
     last_download_at = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # مشترياتي (الأحدث أولاً) بترقيم keyset على (timestamp, id)
+            models.Index(fields=['customer', '-timestamp', '-id'], name='purchase_customer_ts_id_idx'),
+        ]
+        constraints = [
+            # كل ملف يُشترى مرة واحدة لكل عميل (وفهرس مركب لفحص الملكية)
+            models.UniqueConstraint(fields=['customer', 'file'], name='purchase_customer_file_uniq'),
+        ]
+    
     def __str__(self):
         return f"Purchase #{self.id}"
     
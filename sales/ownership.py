@@ -0,0 +1,106 @@
+# في sales/ownership.py
+"""
+مجموعة الملفات المملوكة لكل عميل، لفحص "تم الشراء" وشارات الكتالوج بدون استعلامات.
+
+- Redis: set لكل عميل (owned_files:<customer_id>) فيه معرفات الملفات والعضو 0 كعلامة "محمّلة".
+  فحص صفحة كاملة = SMISMEMBER واحد؛ غياب العلامة يعني تحميل المجموعة من قاعدة البيانات مرة واحدة.
+- الشراء يضيف الملف بـ SADD بعد الـ commit (مجموعة بدون علامة تُعاد قراءتها كاملة عند أول فحص).
+- بدون Redis تُخزن المجموعة كـ frozenset في الكاش وتُحذف بعد كل شراء.
+- المجموعة للعرض والفحص المبكر فقط؛ القيد الفريد (customer, file) على Purchase هو الضمان.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from config.redis_utils import get_redis, redis_key
+
+from .models import Purchase
+
+logger = logging.getLogger(__name__)
+
+# معرفات الملفات تبدأ من 1، فالعضو 0 لا يتعارض معها
+LOADED = 0
+
+
+def owned_key(customer_id):
+    return f"owned_files:{customer_id}"
+
+
+def load_owned(customer_id):
+    return set(Purchase.objects.filter(customer_id=customer_id).values_list('file_id', flat=True))
+
+
+def owned_among(customer_id, file_ids):
+    """أي من file_ids يملكها العميل (set)."""
+    file_ids = list(file_ids)
+    if not file_ids:
+        return set()
+
+    client = get_redis()
+    if client is None:
+        owned = cache.get(owned_key(customer_id))
+        if owned is None:
+            owned = frozenset(load_owned(customer_id))
+            cache.set(owned_key(customer_id), owned, settings.OWNED_FILES_CACHE_TTL)
+        return owned.intersection(file_ids)
+
+    key = redis_key(owned_key(customer_id))
+    try:
+        loaded, *flags = client.smismember(key, [LOADED, *file_ids])
+        if loaded:
+            return {file_id for file_id, flag in zip(file_ids, flags) if flag}
+
+        owned = load_owned(customer_id)
+        pipe = client.pipeline(transaction=True)
+        pipe.sadd(key, LOADED, *owned)
+        pipe.expire(key, settings.OWNED_FILES_CACHE_TTL)
+        pipe.execute()
+        return owned.intersection(file_ids)
+    except Exception:
+        logger.warning("owned files set unavailable, falling back to database", exc_info=True)
+        return set(
+            Purchase.objects.filter(customer_id=customer_id, file_id__in=file_ids).values_list('file_id', flat=True)
+        )
+
+
+def owns(customer_id, file_id):
+    return bool(owned_among(customer_id, [file_id]))
+
+
+def record_purchase(customer_id, file_id):
+    """إضافة الملف إلى المجموعة بعد نجاح الـ transaction."""
+    record_purchases(customer_id, [file_id])
+
+
+def record_purchases(customer_id, file_ids):
+    file_ids = list(file_ids)
+    transaction.on_commit(lambda: _add(customer_id, file_ids))
+
+
+def _add(customer_id, file_ids):
+    client = get_redis()
+    if client is None:
+        cache.delete(owned_key(customer_id))
+        return
+    try:
+        key = redis_key(owned_key(customer_id))
+        pipe = client.pipeline(transaction=True)
+        pipe.sadd(key, *file_ids)
+        pipe.expire(key, settings.OWNED_FILES_CACHE_TTL)
+        pipe.execute()
+    except Exception:
+        logger.warning("failed to add files %s to owned set of customer %s", file_ids, customer_id, exc_info=True)
+        invalidate(customer_id)
+
+
+def invalidate(customer_id):
+    client = get_redis()
+    try:
+        if client is None:
+            cache.delete(owned_key(customer_id))
+        else:
+            client.delete(redis_key(owned_key(customer_id)))
+    except Exception:
+        logger.warning("failed to invalidate owned set of customer %s", customer_id, exc_info=True)
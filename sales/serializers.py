@@ -1,15 +1,13 @@
 
 from rest_framework import serializers
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from .models import Purchase, ChargeCode, SubscriptionPackage
-from accounts.models import Wallet, Transaction
+from accounts import wallet_ops
 from notifications.utils import create_notification
-import secrets
-import requests
-import time
-from django.conf import settings
-from django.utils import timezone
 from products.models import TechnicalFile
+from products import bestsellers
+from . import ownership
+from config.projections import ProjectionSerializer
 
 # ===== Serializers الحالية (أكواد الشحن) =====
 class PackageSerializer(serializers.ModelSerializer):
@@ -45,17 +43,11 @@ class PurchaseSerializer(serializers.Serializer):
         except TechnicalFile.DoesNotExist:
             raise serializers.ValidationError({"file_id": "الملف غير موجود أو غير متاح"})
             
-        wallet = customer.wallet 
-        if wallet.balance < file_obj.price_coins:
-            raise serializers.ValidationError({
-                "balance": f"الرصيد غير كافٍ. يتطلب {file_obj.price_coins} كوين"
-            })
-            
-        if Purchase.objects.filter(customer=customer, file=file_obj).exists():
+        # التحقق من الرصيد يتم ذرياً أثناء الخصم في save()، والتكرار يمنعه القيد الفريد
+        if ownership.owns(customer.id, file_obj.id):
             raise serializers.ValidationError({"file_id": "لقد اشتريت هذا الملف بالفعل"})
 
         self.file_obj = file_obj
-        self.wallet = wallet
         self.customer = customer
         
         return attrs
@@ -63,29 +55,36 @@ class PurchaseSerializer(serializers.Serializer):
     def save(self, **kwargs):
         purchase = None
         
-        with transaction.atomic():
-            self.wallet.balance -= self.file_obj.price_coins
-            self.wallet.total_spent += self.file_obj.price_coins
-            self.wallet.save()
-            
-            purchase = Purchase.objects.create(
-                customer=self.customer,
-                file=self.file_obj,
-                paid_price=self.file_obj.price_coins
-            )
-            
-            Transaction.objects.create(
-                customer=self.customer,
-                amount=-self.file_obj.price_coins,
-                transaction_type='PURCHASE',
-                description=f"شراء الملف: {self.file_obj.title}"
-            )
-            
-            create_notification(
-                self.customer, 
-                title="تم شراء ملف جديد",
-                message=f"تم شراء الملف '{self.file_obj.title}'"
-            )
+        try:
+            with transaction.atomic():
+                try:
+                    new_balance = wallet_ops.debit(
+                        self.customer,
+                        self.file_obj.price_coins,
+                        'PURCHASE',
+                        description=f"شراء الملف: {self.file_obj.title}"
+                    )
+                except wallet_ops.InsufficientBalance:
+                    raise serializers.ValidationError({
+                        "balance": f"الرصيد غير كافٍ. يتطلب {self.file_obj.price_coins} كوين"
+                    })
+                
+                purchase = Purchase.objects.create(
+                    customer=self.customer,
+                    file=self.file_obj,
+                    paid_price=self.file_obj.price_coins
+                )
+                bestsellers.record_purchase(self.file_obj)
+                ownership.record_purchase(self.customer.id, self.file_obj.id)
+                
+                create_notification(
+                    self.customer, 
+                    title="تم شراء ملف جديد",
+                    message=f"تم شراء الملف '{self.file_obj.title}'"
+                )
+        except IntegrityError:
+            # طلبان متزامنان لنفس الملف: القيد الفريد يرفض الثاني ويُلغى خصمه مع الـ transaction
+            raise serializers.ValidationError({"file_id": "لقد اشتريت هذا الملف بالفعل"})
         
         return {
             'success': True,
@@ -93,10 +92,94 @@ class PurchaseSerializer(serializers.Serializer):
             'purchased_at': purchase.timestamp,
             'file_title': self.file_obj.title,
             'file_price': self.file_obj.price_coins,
-            'new_balance': self.wallet.balance,
+            'new_balance': new_balance,
             'instructions': 'اذهب إلى مشترياتك لتحميل الملف'
         }
 
+# شراء عدة ملفات (سلة) في transaction واحد: خصم واحد للمجموع، bulk_create للمشتريات
+# والمعاملات، وإشعار ملخص واحد
+class BatchPurchaseSerializer(serializers.Serializer):
+    MAX_FILES = 50
+
+    file_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=MAX_FILES
+    )
+
+    def validate(self, attrs):
+        # بدون تكرار، بنفس ترتيب الطلب
+        file_ids = list(dict.fromkeys(attrs['file_ids']))
+        customer = self.context['request'].user.customer
+
+        # استعلام واحد للإتاحة
+        files = {
+            f.id: f for f in TechnicalFile.objects.filter(id__in=file_ids, is_available=True)
+            .only('id', 'title', 'price_coins', 'category_id')
+        }
+        missing = [file_id for file_id in file_ids if file_id not in files]
+        if missing:
+            raise serializers.ValidationError({"file_ids": f"ملفات غير موجودة أو غير متاحة: {missing}"})
+
+        # فحص واحد للملكية (SMISMEMBER أو استعلام واحد)
+        owned = ownership.owned_among(customer.id, file_ids)
+        if owned:
+            raise serializers.ValidationError(
+                {"file_ids": f"لقد اشتريت هذه الملفات بالفعل: {[f for f in file_ids if f in owned]}"}
+            )
+
+        self.files = [files[file_id] for file_id in file_ids]
+        self.customer = customer
+
+        return attrs
+
+    def save(self, **kwargs):
+        total = sum(f.price_coins for f in self.files)
+
+        try:
+            with transaction.atomic():
+                try:
+                    new_balance = wallet_ops.debit_many(
+                        self.customer,
+                        [(f.price_coins, f"شراء الملف: {f.title}") for f in self.files],
+                        'PURCHASE'
+                    )
+                except wallet_ops.InsufficientBalance:
+                    raise serializers.ValidationError({
+                        "balance": f"الرصيد غير كافٍ. يتطلب {total} كوين"
+                    })
+
+                purchases = Purchase.objects.bulk_create([
+                    Purchase(customer=self.customer, file=f, paid_price=f.price_coins)
+                    for f in self.files
+                ])
+                bestsellers.record_purchases(self.files)
+                ownership.record_purchases(self.customer.id, [f.id for f in self.files])
+
+                create_notification(
+                    self.customer,
+                    title="تم شراء ملفات جديدة",
+                    message=f"تم شراء {len(self.files)} ملفات: " + "، ".join(f"'{f.title}'" for f in self.files)
+                )
+        except IntegrityError:
+            # شراء متزامن لأحد الملفات: القيد الفريد يرفض الدفعة كاملة ويُلغى الخصم مع الـ transaction
+            raise serializers.ValidationError({"file_ids": "لقد اشتريت أحد هذه الملفات بالفعل"})
+
+        return {
+            'success': True,
+            'purchases': [
+                {
+                    'purchase_id': purchase.id,
+                    'file_id': purchase.file_id,
+                    'file_title': purchase.file.title,
+                    'file_price': purchase.paid_price,
+                }
+                for purchase in purchases
+            ],
+            'purchased_at': purchases[0].timestamp,
+            'total_price': total,
+            'new_balance': new_balance,
+            'instructions': 'اذهب إلى مشترياتك لتحميل الملفات'
+        }
+
 class PurchaseDetailSerializer(serializers.ModelSerializer):
     file_title = serializers.CharField(source='file.title')
     file_id = serializers.IntegerField(source='file.id')
@@ -109,10 +192,28 @@ class PurchaseDetailSerializer(serializers.ModelSerializer):
                  'timestamp', 'downloads_count', 'can_download', 'downloads_left')
     
     def get_can_download(self, obj):
-        return obj.downloads_count < 3
+        return obj.can_download()
     
     def get_downloads_left(self, obj):
-        return max(0, 3 - obj.downloads_count)
+        return obj.get_remaining_downloads()
+
+# نسخة سريعة لقائمة المشتريات: عنوان الملف بـ JOIN في نفس الاستعلام (بدون N+1)
+class PurchaseProjection(ProjectionSerializer):
+    fields = {
+        'id': 'id',
+        'file_title': 'file__title',
+        'file_id': 'file_id',
+        'paid_price': 'paid_price',
+        'timestamp': 'timestamp',
+        'downloads_count': 'downloads_count',
+    }
+    keys = ('id', 'max_downloads')
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        data['can_download'] = row['downloads_count'] < row['max_downloads']
+        data['downloads_left'] = max(0, row['max_downloads'] - row['downloads_count'])
+        return data
 
 class DownloadSerializer(serializers.Serializer):
     purchase_id = serializers.IntegerField()
@@ -126,7 +227,7 @@ class DownloadSerializer(serializers.Serializer):
         except Purchase.DoesNotExist:
             raise serializers.ValidationError({"purchase_id": "الشراء غير موجود"})
             
-        if purchase.downloads_count >= 3:
+        if not purchase.can_download():
             raise serializers.ValidationError({"downloads": "تم استنفاذ التحميلات"})
             
         self.purchase = purchase
@@ -0,0 +1,60 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from products.models import TechnicalFile
+
+from . import code_filter, ownership
+from .models import ChargeCode, Purchase
+from .utils.worker_client import CloudflareWorkerClient
+
+logger = logging.getLogger(__name__)
+
+
+# الأكواد المُنشأة فردياً (من لوحة الإدارة مثلاً) تُضاف إلى فلتر Bloom بعد الحفظ
+@receiver(post_save, sender=ChargeCode)
+def add_charge_code_to_filter(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: _add_to_filter(instance.code))
+
+
+def _add_to_filter(code):
+    # الكود محفوظ بالفعل؛ عطل Redis هنا لا يجب أن يحوّل الحفظ إلى خطأ 500
+    # (الكود يُرفض مؤقتاً حتى إعادة البناء التالية rebuild_charge_code_filter)
+    try:
+        code_filter.add_codes([code])
+    except Exception:
+        logger.warning("could not add charge code to the filter", exc_info=True)
+
+
+# حذف شراء (استرجاع من لوحة الإدارة أو حذف الملف) يُسقط مجموعة الملفات المملوكة للعميل
+@receiver(post_delete, sender=Purchase)
+def invalidate_owned_files(sender, instance, **kwargs):
+    customer_id = instance.customer_id
+    transaction.on_commit(lambda: ownership.invalidate(customer_id))
+
+
+# الروابط الموقّعة تحمل مفتاح الملف فقط: الـ Worker يقرأ رابط المصدر من KV (file:<id>)
+@receiver(post_save, sender=TechnicalFile)
+def publish_file_url(sender, instance, raw=False, **kwargs):
+    if not raw and settings.CLOUDFLARE_WORKER_SIGNED_LINKS:
+        files = {instance.pk: instance.file_url}
+        transaction.on_commit(lambda: _publish_files(files))
+
+
+@receiver(post_delete, sender=TechnicalFile)
+def unpublish_file_url(sender, instance, **kwargs):
+    if settings.CLOUDFLARE_WORKER_SIGNED_LINKS:
+        files = {instance.pk: None}
+        transaction.on_commit(lambda: _publish_files(files))
+
+
+def _publish_files(files):
+    # عطل الـ Worker لا يُفشل الحفظ؛ الأمر sync_worker_files يعيد نشر الخريطة كاملة
+    try:
+        CloudflareWorkerClient().publish_files(files)
+    except Exception:
+        logger.warning("could not publish file urls to the worker", exc_info=True)
@@ -1,3 +1,488 @@
-from django.test import TestCase
+# في sales/tests.py
+import asyncio
+import base64
+import json
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import requests
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework import serializers
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.account_pool import create_account
+from accounts.authentication import get_principal
+from accounts.models import Transaction, Wallet
+from products.models import Category, TechnicalFile
+from sales import async_views, download_quota
+from sales.models import Purchase
+from sales.serializers import BatchPurchaseSerializer
+from sales.utils import worker_client
+from sales.utils.async_worker_client import AsyncCloudflareWorkerClient
+from sales.utils.signed_links import InvalidSignedLink, _signature, signing_key, sign_download, verify_download
+from sales.utils.worker_client import CircuitBreaker, CloudflareWorkerClient
+from sales.utils.worker_stub import WorkerStub
+from sales.views import create_download, purchase_batch
+
+SECRET = 'test-secret'
+
+WORKER_SETTINGS = dict(
+    CLOUDFLARE_WORKER_ENABLED=True,
+    CLOUDFLARE_WORKER_SIGNED_LINKS=False,
+    CLOUDFLARE_WORKER_SECRET=SECRET,
+    CLOUDFLARE_WORKER_CONNECT_TIMEOUT=1.0,
+    CLOUDFLARE_WORKER_READ_TIMEOUT=2.0,
+    CLOUDFLARE_WORKER_DEADLINE=4.0,
+    CLOUDFLARE_WORKER_MAX_RETRIES=2,
+    CLOUDFLARE_WORKER_RETRY_BACKOFF=0.01,
+)
+
+
+@override_settings(**WORKER_SETTINGS)
+class WorkerStubTestCase(SimpleTestCase):
+    """كل اختبار على Worker بديل محلي وقاطع دائرة جديد (عتبة 2، راحة 0.2 ثانية)."""
+
+    def setUp(self):
+        self.stub = WorkerStub(secret=SECRET).start()
+        self.addCleanup(self.stub.stop)
+
+        settings_override = override_settings(CLOUDFLARE_WORKER_URL=self.stub.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        breaker_patch = mock.patch.object(worker_client, 'breaker', self.breaker)
+        breaker_patch.start()
+        self.addCleanup(breaker_patch.stop)
+
+    def create_link(self):
+        return CloudflareWorkerClient().create_protected_link('https://files.example.com/a.zip')
+
+
+class WorkerRetryTests(WorkerStubTestCase):
+
+    def test_retries_5xx_until_success(self):
+        self.stub.fail_next = 2
+        result = self.create_link()
+        self.assertTrue(result['success'])
+        self.assertEqual(self.stub.requests, 3)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_gives_up_after_max_retries(self):
+        self.stub.fail_next = 10
+        result = self.create_link()
+        self.assertFalse(result['success'])
+        self.assertEqual(self.stub.requests, 1 + WORKER_SETTINGS['CLOUDFLARE_WORKER_MAX_RETRIES'])
+
+    def test_4xx_is_not_retried(self):
+        self.stub.secret = 'other-secret'
+        result = self.create_link()
+        self.assertFalse(result['success'])
+        self.assertEqual(self.stub.requests, 1)
+        # الـ Worker رد (ولو بالرفض): ليس عطلاً يفتح الدائرة
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+@override_settings(CLOUDFLARE_WORKER_MAX_RETRIES=0)
+class WorkerCircuitBreakerTests(WorkerStubTestCase):
+
+    def open_circuit(self):
+        self.stub.fail_next = 2
+        self.assertFalse(self.create_link()['success'])
+        self.assertFalse(self.create_link()['success'])
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_open_circuit_rejects_without_request(self):
+        self.open_circuit()
+        result = self.create_link()
+        self.assertFalse(result['success'])
+        self.assertEqual(self.stub.requests, 2)
+
+    def test_half_open_allows_one_trial_and_closes_on_success(self):
+        self.open_circuit()
+        time.sleep(self.breaker.reset_timeout)
+
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        # طلب تجريبي واحد فقط أثناء نصف الفتح
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(self.create_link()['success'])
+        self.assertEqual(self.stub.requests, 2)
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.create_link()['success'])
+        self.assertEqual(self.stub.requests, 3)
+
+    def test_trial_request_closes_circuit(self):
+        self.open_circuit()
+        time.sleep(self.breaker.reset_timeout)
+        self.assertTrue(self.create_link()['success'])
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_failed_trial_reopens_circuit(self):
+        self.open_circuit()
+        time.sleep(self.breaker.reset_timeout)
+        self.stub.fail_next = 1
+        self.assertFalse(self.create_link()['success'])
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.create_link()['success'])
+        self.assertEqual(self.stub.requests, 3)
+
+
+@override_settings(CLOUDFLARE_WORKER_DEADLINE=0.3)
+class WorkerDeadlineTests(WorkerStubTestCase):
+    """Worker أبطأ من المهلة الكلية: الاستدعاء ينتهي قرب المهلة وليس بعد مهلة القراءة كاملة."""
+
+    def setUp(self):
+        super().setUp()
+        self.stub.latency = 1.0
+
+    def assertWithinDeadline(self, started, result):
+        elapsed = time.monotonic() - started
+        self.assertFalse(result['success'])
+        self.assertLess(elapsed, 0.8)
+
+    def test_sync_call_respects_deadline(self):
+        started = time.monotonic()
+        self.assertWithinDeadline(started, self.create_link())
+
+    def test_async_call_respects_deadline(self):
+        async def create_link():
+            return await AsyncCloudflareWorkerClient().create_protected_link('https://files.example.com/a.zip')
+
+        started = time.monotonic()
+        self.assertWithinDeadline(started, asyncio.run(create_link()))
+
+
+class SignedLinkTests(SimpleTestCase):
+
+    def sign(self, **kwargs):
+        return sign_download(7, 42, secret=SECRET, **kwargs)[0]
+
+    def resign(self, data):
+        """حمولة اختيارية بتوقيع صحيح (كما لو كان السر معروفاً)."""
+        payload = base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+        signature = base64.urlsafe_b64encode(_signature(signing_key(SECRET), payload)).rstrip(b'=').decode()
+        return f"{payload}.{signature}"
+
+    def test_round_trip(self):
+        token, expires_at = sign_download(7, 42, secret=SECRET)
+        link = verify_download(token, secret=SECRET)
+        self.assertEqual(link['purchase_id'], 7)
+        self.assertEqual(link['file_key'], '42')
+        self.assertEqual(link['expires_at'], expires_at)
+
+    def test_payload_does_not_contain_file_url(self):
+        payload = self.sign().split('.')[0]
+        data = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        self.assertEqual(set(data), {'p', 'f', 'e', 'n'})
+
+    def test_tampered_payload(self):
+        payload, signature = self.sign().split('.')
+        other_payload = sign_download(8, 42, secret=SECRET)[0].split('.')[0]
+        with self.assertRaises(InvalidSignedLink):
+            verify_download(f"{other_payload}.{signature}", secret=SECRET)
+
+    def test_tampered_signature(self):
+        payload, signature = self.sign().split('.')
+        flipped = ('A' if signature[0] != 'A' else 'B') + signature[1:]
+        with self.assertRaises(InvalidSignedLink):
+            verify_download(f"{payload}.{flipped}", secret=SECRET)
+
+    def test_wrong_secret(self):
+        with self.assertRaises(InvalidSignedLink):
+            verify_download(self.sign(), secret='other-secret')
+
+    def test_expired(self):
+        token = self.sign(ttl=60, now=1000)
+        self.assertEqual(verify_download(token, secret=SECRET, now=1059)['expires_at'], 1060)
+        with self.assertRaises(InvalidSignedLink):
+            verify_download(token, secret=SECRET, now=1061)
+
+    def test_malformed_base64(self):
+        payload = self.sign().split('.')[0]
+        for token in (f"{payload}.!!!", f"{payload}.a", '', '.', 'no-dot'):
+            with self.subTest(token=token), self.assertRaises(InvalidSignedLink):
+                verify_download(token, secret=SECRET)
+
+    def test_valid_signature_over_garbage_payload(self):
+        for data in (b'not json', b'[]', b'{"p": 1}', b'{"p": 1, "f": "1", "e": "soon", "n": "x"}', b'\xff'):
+            with self.subTest(data=data), self.assertRaises(InvalidSignedLink):
+                verify_download(self.resign(data), secret=SECRET)
+
+
+@override_settings(CLOUDFLARE_WORKER_SIGNED_LINKS=True)
+class SignedLinkStubTests(WorkerStubTestCase):
+    """الرابط الموقّع عبر الـ Worker البديل: رابط الملف من الخريطة المنشورة، ومرة واحدة فقط."""
+
+    def create_signed_link(self, file_id=42):
+        return CloudflareWorkerClient().create_protected_link(
+            'https://files.example.com/a.zip', {'purchase_id': 7, 'file_id': file_id}
+        )
+
+    def test_single_use(self):
+        CloudflareWorkerClient().publish_files({42: 'https://files.example.com/a.zip'})
+        link = self.create_signed_link()
+        self.assertTrue(link['success'])
+        self.assertEqual(self.stub.requests, 1)  # النشر فقط، التوقيع بدون طلب
+
+        first = requests.get(link['download_url'], allow_redirects=False)
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(first.headers['Location'], 'https://files.example.com/a.zip')
+        second = requests.get(link['download_url'], allow_redirects=False)
+        self.assertEqual(second.status_code, 410)
+
+    def test_unpublished_file_is_rejected(self):
+        CloudflareWorkerClient().publish_files({42: 'https://files.example.com/a.zip'})
+        CloudflareWorkerClient().publish_files({42: None})
+        response = requests.get(self.create_signed_link()['download_url'], allow_redirects=False)
+        self.assertEqual(response.status_code, 410)
+
+    def test_tampered_link_is_rejected(self):
+        CloudflareWorkerClient().publish_files({42: 'https://files.example.com/a.zip'})
+        url = self.create_signed_link()['download_url']
+        response = requests.get(url[:-2] + ('AA' if not url.endswith('AA') else 'BB'), allow_redirects=False)
+        self.assertEqual(response.status_code, 410)
+
+
+class BatchPurchaseTests(TestCase):
+    """شراء السلة: خصم واحد للمجموع، ولا حركة مالية عند أي رفض."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.customer = create_account()
+        Wallet.objects.filter(customer=self.customer).update(balance=100)
+        category = Category.objects.create(name='batch')
+        self.files = [
+            TechnicalFile.objects.create(
+                category=category, title=f"ملف {price}", description='-', price_coins=price,
+                file_url=f"https://files.example.com/{price}.zip",
+            )
+            for price in (10, 20, 30)
+        ]
+        self.ids = [f.id for f in self.files]
+
+    def purchase(self, file_ids):
+        request = APIRequestFactory(HTTP_HOST='localhost').post(
+            '/api/sales/purchases/batch/', {'file_ids': file_ids}, format='json'
+        )
+        force_authenticate(request, user=get_principal(self.customer.user_id))
+        return purchase_batch(request)
+
+    def balance(self):
+        return Wallet.objects.get(customer=self.customer).balance
+
+    def assertNothingMoved(self):
+        self.assertEqual(self.balance(), 100)
+        self.assertFalse(Transaction.objects.filter(customer=self.customer).exists())
+        self.assertFalse(Purchase.objects.filter(customer=self.customer).exists())
+
+    def test_single_debit_for_total(self):
+        response = self.purchase(self.ids)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_price'], 60)
+        self.assertEqual(response.data['new_balance'], 40)
+        self.assertEqual(self.balance(), 40)
+        self.assertEqual(Wallet.objects.get(customer=self.customer).total_spent, 60)
+        self.assertEqual(
+            sorted(Transaction.objects.filter(customer=self.customer).values_list('amount', flat=True)),
+            [-30, -20, -10],
+        )
+        self.assertEqual(
+            sorted(Purchase.objects.filter(customer=self.customer).values_list('file_id', 'paid_price')),
+            sorted((f.id, f.price_coins) for f in self.files),
+        )
+
+    def test_duplicate_ids_are_collapsed(self):
+        response = self.purchase([self.ids[1], self.ids[0], self.ids[1]])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([p['file_id'] for p in response.data['purchases']], [self.ids[1], self.ids[0]])
+        self.assertEqual(self.balance(), 70)
+        self.assertEqual(Purchase.objects.filter(customer=self.customer).count(), 2)
+
+    def test_missing_or_unavailable_file_is_rejected(self):
+        TechnicalFile.objects.filter(pk=self.ids[2]).update(is_available=False)
+        for file_ids in ([self.ids[0], 999999], [self.ids[0], self.ids[2]]):
+            with self.subTest(file_ids=file_ids):
+                response = self.purchase(file_ids)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('file_ids', response.data)
+        self.assertNothingMoved()
+
+    def test_owned_file_is_rejected(self):
+        Purchase.objects.create(customer=self.customer, file=self.files[0], paid_price=0)
+        response = self.purchase(self.ids)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file_ids', response.data)
+        self.assertEqual(self.balance(), 100)
+        self.assertFalse(Transaction.objects.filter(customer=self.customer).exists())
+        self.assertEqual(Purchase.objects.filter(customer=self.customer).count(), 1)
+
+    def test_insufficient_balance_rolls_back(self):
+        Wallet.objects.filter(customer=self.customer).update(balance=59)
+        response = self.purchase(self.ids)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('balance', response.data)
+        self.assertEqual(self.balance(), 59)
+        self.assertFalse(Transaction.objects.filter(customer=self.customer).exists())
+        self.assertFalse(Purchase.objects.filter(customer=self.customer).exists())
+
+    def test_concurrent_single_purchase_rolls_back_debit(self):
+        request = SimpleNamespace(user=SimpleNamespace(customer=self.customer))
+        serializer = BatchPurchaseSerializer(data={'file_ids': self.ids}, context={'request': request})
+        self.assertTrue(serializer.is_valid())
+        # شراء مفرد لأحد الملفات ثبت بعد فحص الملكية وقبل الحفظ
+        Purchase.objects.create(customer=self.customer, file=self.files[1], paid_price=0)
+
+        with self.assertRaises(serializers.ValidationError):
+            serializer.save()
+        self.assertEqual(self.balance(), 100)
+        self.assertFalse(Transaction.objects.filter(customer=self.customer).exists())
+        self.assertEqual(Purchase.objects.filter(customer=self.customer).count(), 1)
+
+
+class DownloadQuotaTests(WorkerStubTestCase, TestCase):
+    """حجز حصة التحميل: لا تتجاوز max_downloads، وتُعاد إذا لم يُنشأ الرابط."""
+
+    def setUp(self):
+        super().setUp()
+        self.customer = create_account()
+        category = Category.objects.create(name='downloads')
+        file = TechnicalFile.objects.create(
+            category=category, title='ملف', description='-', price_coins=0,
+            file_url='https://files.example.com/a.zip',
+        )
+        self.purchase = Purchase.objects.create(customer=self.customer, file=file, paid_price=0, max_downloads=2)
+
+    def downloads_count(self):
+        return Purchase.objects.values_list('downloads_count', flat=True).get(pk=self.purchase.pk)
+
+    def download(self, purchase_id=None, customer=None):
+        request = APIRequestFactory(HTTP_HOST='localhost').post('/api/sales/purchases/1/download/')
+        force_authenticate(request, user=get_principal((customer or self.customer).user_id))
+        return create_download(request, purchase_id or self.purchase.pk)
+
+    def async_download(self):
+        # الدالة الداخلية بدون طبقة المصادقة في config.async_api
+        request = SimpleNamespace(user=get_principal(self.customer.user_id))
+        return async_to_sync(async_views.create_download.__wrapped__)(request, self.purchase.pk)
+
+    def test_reserve_never_exceeds_max_downloads(self):
+        for returning in (True, False):
+            Purchase.objects.filter(pk=self.purchase.pk).update(downloads_count=0)
+            with self.subTest(returning=returning), \
+                    mock.patch.object(connection.features, 'can_return_columns_from_insert', returning):
+                first = download_quota.reserve(self.purchase.pk, self.customer.id)
+                second = download_quota.reserve(self.purchase.pk, self.customer.id)
+                self.assertIsNone(download_quota.reserve(self.purchase.pk, self.customer.id))
+                self.assertEqual((first.downloads_count, second.downloads_count), (1, 2))
+                self.assertEqual(second.file_url, 'https://files.example.com/a.zip')
+                self.assertEqual(second.file_id, self.purchase.file_id)
+                self.assertEqual(download_quota.remaining(second), 0)
+                self.assertEqual(self.downloads_count(), 2)
+
+    def test_foreign_or_missing_purchase_is_404(self):
+        self.assertEqual(self.download(purchase_id=999999).status_code, 404)
+        self.assertEqual(self.download(customer=create_account()).status_code, 404)
+        self.assertEqual(self.downloads_count(), 0)
+
+    def test_exhausted_quota_is_400(self):
+        Purchase.objects.filter(pk=self.purchase.pk).update(downloads_count=2)
+        response = self.download()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['remaining'], 0)
+
+    def test_successful_link_keeps_reservation(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['remaining_downloads'], 1)
+        self.assertEqual(self.downloads_count(), 1)
+
+    def test_failed_link_releases_reservation(self):
+        self.stub.fail_next = 10
+        self.assertEqual(self.download().status_code, 500)
+        self.assertEqual(self.downloads_count(), 0)
+
+        self.breaker.record_success()
+        self.stub.fail_next = 10
+        self.assertEqual(self.async_download().status_code, 500)
+        self.assertEqual(self.downloads_count(), 0)
+
+    def test_raising_worker_call_releases_reservation(self):
+        with mock.patch.object(CloudflareWorkerClient, 'create_protected_link', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.download()
+        self.assertEqual(self.downloads_count(), 0)
+
+        with mock.patch.object(AsyncCloudflareWorkerClient, 'create_protected_link', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.async_download()
+        self.assertEqual(self.downloads_count(), 0)
+
+
+class DuplicatePurchaseMigrationTests(TransactionTestCase):
+    """sales 0004: يبقى أقدم شراء لكل (عميل، ملف)، وسعر النسخ المحذوفة يُعاد إلى المحفظة بمعاملة."""
+
+    def migrate(self, sales_migration):
+        """كل التطبيقات على آخر migration، و sales على sales_migration."""
+        executor = MigrationExecutor(connection)
+        targets = [
+            (app, sales_migration if app == 'sales' else name) for app, name in executor.loader.graph.leaf_nodes()
+        ]
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        latest = dict(MigrationExecutor(connection).loader.graph.leaf_nodes())['sales']
+        self.addCleanup(self.migrate, latest)
+        apps = self.migrate('0003_purchase_history_index')
+        Customer = apps.get_model('accounts', 'Customer')
+        Wallet = apps.get_model('accounts', 'Wallet')
+        Category = apps.get_model('products', 'Category')
+        TechnicalFile = apps.get_model('products', 'TechnicalFile')
+        Purchase = apps.get_model('sales', 'Purchase')
+
+        self.customer = Customer.objects.create(serial='MIGRATION000001', pin='1234')
+        self.other = Customer.objects.create(serial='MIGRATION000002', pin='1234')
+        Wallet.objects.create(customer=self.customer, balance=10, total_deposited=100, total_spent=90)
+        Wallet.objects.create(customer=self.other, balance=5, total_deposited=5, total_spent=0)
+        category = Category.objects.create(name='migration')
+        file, other_file = (
+            TechnicalFile.objects.create(
+                category=category, title=title, description='-', price_coins=30, file_url='https://files.example.com/a.zip'
+            )
+            for title in ('a', 'b')
+        )
+        self.kept = Purchase.objects.create(customer=self.customer, file=file, paid_price=30)
+        Purchase.objects.create(customer=self.customer, file=file, paid_price=30)
+        Purchase.objects.create(customer=self.customer, file=file, paid_price=0)
+        Purchase.objects.create(customer=self.customer, file=other_file, paid_price=30)
+        Purchase.objects.create(customer=self.other, file=file, paid_price=30)
+
+        self.apps = self.migrate('0004_purchase_customer_file_unique')
+
+    def test_duplicates_are_removed_and_refunded(self):
+        Purchase = self.apps.get_model('sales', 'Purchase')
+        Wallet = self.apps.get_model('accounts', 'Wallet')
+        Transaction = self.apps.get_model('accounts', 'Transaction')
+
+        purchases = Purchase.objects.filter(customer_id=self.customer.pk)
+        self.assertEqual(purchases.count(), 2)
+        self.assertTrue(purchases.filter(pk=self.kept.pk).exists())
+
+        wallet = Wallet.objects.get(customer_id=self.customer.pk)
+        self.assertEqual((wallet.balance, wallet.total_deposited, wallet.total_spent), (40, 130, 90))
+        refunds = Transaction.objects.filter(customer_id=self.customer.pk)
+        self.assertEqual(list(refunds.values_list('amount', 'transaction_type')), [(30, 'CHARGE')])
+
+        other = Wallet.objects.get(customer_id=self.other.pk)
+        self.assertEqual(other.balance, 5)
+        self.assertFalse(Transaction.objects.filter(customer_id=self.other.pk).exists())
@@ -1,8 +1,15 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASGI_MODE:
+    from .async_views import create_download
+else:
+    create_download = views.create_download
+
 urlpatterns = [
     path('purchases/', views.purchase_file, name='purchase-file'),
-    path('purchases/<int:purchase_id>/download/', views.create_download, name='create-download'),
+    path('purchases/batch/', views.purchase_batch, name='purchase-batch'),
+    path('purchases/<int:purchase_id>/download/', create_download, name='create-download'),
     path('my-purchases/', views.my_purchases, name='my-purchases'),
 ]
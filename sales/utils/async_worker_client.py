@@ -0,0 +1,74 @@
+# في sales/utils/async_worker_client.py
+"""
+نسخة غير متزامنة من CloudflareWorkerClient لوضع ASGI (sales/async_views.py).
+
+- httpx.AsyncClient واحد لكل event loop مع pool اتصالات keep-alive بنفس الحجم والمهلات.
+- نفس المحاولات وقاطع الدائرة والمقاييس (الخطوات المشتركة في worker_client)،
+  لكن الانتظار (الشبكة والتأخير بين المحاولات) لا يحجز العامل.
+"""
+import asyncio
+import time
+import weakref
+
+import httpx
+from django.conf import settings
+
+from .worker_client import CloudflareWorkerClient, RetryableError
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        pool_size = settings.CLOUDFLARE_WORKER_POOL_SIZE
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(
+                settings.CLOUDFLARE_WORKER_READ_TIMEOUT, connect=settings.CLOUDFLARE_WORKER_CONNECT_TIMEOUT
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+class AsyncCloudflareWorkerClient(CloudflareWorkerClient):
+    async def create_protected_link(self, file_url, metadata=None):
+        """
+        إنشاء رابط محمي عبر Cloudflare Worker (بدون حجز العامل أثناء الانتظار)
+        """
+        early = self._without_request(file_url, metadata)
+        if early is not None:
+            return early
+
+        token, payload = self._new_payload(file_url, metadata)
+        started = time.monotonic()
+        retries = 0
+        while True:
+            try:
+                response = await self._astore(payload, self._attempt_timeouts(started))
+                break
+            except RetryableError as e:
+                error = str(e)
+            except httpx.HTTPError as e:
+                error = f"فشل الاتصال: {str(e)}"
+
+            delay = self._retry_delay(retries, started)
+            if delay is None:
+                return self._give_up(error, started, retries)
+            await asyncio.sleep(delay)
+            retries += 1
+
+        return self._finish(token, response.status_code, response.json, started, retries)
+
+    async def _astore(self, payload, timeouts):
+        connect, read = timeouts
+        response = await get_async_client().post(
+            f"{self.worker_url}/_api/store",
+            headers={"X-API-Secret": self.api_secret},
+            json=payload,
+            timeout=httpx.Timeout(read, connect=connect),
+        )
+        self._check_status(response.status_code)
+        return response
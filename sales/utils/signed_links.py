@@ -0,0 +1,88 @@
+# في sales/utils/signed_links.py
+"""
+روابط تحميل موقّعة (HMAC) تُنشأ محلياً وتُتحقق منها في Cloudflare Worker بدون KV.
+
+التوكن: base64url(JSON مضغوط) + "." + base64url(أول 16 بايت من HMAC-SHA256)
+- الحمولة: p = رقم الشراء، f = مفتاح الملف، e = وقت الانتهاء (epoch بالثواني)، n = nonce عشوائي.
+  الحمولة مقروءة لحامل الرابط، لذلك لا تحمل رابط المصدر: الـ Worker يحوّل مفتاح الملف إلى
+  الرابط من KV (file:<key>، تنشره publish_files في worker_client) بعد التحقق فقط.
+- مفتاح التوقيع مشتق من CLOUDFLARE_WORKER_SECRET (= API_SECRET في الـ Worker) بسياق ثابت،
+  فلا يُستخدم السر نفسه مباشرة للتوقيع.
+- الـ Worker (cloudflare_utils/worker.js، المسار /s/<token>) يتحقق من التوقيع والانتهاء أولاً،
+  ثم يكتب علامة الاستخدام الوحيد used:<nonce> في KV فقط للروابط الصحيحة.
+- verify_download هنا هي المرجع المطابق لتحقق الـ Worker (للاختبارات والخادم البديل).
+"""
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+SIGNING_CONTEXT = b'signed-download-links:v1'
+SIGNATURE_BYTES = 16
+LINK_TTL = 2 * 60 * 60  # ساعتان، مثل الروابط المخزنة في KV
+
+
+class InvalidSignedLink(ValueError):
+    pass
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def signing_key(secret=None):
+    return _derive_key(settings.CLOUDFLARE_WORKER_SECRET if secret is None else secret)
+
+
+@lru_cache(maxsize=4)
+def _derive_key(secret):
+    return hmac.new(secret.encode(), SIGNING_CONTEXT, hashlib.sha256).digest()
+
+
+def _signature(key, payload):
+    return hmac.new(key, payload.encode('ascii'), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def sign_download(purchase_id, file_key, ttl=LINK_TTL, secret=None, now=None):
+    """يُرجع (token, expires_at بالثواني)."""
+    expires_at = int((time.time() if now is None else now) + ttl)
+    payload = _b64encode(json.dumps(
+        {'p': purchase_id, 'f': str(file_key), 'e': expires_at, 'n': secrets.token_urlsafe(12)},
+        separators=(',', ':'), ensure_ascii=False,
+    ).encode())
+    return f"{payload}.{_b64encode(_signature(signing_key(secret), payload))}", expires_at
+
+
+def verify_download(token, secret=None, now=None):
+    """
+    نفس تحقق الـ Worker: التوقيع ثم الانتهاء.
+    يُرجع {'purchase_id', 'file_key', 'expires_at', 'nonce'} أو يرفع InvalidSignedLink.
+    """
+    payload, _, signature = token.partition('.')
+    try:
+        given = _b64decode(signature)
+        expected = _signature(signing_key(secret), payload)
+    except ValueError:
+        raise InvalidSignedLink("malformed token")
+    if not payload or not hmac.compare_digest(given, expected):
+        raise InvalidSignedLink("bad signature")
+
+    # توقيع صحيح على حمولة غير متوقعة (سر مسرّب أو إصدار آخر) يبقى رابطاً غير صالح
+    try:
+        data = json.loads(_b64decode(payload))
+        link = {'purchase_id': data['p'], 'file_key': data['f'], 'expires_at': data['e'], 'nonce': data['n']}
+        expired = link['expires_at'] < (time.time() if now is None else now)
+    except (ValueError, TypeError, KeyError):
+        raise InvalidSignedLink("malformed payload")
+    if expired:
+        raise InvalidSignedLink("expired")
+    return link
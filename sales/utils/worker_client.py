@@ -1,59 +1,273 @@
-import requests
+# في sales/utils/worker_client.py
+"""
+عميل Cloudflare Worker لإنشاء روابط التحميل المحمية.
+
+- Session واحدة لكل عملية مع pool اتصالات keep-alive: لا TCP+TLS جديد مع كل نقرة تحميل.
+- مهلات قصيرة (اتصال/قراءة) ومحاولات محدودة بتأخير عشوائي (full jitter) ضمن مهلة كلية،
+  ومهلة كل محاولة لا تتجاوز ما بقي من المهلة الكلية.
+  /_api/store آمن للإعادة: التوكن يُولَّد هنا والتخزين في KV كتابة بنفس المفتاح.
+- قاطع دائرة (circuit breaker) لكل عملية: بعد عدد من الإخفاقات المتتالية يُرفض الطلب فوراً
+  بدون انتظار المهلة، ثم يُسمح بطلب تجريبي واحد بعد مدة الراحة.
+- مقاييس لكل استدعاء (المدة، النتيجة، المحاولات) في worker_metrics.
+- مع CLOUDFLARE_WORKER_SIGNED_LINKS: الرابط يُوقَّع محلياً (signed_links) بدون أي طلب شبكة،
+  ويحمل مفتاح الملف فقط؛ خريطة المفتاح -> رابط المصدر تُنشر في KV الـ Worker (publish_files).
+"""
+import logging
+import random
 import secrets
-import json
+import threading
+import time
+from collections import deque
+
+import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .signed_links import sign_download
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=settings.CLOUDFLARE_WORKER_POOL_SIZE,
+                    max_retries=0,
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """هل يُسمح بالطلب؟ في حالة نصف مفتوح يمر طلب تجريبي واحد فقط."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("cloudflare worker circuit opened after %s failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class WorkerMetrics:
+    def __init__(self, samples=1000):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=samples)
+        self.counts = {'calls': 0, 'success': 0, 'failure': 0, 'rejected': 0, 'retries': 0}
+
+    def record(self, outcome, duration, retries=0):
+        with self._lock:
+            self.counts['calls'] += 1
+            self.counts[outcome] += 1
+            self.counts['retries'] += retries
+            if outcome != 'rejected':
+                self.latencies.append(duration)
+        logger.debug("cloudflare worker call: %s in %.1fms (%s retries)", outcome, duration * 1000, retries)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            data = dict(self.counts)
+        if latencies:
+            data['p50_ms'] = round(latencies[len(latencies) // 2] * 1000, 2)
+            data['p99_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2)
+        return data
+
+    def reset(self):
+        with self._lock:
+            self.latencies.clear()
+            self.counts = dict.fromkeys(self.counts, 0)
+
+
+class RetryableError(Exception):
+    pass
+
+
+breaker = CircuitBreaker(
+    settings.CLOUDFLARE_WORKER_BREAKER_THRESHOLD,
+    settings.CLOUDFLARE_WORKER_BREAKER_RESET_SECONDS,
+)
+worker_metrics = WorkerMetrics()
+
 
 class CloudflareWorkerClient:
     def __init__(self):
         self.worker_url = settings.CLOUDFLARE_WORKER_URL.rstrip('/')
         self.api_secret = settings.CLOUDFLARE_WORKER_SECRET
-    
+
     def create_protected_link(self, file_url, metadata=None):
         """
         إنشاء رابط محمي عبر Cloudflare Worker
         """
+        early = self._without_request(file_url, metadata)
+        if early is not None:
+            return early
+
+        token, payload = self._new_payload(file_url, metadata)
+        started = time.monotonic()
+        retries = 0
+        while True:
+            try:
+                response = self._store(payload, self._attempt_timeouts(started))
+                break
+            except RetryableError as e:
+                error = str(e)
+            except requests.exceptions.RequestException as e:
+                error = f"فشل الاتصال: {str(e)}"
+
+            delay = self._retry_delay(retries, started)
+            if delay is None:
+                return self._give_up(error, started, retries)
+            time.sleep(delay)
+            retries += 1
+
+        return self._finish(token, response.status_code, response.json, started, retries)
+
+    # ===== خطوات مشتركة مع النسخة غير المتزامنة (async_worker_client) =====
+    def _without_request(self, file_url, metadata):
+        """الرد بدون طلب شبكة (معطل، رابط موقّع، أو الدائرة مفتوحة)، وإلا None."""
         if not settings.CLOUDFLARE_WORKER_ENABLED:
             return {
                 "success": False,
                 "error": "Cloudflare Worker غير مفعل"
             }
-        
+
+        if settings.CLOUDFLARE_WORKER_SIGNED_LINKS:
+            return self.create_signed_link(file_url, metadata)
+
+        if not breaker.allow():
+            worker_metrics.record('rejected', 0)
+            return {
+                "success": False,
+                "error": "خدمة التحميل غير متاحة مؤقتاً، حاول بعد قليل"
+            }
+        return None
+
+    def _new_payload(self, file_url, metadata):
         token = secrets.token_urlsafe(32)
-        
-        payload = {
+        return token, {
             "token": token,
             "file_url": file_url,
             "expires_hours": 2,
             "metadata": metadata or {}
         }
-        
-        try:
-            response = requests.post(
-                f"{self.worker_url}/_api/store",
-                headers={
-                    "X-API-Secret": self.api_secret,
-                    "Content-Type": "application/json"
-                },
-                json=payload,
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "token": token,
-                    "download_url": f"{self.worker_url}/d/{token}",
-                    "expires_at": data.get("expires_at")
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"خطأ من Worker: {response.status_code}"
-                }
-                
-        except requests.exceptions.RequestException as e:
+
+    @staticmethod
+    def _attempt_timeouts(started):
+        """(اتصال، قراءة) للمحاولة التالية، كل منهما بحد أقصى ما بقي من المهلة الكلية."""
+        remaining = max(settings.CLOUDFLARE_WORKER_DEADLINE - (time.monotonic() - started), 0.001)
+        return (
+            min(settings.CLOUDFLARE_WORKER_CONNECT_TIMEOUT, remaining),
+            min(settings.CLOUDFLARE_WORKER_READ_TIMEOUT, remaining),
+        )
+
+    @staticmethod
+    def _retry_delay(retries, started):
+        """تأخير عشوائي (full jitter) طالما بقي وقت ضمن المهلة الكلية، وإلا None."""
+        delay = random.uniform(0, settings.CLOUDFLARE_WORKER_RETRY_BACKOFF * 2 ** retries)
+        elapsed = time.monotonic() - started
+        if retries >= settings.CLOUDFLARE_WORKER_MAX_RETRIES or elapsed + delay >= settings.CLOUDFLARE_WORKER_DEADLINE:
+            return None
+        return delay
+
+    @staticmethod
+    def _give_up(error, started, retries):
+        breaker.record_failure()
+        worker_metrics.record('failure', time.monotonic() - started, retries)
+        return {"success": False, "error": error}
+
+    def _finish(self, token, status_code, read_json, started, retries):
+        # الـ Worker يعمل (حتى لو رفض الطلب): الدائرة تبقى مغلقة
+        breaker.record_success()
+        worker_metrics.record('success' if status_code == 200 else 'failure', time.monotonic() - started, retries)
+
+        if status_code == 200:
+            data = read_json()
             return {
-                "success": False,
-                "error": f"فشل الاتصال: {str(e)}"
+                "success": True,
+                "token": token,
+                "download_url": f"{self.worker_url}/d/{token}",
+                "expires_at": data.get("expires_at")
             }
+        return {
+            "success": False,
+            "error": f"خطأ من Worker: {status_code}"
+        }
+
+    @staticmethod
+    def _check_status(status_code):
+        if status_code >= 500 or status_code == 429:
+            raise RetryableError(f"خطأ من Worker: {status_code}")
+
+    def create_signed_link(self, file_url, metadata=None):
+        """رابط /s/<token> موقّع بـ HMAC يتحقق منه الـ Worker ثم يقرأ رابط الملف من KV بمفتاحه."""
+        metadata = metadata or {}
+        token, expires_at = sign_download(metadata.get('purchase_id'), metadata['file_id'])
+        return {
+            "success": True,
+            "token": token,
+            "download_url": f"{self.worker_url}/s/{token}",
+            # بالميلي ثانية مثل رد /_api/store
+            "expires_at": expires_at * 1000
+        }
+
+    def publish_files(self, files):
+        """
+        نشر خريطة الملفات للروابط الموقّعة في KV الـ Worker: {file_id: file_url أو None للحذف}.
+        يرفع requests.RequestException عند الفشل.
+        """
+        response = get_session().post(
+            f"{self.worker_url}/_api/files",
+            headers={"X-API-Secret": self.api_secret},
+            json={"files": {str(key): url for key, url in files.items()}},
+            timeout=(settings.CLOUDFLARE_WORKER_CONNECT_TIMEOUT, settings.CLOUDFLARE_WORKER_READ_TIMEOUT)
+        )
+        response.raise_for_status()
+
+    def _store(self, payload, timeouts):
+        response = get_session().post(
+            f"{self.worker_url}/_api/store",
+            headers={
+                "X-API-Secret": self.api_secret,
+                "Content-Type": "application/json"
+            },
+            json=payload,
+            timeout=timeouts
+        )
+        self._check_status(response.status_code)
+        return response
@@ -0,0 +1,147 @@
+# في sales/utils/worker_stub.py
+"""
+خادم HTTP محلي يحاكي Cloudflare Worker (cloudflare_utils/worker.js) للاختبار والقياس.
+
+- POST /_api/store بنفس التحقق من X-API-Secret وشكل الرد، و GET /d/<token> لمرة واحدة.
+- POST /_api/files لخريطة مفاتيح الملفات، و GET /s/<token> للروابط الموقّعة بالتحقق المرجعي
+  (signed_links.verify_download) ثم تحويل مفتاح الملف إلى رابطه من الخريطة.
+- HTTP/1.1 مع keep-alive مثل الـ Worker الحقيقي.
+- يمكن حقن تأخير (latency) أو أخطاء 5xx بنسبة (fail_rate) أو لعدد محدد من الطلبات التالية
+  (fail_next) لقياس واختبار المحاولات وقاطع الدائرة.
+
+    with WorkerStub(secret='s', latency=0.02) as stub:
+        settings.CLOUDFLARE_WORKER_URL = stub.url
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .signed_links import InvalidSignedLink, verify_download
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # العميل يغلق الاتصال عند انتهاء مهلته (سيناريو الـ Worker البطيء)
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # الرأس والجسم في كتابتين منفصلتين: بدون هذا يتأخر الرد ~40ms على اتصال keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def _reply(self, status, body=b'', content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        stub.requests += 1
+        if stub.latency:
+            time.sleep(stub.latency)
+        if self.path == '/_api/files':
+            return self._files(body)
+        if self.path != '/_api/store':
+            return self._reply(404)
+        with stub.lock:
+            fail = stub.fail_next > 0
+            stub.fail_next -= fail
+        if fail or (stub.fail_rate and random.random() < stub.fail_rate):
+            return self._reply(503, b'{"error": "unavailable"}')
+        if self.headers.get('X-API-Secret') != stub.secret:
+            return self._reply(401, 'غير مصرح'.encode(), 'text/plain; charset=utf-8')
+
+        data = json.loads(body)
+        expires_at = int(time.time() * 1000) + 2 * 60 * 60 * 1000
+        with stub.lock:
+            stub.tokens[data['token']] = {'file_url': data['file_url'], 'expires_at': expires_at, 'used': False}
+        self._reply(200, json.dumps({
+            'success': True,
+            'download_url': f"{stub.url}/d/{data['token']}",
+            'expires_at': expires_at,
+        }).encode())
+
+    def _files(self, body):
+        stub = self.server.stub
+        if self.headers.get('X-API-Secret') != stub.secret:
+            return self._reply(401, 'غير مصرح'.encode(), 'text/plain; charset=utf-8')
+        with stub.lock:
+            for key, file_url in json.loads(body)['files'].items():
+                if file_url is None:
+                    stub.files.pop(key, None)
+                else:
+                    stub.files[key] = file_url
+        self._reply(200, b'{"success": true}')
+
+    def do_GET(self):
+        stub = self.server.stub
+        if self.path.startswith('/s/'):
+            try:
+                link = verify_download(self.path[3:], secret=stub.secret)
+            except InvalidSignedLink:
+                return self._reply(410, b'', 'text/html')
+            with stub.lock:
+                file_url = stub.files.get(link['file_key'])
+                if file_url is None or link['nonce'] in stub.used_nonces:
+                    return self._reply(410, b'', 'text/html')
+                stub.used_nonces.add(link['nonce'])
+            return self._reply(302, headers={'Location': file_url})
+        if not self.path.startswith('/d/'):
+            return self._reply(200, 'ok'.encode(), 'text/plain')
+        with stub.lock:
+            token = stub.tokens.get(self.path[3:])
+            if token is None or token['used'] or token['expires_at'] < time.time() * 1000:
+                return self._reply(410, b'', 'text/html')
+            token['used'] = True
+        self._reply(302, headers={'Location': token['file_url']})
+
+
+class WorkerStub:
+    def __init__(self, secret='', latency=0.0, fail_rate=0.0, host='127.0.0.1', port=0):
+        self.secret = secret
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_next = 0
+        self.tokens = {}
+        self.files = {}
+        self.used_nonces = set()
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = _Server((host, port), _Handler)
+        self.server.stub = self
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,16 +1,21 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from .models import Purchase
+from . import download_quota
 from .utils.worker_client import CloudflareWorkerClient
 from notifications.utils import create_notification
-from .serializers import PurchaseSerializer, DownloadSerializer, PurchaseDetailSerializer
+from config.pagination import KeysetCursorPagination
+from config.idempotency import idempotent
+from config.throttling import PurchaseRateThrottle
+from .serializers import PurchaseSerializer, BatchPurchaseSerializer, DownloadSerializer, PurchaseProjection
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([PurchaseRateThrottle])
+@idempotent
 def purchase_file(request):
     """شراء ملف جديد"""
     serializer = PurchaseSerializer(data=request.data, context={'request': request})
@@ -21,55 +26,70 @@ def purchase_file(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([PurchaseRateThrottle])
+@idempotent
+def purchase_batch(request):
+    """شراء عدة ملفات (السلة) دفعة واحدة"""
+    serializer = BatchPurchaseSerializer(data=request.data, context={'request': request})
+    
+    if serializer.is_valid():
+        result = serializer.save()
+        return Response(result, status=status.HTTP_201_CREATED)
+    
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_download(request, purchase_id):
     """إنشاء رابط تحميل عند الضغط على زر التحميل"""
-    customer = request.user.customer
-    
-    # البحث عن الشراء
-    try:
-        purchase = Purchase.objects.get(id=purchase_id, customer=customer)
-    except Purchase.DoesNotExist:
-        return Response({"error": "الشراء غير موجود"}, status=404)
+    customer_id = request.user.customer_id
     
-    # التحقق من إمكانية التحميل
-    if not purchase.can_download():
+    # حجز تحميل ذرياً (UPDATE مشروط واحد) قبل الاتصال بالـ Worker
+    reservation = download_quota.reserve(purchase_id, customer_id)
+    if reservation is None:
+        if not Purchase.objects.filter(id=purchase_id, customer_id=customer_id).exists():
+            return Response({"error": "الشراء غير موجود"}, status=404)
         return Response({
             "error": "تم استنفاذ التحميلات",
             "remaining": 0
         }, status=400)
     
-    # إنشاء رابط محمي
+    # إنشاء رابط محمي. الحجز يُعاد إذا لم يُنشأ الرابط لأي سبب، بما في ذلك استثناء غير متوقع
     worker = CloudflareWorkerClient()
-    download_url = worker.create_protected_link(
-        file_url=purchase.file.file_url,
-        metadata={
-            'purchase_id': purchase.id,
-            'customer_id': customer.id
-        }
-    )
+    download_url = {}
+    try:
+        download_url = worker.create_protected_link(
+            file_url=reservation.file_url,
+            metadata={
+                'purchase_id': purchase_id,
+                'customer_id': customer_id,
+                'file_id': reservation.file_id
+            }
+        )
+    finally:
+        if not download_url.get('success'):
+            download_quota.release(reservation)
     
     if not download_url.get('success'):
         return Response({"error": download_url.get('error', 'فشل إنشاء الرابط')}, status=500)
     
-    # تحديث الإحصائيات
-    purchase.downloads_count += 1
-    purchase.last_download_at = timezone.now()
-    purchase.save()
-    
     # إرجاع الرابط للمستخدم
     return Response({
         "success": True,
         "download_url": download_url.get('download_url'),
         "expires_in": "ساعتين",
-        "remaining_downloads": purchase.get_remaining_downloads()
+        "remaining_downloads": download_quota.remaining(reservation)
     })
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_purchases(request):
     """عرض مشتريات المستخدم"""
-    purchases = Purchase.objects.filter(customer=request.user.customer)
-    serializer = PurchaseDetailSerializer(purchases, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    purchases = PurchaseProjection.project(Purchase.objects.filter(customer_id=request.user.customer_id))
+    paginator = KeysetCursorPagination()
+    paginator.ordering = ('-timestamp', '-id')
+    page = paginator.paginate_queryset(purchases, request)
+    serializer = PurchaseProjection(page, many=True)
+    return paginator.get_paginated_response(serializer.data)